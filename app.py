@@ -15,7 +15,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import config
 from modules.logging_utils import logger
 from modules.risk_engine import RiskEngine
-from modules.llm_utils import query_llm, explain_query_result, get_gemini_model
+from modules.query_metrics import metrics as query_metrics, execute_and_fetch
+from modules.llm_utils import query_llm, explain_query_result, get_gemini_model, summarize_scenario_attribution
+from modules.dashboard_queries import TOP_COMPANIES_QUERY, TOP_BLOCKHOLDERS_QUERY, COMPANY_GRAPH_QUERY, BLOCKHOLDER_GRAPH_QUERY
 from visualizations.graph_renderer import render_graph_as_html
 from modules.db_loader import DBLoader, Blockholder, Company, RiskFactor, OWNS, EXPOSED_TO
 
@@ -92,6 +94,7 @@ st.title("🚀 Future Risk Dashboard")
 
 @st.cache_resource(show_spinner="🔄 Initializing and computing latest portfolio risk metrics...")
 def initialize_risk_engine():
+    query_metrics.configure(config.QUERY_METRICS_FILE, port=config.QUERY_METRICS_PORT)
     try:
         engine = RiskEngine(uri=config.MEMGRAPH_URI, user=config.MEMGRAPH_USER, password=config.MEMGRAPH_PASSWORD)
         engine.compute_total_risk(max_iterations=config.MAX_RISK_ITERATIONS)
@@ -107,37 +110,31 @@ if "risk_engine" not in st.session_state:
     if st.session_state.risk_engine:
         st.success("✅ Risk computation complete!")
 
-@st.cache_data(show_spinner="Fetching company list...")
-def get_company_list():
-    if "risk_engine" not in st.session_state or not st.session_state.risk_engine:
-        return {}
+def entity_selector(label, node_label, key, help=None):
+    """
+    Typeahead selector backed by the engine's name search index: a search box plus a
+    selectbox of ranked, id-disambiguated matches. Returns (node_id, node_name).
+    """
+    query = st.text_input(f"🔎 Search {node_label.lower()} by name", key=f"{key}_query", help=help)
+    if not query.strip():
+        return None, ""
     try:
-        session = st.session_state.risk_engine.driver.session()
-        results = session.run("""
-            MATCH (c:Company)
-            RETURN c.id AS company_id, c.name AS company_name
-            ORDER BY c.name
-        """).data()
-        return {row['company_name']: row['company_id'] for row in results}
+        matches = st.session_state.risk_engine.search_entities(query, label=node_label, limit=config.SEARCH_PAGE_SIZE)
     except Exception as e:
-        logger.error("Error fetching company list for dropdowns.", exc_info=True)
-        return {}
-
-@st.cache_data(show_spinner="Fetching blockholder list...")
-def get_blockholder_list():
-    if "risk_engine" not in st.session_state or not st.session_state.risk_engine:
-        return {}
-    try:
-        session = st.session_state.risk_engine.driver.session()
-        results = session.run("""
-            MATCH (b:Blockholder)
-            RETURN b.id AS blockholder_id, b.name AS blockholder_name
-            ORDER BY b.name
-        """).data()
-        return {row['blockholder_name']: row['blockholder_id'] for row in results}
-    except Exception as e:
-        logger.error("Error fetching blockholder list for dropdowns.", exc_info=True)
-        return {}
+        logger.error(f"Error searching {node_label} names: {e}", exc_info=True)
+        st.error(f"❌ Error searching {node_label.lower()} names: {e}")
+        return None, ""
+    if not matches["results"]:
+        st.info("No matches found.")
+        return None, ""
+    if matches["total"] > config.SEARCH_PAGE_SIZE or not matches["total_exact"]:
+        total = f"{matches['total']}{'' if matches['total_exact'] else '+'}"
+        st.caption(f"Showing the top {config.SEARCH_PAGE_SIZE} of {total} matches. Refine your search to narrow them down.")
+    options = {match["display"]: match for match in matches["results"]}
+    choice = st.selectbox(label, [""] + list(options), index=0, key=f"{key}_choice", help=help)
+    if not choice:
+        return None, ""
+    return options[choice]["id"], options[choice]["name"]
 
 @st.cache_data(show_spinner="Fetching risk factor list...")
 def get_risk_factor_list():
@@ -175,6 +172,22 @@ def get_location_list():
         logger.error(f"Error fetching location list: {e}", exc_info=True)
         return {}
 
+def get_top_mover_attributions(diff_df, top_n=10):
+    """Explains the post-scenario dollarized risk of the largest movers in a diff report."""
+    movers = diff_df.reindex(diff_df['delta'].abs().sort_values(ascending=False).index).head(top_n)
+    return st.session_state.risk_engine.explain_risk(list(movers['id']), top_k=5)
+
+def render_attribution(attribution):
+    """Shows the per-company and per-risk-factor breakdown of one node's dollarized risk."""
+    st.markdown(f"**{attribution['name']}** — Dollarized Risk: ${attribution['dollarized_risk'] / 1_000_000_000:,.2f}B")
+    col_a, col_b = st.columns(2)
+    with col_a:
+        if attribution['by_company']:
+            st.dataframe(pd.DataFrame(attribution['by_company'])[['company_name', 'percent', 'contribution']])
+    with col_b:
+        if attribution['by_risk_factor']:
+            st.dataframe(pd.DataFrame(attribution['by_risk_factor']))
+
 with st.sidebar:
     st.image("https://upload.wikimedia.org/wikipedia/en/thumb/9/9a/Mphasis_logo.svg/1200px-Mphasis_logo.svg.png", width=250)
     st.header("Navigation")
@@ -189,6 +202,14 @@ with st.sidebar:
         with st.spinner("Recalculating..."):
             st.session_state.risk_engine = initialize_risk_engine()
         st.success("Risk metrics recalculated!")
+
+    with st.expander("⏱️ Query Metrics"):
+        query_stats = query_metrics.snapshot()
+        if query_stats:
+            st.dataframe(pd.DataFrame(query_stats)[["query", "count", "p50", "p95", "p99", "rows", "errors"]].set_index("query"))
+            st.caption(f"Slow queries (> {config.SLOW_QUERY_MS:.0f} ms) are logged to logs/slow_queries.log; metrics are exported to {os.path.relpath(config.QUERY_METRICS_FILE, config.BASE_DIR)}.")
+        else:
+            st.info("No queries recorded yet.")
         
 if selected_page == "📈 Risk Analytics":
     st.header("📈 Portfolio Risk Insights")
@@ -197,11 +218,7 @@ if selected_page == "📈 Risk Analytics":
     with col1:
         st.markdown("### 🏆 Top 10 Riskiest Companies")
         try:
-            top_companies = st.session_state.risk_engine.driver.session().run("""
-                MATCH (c:Company) WHERE c.dollarized_risk IS NOT NULL AND c.dollarized_risk > 0
-                RETURN c.name AS Name, c.dollarized_risk AS DollarizedRisk
-                ORDER BY DollarizedRisk DESC LIMIT 10
-            """).data()
+            top_companies = st.session_state.risk_engine.driver.session().run(TOP_COMPANIES_QUERY).data()
             if top_companies:
                 df = pd.DataFrame(top_companies)
                 df['DollarizedRisk_B'] = df['DollarizedRisk'] / 1_000_000_000
@@ -219,11 +236,18 @@ if selected_page == "📈 Risk Analytics":
     with col2:
         st.markdown("### 🤝 Top 10 Riskiest Blockholders")
         try:
-            top_blockholders = st.session_state.risk_engine.driver.session().run("""
-                MATCH (b:Blockholder) WHERE b.dollarized_risk IS NOT NULL AND b.dollarized_risk > 0
-                RETURN b.name AS Name, b.dollarized_risk AS DollarizedRisk
-                ORDER BY DollarizedRisk DESC LIMIT 10
-            """).data()
+            risk_by_year = st.session_state.risk_engine.compute_risk_by_year()
+            year_options = ["Latest"] + [str(y) for y in risk_by_year["years"]]
+            selected_year = st.selectbox("Ownership year", year_options, index=0, key="blockholder_year")
+            if selected_year == "Latest":
+                top_blockholders = st.session_state.risk_engine.driver.session().run(TOP_BLOCKHOLDERS_QUERY).data()
+            else:
+                year_row = risk_by_year["dollarized_risk"][risk_by_year["years"].index(int(selected_year))]
+                snapshot = st.session_state.risk_engine.get_graph_snapshot()
+                top_blockholders = [
+                    {"Name": snapshot.blockholder_names[i], "DollarizedRisk": float(year_row[i])}
+                    for i in year_row.argsort()[::-1][:10] if year_row[i] > 0
+                ]
             if top_blockholders:
                 df = pd.DataFrame(top_blockholders)
                 df['DollarizedRisk_B'] = df['DollarizedRisk'] / 1_000_000_000
@@ -248,25 +272,40 @@ if selected_page == "📈 Risk Analytics":
     with col3:
         st.markdown("### 📊 Portfolio Risk Treemap")
         try:
-            treemap_data_cursor = st.session_state.risk_engine.driver.session().run("""
-                MATCH (c:Company)
-                WHERE c.dollarized_risk IS NOT NULL AND c.dollarized_risk > 0 AND c.sector IS NOT NULL
-                RETURN c.name AS Company, c.sector AS Sector, c.dollarized_risk AS DollarizedRisk
-                ORDER BY DollarizedRisk DESC
-            """).data()
-            if treemap_data_cursor:
-                treemap_df = pd.DataFrame(treemap_data_cursor)
-                if not treemap_df.empty:
-                    treemap_df['DollarizedRisk_B'] = treemap_df['DollarizedRisk'] / 1_000_000_000
-                    fig = px.treemap(treemap_df,
-                                     path=[px.Constant("Portfolio"), 'Sector', 'Company'],
-                                     values='DollarizedRisk_B',
-                                     color='DollarizedRisk_B',
-                                     color_continuous_scale='RdYlGn_r',
-                                     title="Portfolio Risk Breakdown by Sector and Company (Dollarized Billions)")
-                    st.plotly_chart(fig)
-                else:
-                    st.info("No data available for treemap visualization.")
+            treemap_rows = st.session_state.risk_engine.get_sector_treemap(top_n=config.TREEMAP_TOP_N_PER_SECTOR)
+            if treemap_rows:
+                treemap_df = pd.DataFrame(treemap_rows)
+                treemap_df['DollarizedRisk_B'] = treemap_df['DollarizedRisk'] / 1_000_000_000
+                fig = px.treemap(treemap_df,
+                                 path=[px.Constant("Portfolio"), 'Sector', 'Company'],
+                                 values='DollarizedRisk_B',
+                                 color='DollarizedRisk_B',
+                                 color_continuous_scale='RdYlGn_r',
+                                 title=f"Portfolio Risk Breakdown by Sector (Top {config.TREEMAP_TOP_N_PER_SECTOR} Companies per Sector, Dollarized Billions)")
+                st.plotly_chart(fig)
+
+                drill_sector = st.selectbox("🔎 Drill into a sector", [""] + sorted(treemap_df['Sector'].unique()), index=0)
+                if drill_sector:
+                    sector_companies = st.session_state.risk_engine.get_sector_companies(drill_sector, limit=config.SECTOR_DRILLDOWN_LIMIT)
+                    if sector_companies:
+                        sector_df = pd.DataFrame(sector_companies)
+                        sector_df['DollarizedRisk_B'] = sector_df['DollarizedRisk'] / 1_000_000_000
+                        fig_sector = px.treemap(sector_df,
+                                                path=[px.Constant(drill_sector), 'Company'],
+                                                values='DollarizedRisk_B',
+                                                color='DollarizedRisk_B',
+                                                color_continuous_scale='RdYlGn_r',
+                                                title=f"{drill_sector}: Top {len(sector_df)} Companies (Dollarized Billions)")
+                        st.plotly_chart(fig_sector)
+                    else:
+                        st.info("No companies with dollarized risk in this sector.")
+
+                aggregates = st.session_state.risk_engine.get_risk_aggregates()
+                sector_totals = aggregates[aggregates['kind'] == 'sector'].sort_values('dollarized_risk', ascending=False)
+                st.dataframe(pd.DataFrame({'Sector': sector_totals['name'],
+                                           'Companies': sector_totals['companies'],
+                                           'Dollarized Risk ($B)': sector_totals['dollarized_risk'] / 1_000_000_000,
+                                           'Held by Blockholders ($B)': sector_totals['held_risk'] / 1_000_000_000}).set_index('Sector'))
             else:
                 st.info("No data available for treemap visualization.")
         except Exception as e:
@@ -275,15 +314,11 @@ if selected_page == "📈 Risk Analytics":
     with col4:
         st.markdown("### 📊 Total Exposure by Risk Factor")
         try:
-            risk_factor_exposure_data = st.session_state.risk_engine.driver.session().run("""
-                MATCH (c:Company)-[e:EXPOSED_TO]->(r:RiskFactor) WHERE c.dollarized_risk IS NOT NULL AND c.dollarized_risk > 0
-                RETURN r.name AS RiskFactor, sum(c.dollarized_risk * coalesce(e.weight, 0)) AS TotalDollarizedExposure
-                ORDER BY TotalDollarizedExposure DESC LIMIT 15
-            """).data()
-            if risk_factor_exposure_data:
-                df_bar = pd.DataFrame(risk_factor_exposure_data)
-                df_bar['TotalDollarizedExposure'] = pd.to_numeric(df_bar['TotalDollarizedExposure'], errors='coerce').fillna(0)
-                df_bar = df_bar[df_bar['TotalDollarizedExposure'] > 0]
+            aggregates = st.session_state.risk_engine.get_risk_aggregates()
+            risk_factor_totals = aggregates[aggregates['kind'] == 'risk_factor']
+            if not risk_factor_totals.empty:
+                df_bar = risk_factor_totals.rename(columns={'name': 'RiskFactor', 'dollarized_risk': 'TotalDollarizedExposure'})
+                df_bar = df_bar[df_bar['TotalDollarizedExposure'] > 0].nlargest(15, 'TotalDollarizedExposure')
                 df_bar['TotalDollarizedExposure_B'] = df_bar['TotalDollarizedExposure'] / 1_000_000_000
                 if not df_bar.empty:
                     fig_bar = px.bar(df_bar,
@@ -327,13 +362,152 @@ if selected_page == "📈 Risk Analytics":
         except Exception as e:
             st.error(f"❌ Error fetching critical nodes: {e}")
 
+    st.markdown("---")
 
-elif selected_page == "📊 Company/Blockholder View":
-    company_name_to_id = get_company_list()
-    company_names = sorted(list(company_name_to_id.keys()))
-    blockholder_name_to_id = get_blockholder_list()
-    blockholder_names = sorted(list(blockholder_name_to_id.keys()))
+    col7, col8 = st.columns(2)
+    with col7:
+        st.markdown("### 📐 Risk Distribution")
+        try:
+            risk_stats = st.session_state.risk_engine.get_risk_statistics()
+            stats_summary = risk_stats.summary()
+            dist_label = st.selectbox("Node type", ["Company", "Blockholder"], key="dist_label")
+            dist_metric = st.selectbox("Metric", ["dollarized_risk", "total_risk"], key="dist_metric")
+            metric_stats = stats_summary.get(dist_label, {}).get(dist_metric)
+            if metric_stats:
+                edges = metric_stats["bin_edges"]
+                hist_df = pd.DataFrame({
+                    "Bin Start": edges[:-1],
+                    "Count": metric_stats["overall"]["histogram"],
+                })
+                fig_hist = px.bar(hist_df, x="Bin Start", y="Count", title=f"{dist_label} {dist_metric} Distribution")
+                st.plotly_chart(fig_hist)
+                st.table(pd.DataFrame([metric_stats["overall"]["quantiles"]], index=["All"]))
+                if metric_stats.get("by_sector"):
+                    st.markdown("**Quantiles by Sector**")
+                    st.dataframe(pd.DataFrame({sector: s["quantiles"] for sector, s in metric_stats["by_sector"].items()}).T)
+            else:
+                st.info("No risk distribution data available.")
+        except Exception as e:
+            st.error(f"❌ Error computing risk distribution: {e}")
+
+    with col8:
+        st.markdown("### 🚨 Risk Outliers")
+        try:
+            outliers = st.session_state.risk_engine.get_risk_statistics().outliers(
+                metric="dollarized_risk", z_threshold=config.RISK_OUTLIER_Z_THRESHOLD
+            )
+            if not outliers.empty:
+                st.warning(f"⚠️ {len(outliers)} nodes have a dollarized risk robust z-score above {config.RISK_OUTLIER_Z_THRESHOLD}:")
+                st.dataframe(outliers[["name", "label", "dollarized_risk", "dollarized_risk_pct", "dollarized_risk_zscore"]].head(50).set_index("name"))
+            else:
+                st.success("✅ No dollarized risk outliers detected.")
+        except Exception as e:
+            st.error(f"❌ Error computing risk outliers: {e}")
+
+    st.markdown("---")
+
+    st.markdown("### 🎯 Blockholder Concentration (HHI)")
+    try:
+        concentration = st.session_state.risk_engine.compute_blockholder_concentration()
+        hhi_col1, hhi_col2, hhi_col3 = st.columns(3)
+        with hhi_col1:
+            hhi_dimension = st.selectbox("Concentration by", ["sector", "location", "risk_factor"],
+                                         format_func=lambda d: d.replace("_", " ").title(), key="hhi_dimension")
+        with hhi_col2:
+            min_hhi = st.slider("Minimum HHI", 0.0, 1.0, config.HHI_ALERT_THRESHOLD, 0.05, key="min_hhi")
+        with hhi_col3:
+            top_options = sorted(concentration[f"top_{hhi_dimension}"].dropna().unique().tolist())
+            top_filter = st.multiselect("Top contributor", top_options, key="hhi_top_filter")
+        filtered = concentration[(concentration["dollarized_risk"] > 0) & (concentration[f"hhi_{hhi_dimension}"] >= min_hhi)]
+        if top_filter:
+            filtered = filtered[filtered[f"top_{hhi_dimension}"].isin(top_filter)]
+        st.caption(f"{len(filtered)} of {int((concentration['dollarized_risk'] > 0).sum())} blockholders with dollarized risk match.")
+        if not filtered.empty:
+            st.dataframe(filtered.sort_values("dollarized_risk", ascending=False).head(200)[
+                ["name", "dollarized_risk", f"hhi_{hhi_dimension}", f"top_{hhi_dimension}", f"top_{hhi_dimension}_share"]
+            ].set_index("name"))
+    except Exception as e:
+        st.error(f"❌ Error computing blockholder concentration: {e}")
+
+    st.markdown("---")
+
+    st.markdown("### 👥 Crowded Trades")
+    try:
+        clusters = st.session_state.risk_engine.compute_crowding_clusters(
+            similarity_threshold=config.CROWDING_SIMILARITY_THRESHOLD,
+            min_cluster_size=config.CROWDING_MIN_CLUSTER_SIZE,
+        )
+        if clusters:
+            cluster_df = pd.DataFrame([{
+                "Cluster": i + 1,
+                "Blockholders": c["size"],
+                "DollarizedRisk_B": c["dollarized_risk"] / 1_000_000_000,
+                "Mean Similarity": round(c["mean_similarity"], 3),
+                "Most Shared Holdings": ", ".join(h["name"] or h["id"] for h in c["top_holdings"]),
+            } for i, c in enumerate(clusters)])
+            st.dataframe(cluster_df.head(50).set_index("Cluster"))
+            selected_cluster = st.selectbox("Inspect cluster", cluster_df["Cluster"].head(50).tolist(), key="crowding_cluster")
+            st.dataframe(pd.DataFrame(clusters[selected_cluster - 1]["members"]).set_index("name"))
+        else:
+            st.success("✅ No crowded holdings clusters found.")
+    except Exception as e:
+        st.error(f"❌ Error computing crowding clusters: {e}")
+
+    st.markdown("---")
 
+    st.markdown(f"### 📉 Blockholder VaR / Expected Shortfall ({config.VAR_CONFIDENCE:.0%})")
+    try:
+        portfolio_var = st.session_state.risk_engine.compute_portfolio_var(
+            confidence=config.VAR_CONFIDENCE,
+            num_simulations=config.VAR_NUM_SIMULATIONS,
+            covariance_csv=config.FACTOR_COVARIANCE_CSV,
+            market_cap_history_dir=config.MARKET_CAP_HISTORY_DIR if config.ESTIMATE_FACTOR_COVARIANCE else None,
+            default_volatility=config.FACTOR_DEFAULT_VOLATILITY,
+            correlation_groups=config.FACTOR_CORRELATION_GROUPS,
+            base_correlation=config.FACTOR_BASE_CORRELATION,
+        )
+        snapshot = st.session_state.risk_engine.get_graph_snapshot()
+        if snapshot.num_blockholders:
+            var_df = pd.DataFrame({
+                "Name": snapshot.blockholder_names,
+                "DollarizedRisk": snapshot.blockholder_dollarized_risk,
+                "VaR (Parametric)": portfolio_var["var_parametric"],
+                "ES (Parametric)": portfolio_var["es_parametric"],
+            })
+            if "var_simulated" in portfolio_var:
+                var_df["VaR (Simulated)"] = portfolio_var["var_simulated"]
+                var_df["ES (Simulated)"] = portfolio_var["es_simulated"]
+            var_df = var_df.sort_values("DollarizedRisk", ascending=False).head(20).set_index("Name")
+            st.dataframe((var_df / 1_000_000_000).style.format("{:,.3f}"))
+            st.caption("Values in $ billions. VaR/ES use correlated risk factor shocks instead of summing factor weights independently.")
+        else:
+            st.info("No blockholders available for VaR.")
+    except Exception as e:
+        st.error(f"❌ Error computing portfolio VaR: {e}")
+
+    st.markdown("---")
+
+    st.markdown("### 📈 Dollarized Risk Over Time")
+    try:
+        risk_history = st.session_state.risk_engine.get_dollarized_risk_history(store_dir=config.MARKET_CAP_HISTORY_DIR)
+        if risk_history is not None and len(risk_history["dates"]):
+            history_df = pd.DataFrame({"Date": risk_history["dates"], "Portfolio": risk_history["company"].sum(axis=0)})
+            top_rows = risk_history["blockholder"][:, -1].argsort()[::-1][:5]
+            for row in top_rows:
+                history_df[risk_history["blockholder_ids"][row]] = risk_history["blockholder"][row]
+            history_long = history_df.melt(id_vars="Date", var_name="Series", value_name="DollarizedRisk")
+            history_long["DollarizedRisk_B"] = history_long["DollarizedRisk"] / 1_000_000_000
+            fig_history = px.line(history_long, x="Date", y="DollarizedRisk_B", color="Series",
+                                  title="Portfolio and Top 5 Blockholders: Dollarized Risk Over Time",
+                                  labels={"DollarizedRisk_B": "Dollarized Risk ($ Billions)"})
+            st.plotly_chart(fig_history, use_container_width=True)
+        else:
+            st.info("No market cap history available. Run the pipeline to generate it.")
+    except Exception as e:
+        st.error(f"❌ Error computing dollarized risk history: {e}")
+
+
+elif selected_page == "📊 Company/Blockholder View":
     selected_node_type = st.radio(
         "**Select node type to visualize:**",
         ["Company", "Blockholder"],
@@ -344,23 +518,19 @@ elif selected_page == "📊 Company/Blockholder View":
     selected_node_id = ""
 
     if selected_node_type == "Company":
-        selected_node_name = st.selectbox(
+        selected_node_id, selected_node_name = entity_selector(
             "**Select a company to view its risk profile:**",
-            [""] + company_names,
-            index=0,
+            "Company",
+            key="view_company",
             help="Choose a company to visualize its network of owners and risks."
         )
-        if selected_node_name:
-            selected_node_id = company_name_to_id.get(selected_node_name)
     else: # Blockholder
-        selected_node_name = st.selectbox(
+        selected_node_id, selected_node_name = entity_selector(
             "**Select a blockholder to view its inherited risk profile:**",
-            [""] + blockholder_names,
-            index=0,
+            "Blockholder",
+            key="view_blockholder",
             help="Choose a blockholder to visualize its direct ownerships and the risks of those companies."
         )
-        if selected_node_name:
-            selected_node_id = blockholder_name_to_id.get(selected_node_name)
 
     if selected_node_name:
         st.markdown("### 🗂 Graph Legend")
@@ -393,33 +563,61 @@ elif selected_page == "📊 Company/Blockholder View":
         st.markdown("---")
 
         if selected_node_type == "Company":
-            graph_cypher_query = f"""
-                MATCH (c:Company {{id: '{selected_node_id}'}})
-                OPTIONAL MATCH (bh:Blockholder)-[o:OWNS]->(c)
-                OPTIONAL MATCH (c)-[o2:OWNS]->(owned_c:Company)
-                OPTIONAL MATCH (owned_c)-[o3:OWNS]->(sub_owned_c:Company)
-                OPTIONAL MATCH (c)-[e1:EXPOSED_TO]->(rf1:RiskFactor)
-                OPTIONAL MATCH (owned_c)-[e2:EXPOSED_TO]->(rf2:RiskFactor)
-                OPTIONAL MATCH (sub_owned_c)-[e3:EXPOSED_TO]->(rf3:RiskFactor)
-                RETURN c, bh, o, owned_c, o2, sub_owned_c, o3, rf1, e1, rf2, e2, rf3, e3
-                LIMIT 100
-            """
+            graph_cypher_query, graph_params = COMPANY_GRAPH_QUERY, {"company_id": selected_node_id}
         else: # Blockholder
-            graph_cypher_query = f"""
-                MATCH (bh:Blockholder {{id: '{selected_node_id}'}})
-                OPTIONAL MATCH (bh)-[o1:OWNS]->(c1:Company)
-                OPTIONAL MATCH (c1)-[o2:OWNS]->(c2:Company)
-                OPTIONAL MATCH (c2)-[o3:OWNS]->(c3:Company)
-                OPTIONAL MATCH (c1)-[e1:EXPOSED_TO]->(rf1:RiskFactor)
-                OPTIONAL MATCH (c2)-[e2:EXPOSED_TO]->(rf2:RiskFactor)
-                OPTIONAL MATCH (c3)-[e3:EXPOSED_TO]->(rf3:RiskFactor)
-                RETURN bh, o1, c1, o2, c2, o3, c3, e1, rf1, e2, rf2, e3, rf3
-                LIMIT 200
-            """
+            graph_cypher_query, graph_params = BLOCKHOLDER_GRAPH_QUERY, {"blockholder_id": selected_node_id}
         
+        with st.expander("🔍 Risk Attribution"):
+            try:
+                attribution = st.session_state.risk_engine.explain_risk(selected_node_id, top_k=15).get(selected_node_id)
+                if attribution:
+                    render_attribution(attribution)
+                else:
+                    st.info("No attribution available for this node.")
+            except Exception as e:
+                st.error(f"❌ Error computing risk attribution: {e}")
+
+        with st.expander("🏛️ Ultimate Ownership & Control"):
+            try:
+                index_kwargs = {"threshold": config.INTEGRATED_OWNERSHIP_THRESHOLD, "persist_dir": config.OWNERSHIP_INDEX_DIR}
+                if selected_node_type == "Company":
+                    ownership_rows = st.session_state.risk_engine.get_ultimate_owners(selected_node_id, **index_kwargs)
+                    empty_message = "No direct or indirect owners found."
+                else:
+                    control_pct = st.slider("Minimum integrated stake", 0.0, 1.0, config.CONTROL_THRESHOLD, 0.05, key="control_pct")
+                    ownership_rows = st.session_state.risk_engine.get_controlled_companies(selected_node_id, min_percent=control_pct, **index_kwargs)
+                    empty_message = f"No companies held at or above {control_pct:.0%}, directly or indirectly."
+                if ownership_rows:
+                    st.dataframe(pd.DataFrame(ownership_rows).set_index("name"))
+                    path_options = {row["id"]: row["name"] for row in ownership_rows}
+                    path_other = st.selectbox("Show strongest control path for", list(path_options), format_func=path_options.get, key="control_path")
+                    owner_id, owned_id = (path_other, selected_node_id) if selected_node_type == "Company" else (selected_node_id, path_other)
+                    control_path = st.session_state.risk_engine.get_strongest_control_path(owner_id, owned_id, **index_kwargs)
+                    if control_path:
+                        st.markdown(" → ".join(step["name"] for step in control_path["path"]) + f" (**{control_path['percent']:.2%}**)")
+                else:
+                    st.info(empty_message)
+            except Exception as e:
+                st.error(f"❌ Error computing integrated ownership: {e}")
+
+        try:
+            risk_history = st.session_state.risk_engine.get_dollarized_risk_history(store_dir=config.MARKET_CAP_HISTORY_DIR)
+            if risk_history is not None:
+                kind = "company" if selected_node_type == "Company" else "blockholder"
+                node_ids = risk_history[f"{kind}_ids"]
+                if selected_node_id in node_ids:
+                    series = risk_history[kind][node_ids.index(selected_node_id)]
+                    node_history_df = pd.DataFrame({"Date": risk_history["dates"], "DollarizedRisk_B": series / 1_000_000_000})
+                    st.plotly_chart(px.line(node_history_df, x="Date", y="DollarizedRisk_B",
+                                            title=f"{selected_node_name}: Dollarized Risk Over Time",
+                                            labels={"DollarizedRisk_B": "Dollarized Risk ($ Billions)"}),
+                                    use_container_width=True)
+        except Exception as e:
+            st.error(f"❌ Error loading dollarized risk history: {e}")
+
         with st.spinner("🔄 Rendering personalized risk graph..."):
             try:
-                html_content = render_graph_as_html(graph_cypher_query)
+                html_content = render_graph_as_html(graph_cypher_query, graph_params)
                 st.components.v1.html(html_content, height=1200, width=1200, scrolling=True)
             except Exception as e:
                 st.error(f"❌ Failed to render graph: {e}. Check console for details.")
@@ -430,13 +628,32 @@ elif selected_page == "📊 Company/Blockholder View":
 elif selected_page == "🧪 Scenario Analysis":
     st.header("🧪 Scenario Analysis & Simulation")
     
-    company_name_to_id = get_company_list()
-    company_names = sorted(list(company_name_to_id.keys()))
     risk_factor_names = get_risk_factor_list()
     sector_names = get_sector_list()
     location_names = get_location_list()
 
-    scenario_type = st.radio("Select Scenario Type", ["Acquisition", "Risk Event Impact"])
+    with st.expander("↩️ Applied Scenarios (Undo)"):
+        applied_scenarios = st.session_state.risk_engine.list_scenarios()
+        if applied_scenarios:
+            st.dataframe(pd.DataFrame(applied_scenarios[::-1]))
+            undo_count = st.number_input("Number of most recent scenarios to undo", min_value=1, max_value=len(applied_scenarios), value=1, step=1)
+            if st.button("↩️ Undo Scenarios"):
+                with st.spinner("Rolling back scenarios..."):
+                    try:
+                        rolled_back = st.session_state.risk_engine.rollback_scenarios(int(undo_count))
+                        st.session_state.risk_engine.compute_total_risk()
+                        st.session_state.risk_engine.dollarize_risk()
+                        st.cache_data.clear()
+                        st.session_state.acquisition_results = None
+                        st.session_state.risk_event_results = None
+                        st.success(f"Rolled back {rolled_back} scenario(s).")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Error rolling back scenarios: {e}")
+        else:
+            st.info("No applied scenarios to undo.")
+
+    scenario_type = st.radio("Select Scenario Type", ["Acquisition", "Risk Event Impact", "Default Cascade"])
 
     if st.session_state.get('last_scenario_type') != scenario_type:
         st.session_state.acquisition_results = None
@@ -447,11 +664,9 @@ elif selected_page == "🧪 Scenario Analysis":
         st.subheader("🔗 Simulate Company Acquisition")
         col1, col2, col3 = st.columns(3)
         with col1:
-            acquirer_name = st.selectbox("Acquiring Company Name", [""] + company_names, index=0, help="Select the company making the acquisition.")
-            acquirer_id = company_name_to_id.get(acquirer_name)
+            acquirer_id, acquirer_name = entity_selector("Acquiring Company Name", "Company", key="acquirer", help="Select the company making the acquisition.")
         with col2:
-            acquired_name = st.selectbox("Acquired Company Name", [""] + company_names, index=1, help="Select the company being acquired.")
-            acquired_id = company_name_to_id.get(acquired_name)
+            acquired_id, acquired_name = entity_selector("Acquired Company Name", "Company", key="acquired", help="Select the company being acquired.")
         with col3:
             ownership_pct = st.number_input("Ownership Percentage (0.0 - 1.0)", min_value=0.0, max_value=1.0, value=0.5, step=0.05, format="%.2f")
         
@@ -470,10 +685,11 @@ elif selected_page == "🧪 Scenario Analysis":
                             st.session_state.risk_engine.generate_diff("output/snapshot_before.json", "output/snapshot_after.json")
                             diff_df = pd.read_csv("output/diff_report.csv")
                             diff_df = diff_df[diff_df['delta'] != 0] # Filter for non-zero changes
+                            attributions = get_top_mover_attributions(diff_df) if not diff_df.empty else {}
                             llm_summary = "❌ LLM is not configured (GEMINI_API_KEY missing or invalid)."
                             if LLM_ENABLED and not diff_df.empty:
-                                llm_summary = query_llm(f"Summarize the following risk changes after an acquisition. Focus on top gainers/losers in total risk. Data:\n{diff_df.to_string()}")
-                            st.session_state.acquisition_results = {"status": "success", "diff_df": diff_df, "llm_summary": llm_summary}
+                                llm_summary = summarize_scenario_attribution("acquisition", diff_df, attributions)
+                            st.session_state.acquisition_results = {"status": "success", "diff_df": diff_df, "attributions": attributions, "llm_summary": llm_summary}
                             st.rerun()
                         else:
                             st.session_state.acquisition_results = {"status": "error", "message": "Acquisition simulation failed. Check company IDs or console for details."}
@@ -490,7 +706,11 @@ elif selected_page == "🧪 Scenario Analysis":
                 st.subheader("📈 Risk Changes After Acquisition")
                 st.markdown("**LLM Summary:**")
                 st.markdown(results["llm_summary"])
-                st.dataframe(diff_df)
+                st.markdown("**🔍 Where the Top Movers' Risk Comes From:**")
+                for attribution in results.get("attributions", {}).values():
+                    render_attribution(attribution)
+                with st.expander("Full risk change table"):
+                    st.dataframe(diff_df)
                 st.download_button("📥 Download Risk Changes CSV", diff_df.to_csv(index=False).encode('utf-8'), file_name="acquisition_risk_changes.csv")
             else:
                 st.info("No significant risk changes detected after acquisition. Graph state may have updated.")
@@ -504,7 +724,7 @@ elif selected_page == "🧪 Scenario Analysis":
         impact_multiplier = st.number_input("Impact Multiplier (e.g., 1.5 for a 50% increase)", min_value=0.0, max_value=2.0, value=1.5, step=0.1)
         
         with st.expander("Target Specific Companies, Sectors, or Locations"):
-            target_company = st.selectbox("Target Company (optional)", [""] + company_names, index=0)
+            target_company_id, target_company = entity_selector("Target Company (optional)", "Company", key="target_company")
             target_sector = st.selectbox("Target Sector (optional)", [""] + sector_names, index=0)
             target_location = st.selectbox("Target Location (optional)", [""] + location_names, index=0)
 
@@ -517,7 +737,7 @@ elif selected_page == "🧪 Scenario Analysis":
                         updated_count = st.session_state.risk_engine.simulate_risk_event(
                             risk_factor_name=selected_risk_factor,
                             impact_multiplier=impact_multiplier,
-                            target_company_id=company_name_to_id.get(target_company),
+                            target_company_id=target_company_id,
                             target_sector=target_sector if target_sector else None,
                             target_location=target_location if target_location else None
                         )
@@ -530,10 +750,11 @@ elif selected_page == "🧪 Scenario Analysis":
                             st.session_state.risk_engine.generate_diff("output/snapshot_before.json", "output/snapshot_after.json")
                             diff_df = pd.read_csv("output/diff_report.csv")
                             diff_df = diff_df[diff_df['delta'] != 0] # Filter for non-zero changes
+                            attributions = get_top_mover_attributions(diff_df) if not diff_df.empty else {}
                             llm_summary = "❌ LLM is not configured (GEMINI_API_KEY missing or invalid)."
                             if LLM_ENABLED and not diff_df.empty:
-                                llm_summary = query_llm(f"Summarize the following risk changes after a risk event. Focus on top gainers/losers in total risk. Data:\n{diff_df.to_string()}")
-                            st.session_state.risk_event_results = {"status": "success", "diff_df": diff_df, "llm_summary": llm_summary}
+                                llm_summary = summarize_scenario_attribution("risk event", diff_df, attributions)
+                            st.session_state.risk_event_results = {"status": "success", "diff_df": diff_df, "attributions": attributions, "llm_summary": llm_summary}
                             st.rerun()
                         else:
                             st.session_state.risk_event_results = {"status": "info", "message": "No companies were exposed to the selected risk factor, or the event had no effect."}
@@ -552,7 +773,11 @@ elif selected_page == "🧪 Scenario Analysis":
                 st.subheader("📈 Risk Changes After Event")
                 st.markdown("**LLM Summary:**")
                 st.markdown(results["llm_summary"])
-                st.dataframe(diff_df)
+                st.markdown("**🔍 Where the Top Movers' Risk Comes From:**")
+                for attribution in results.get("attributions", {}).values():
+                    render_attribution(attribution)
+                with st.expander("Full risk change table"):
+                    st.dataframe(diff_df)
                 st.download_button("📥 Download Risk Changes CSV", diff_df.to_csv(index=False).encode('utf-8'), file_name="risk_event_changes.csv")
             else:
                 st.info("No significant risk changes detected after the event.")
@@ -560,12 +785,67 @@ elif selected_page == "🧪 Scenario Analysis":
             st.error(f"❌ {st.session_state.risk_event_results['message']}")
         elif st.session_state.get('risk_event_results') and st.session_state.risk_event_results["status"] == "info":
             st.info(f"ℹ️ {st.session_state.risk_event_results['message']}")
+
+    elif scenario_type == "Default Cascade":
+        st.subheader("🌊 Simulate Default Cascade")
+        st.caption("Shocks companies and propagates losses to their owners through OWNS edges, including cross-holdings, until the cascade settles. The graph is not modified.")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            shocked_id, shocked_name = entity_selector("Shocked Company", "Company", key="cascade_company", help="Company whose value is written down.")
+        with col2:
+            cascade_shock = st.number_input("Value Lost (0.0 - 1.0, 1.0 = default)", min_value=0.0, max_value=1.0, value=1.0, step=0.05, format="%.2f")
+        with col3:
+            capital_ratio = st.number_input("Capital Ratio (loss-absorbing share of value)", min_value=0.01, max_value=1.0, value=config.CASCADE_CAPITAL_RATIO, step=0.05, format="%.2f")
+
+        if st.button("Run Default Cascade"):
+            if shocked_id:
+                with st.spinner("Running default cascade..."):
+                    try:
+                        cascade = st.session_state.risk_engine.simulate_contagion(
+                            [shocked_id], shock=cascade_shock, capital_ratio=capital_ratio,
+                            max_rounds=config.CASCADE_MAX_ROUNDS, top_n=config.CASCADE_TOP_N,
+                        )
+                        m1, m2, m3, m4 = st.columns(4)
+                        m1.metric("Rounds", len(cascade["rounds"]))
+                        m2.metric("Distressed Nodes", cascade["num_distressed"])
+                        m3.metric("Defaulted Nodes", cascade["num_defaulted"])
+                        m4.metric("Systemic Impact (DebtRank)", f"{cascade['systemic_impact']:.4%}")
+                        st.markdown(f"**Initial loss:** ${cascade['initial_loss'] / 1_000_000_000:,.3f}B · "
+                                    f"**Induced company loss:** ${cascade['induced_company_loss'] / 1_000_000_000:,.3f}B · "
+                                    f"**Blockholder loss:** ${cascade['blockholder_loss'] / 1_000_000_000:,.3f}B")
+                        if not cascade["converged"]:
+                            st.warning(f"Cascade did not settle within {config.CASCADE_MAX_ROUNDS} rounds.")
+                        if cascade["rounds"]:
+                            st.dataframe(pd.DataFrame(cascade["rounds"]).set_index("round"))
+                        if cascade["top_losses"]:
+                            st.markdown("**Largest Losses**")
+                            st.dataframe(pd.DataFrame(cascade["top_losses"]).set_index("name"))
+                    except Exception as e:
+                        st.error(f"❌ Error during default cascade: {e}")
+            else:
+                st.warning("Please select a company to shock.")
             
 elif selected_page == "💬 NL Query":
     st.header("💬 Ask a Question about the Graph")
     query_text = st.text_input("e.g., 'Which companies have total risk > 0.5?'")
     if st.button("🔍 Run Query"):
-        if not LLM_ENABLED:
+        co_ownership_answer = None
+        if query_text.strip():
+            try:
+                co_ownership_answer = st.session_state.risk_engine.answer_co_ownership_question(query_text)
+            except Exception as e:
+                st.error(f"❌ Error answering from the co-ownership index: {e}")
+        if co_ownership_answer is not None:
+            entity_names = ", ".join(e["display"] for e in co_ownership_answer["entities"])
+            st.caption(f"⚡ Answered from the co-ownership index ({co_ownership_answer['operation']} of {entity_names}), no LLM query needed.")
+            df = pd.DataFrame(co_ownership_answer["results"])
+            if df.empty:
+                st.info("Query returned no results.")
+            else:
+                st.markdown("#### 📊 Query Result")
+                st.dataframe(df)
+                st.download_button("📥 Download CSV", df.to_csv(index=False).encode('utf-8'), file_name="query_results.csv")
+        elif not LLM_ENABLED:
             st.warning("LLM features are disabled because GEMINI_API_KEY is missing.")
         elif not query_text.strip():
             st.warning("Please enter a question.")
@@ -580,10 +860,10 @@ Do not include any comments, explanations, or extra text outside of the query it
 - Relationship Types: `OWNS`, `EXPOSED_TO`.
 # Node Properties:
 - `Company`: `id`, `name`, `sector`, `location`, `total_risk`, `direct_risk`, `dollarized_risk`, `market_cap`.
-- `Blockholder`: `id`, `name`, `type`, `total_risk`, `dollarized_risk`.
+- `Blockholder`: `id`, `name`, `type`, `total_risk`, `dollarized_risk`, `hhi_sector`, `hhi_location`, `hhi_risk_factor` (Herfindahl concentration 0-1 of look-through dollarized risk), `top_sector`, `top_location`, `top_risk_factor` and their `top_*_share`.
 - `RiskFactor`: `name`.
 # Relationship Properties:
-- `(p:Blockholder)-[o:OWNS]->(c:Company)`: `p` owns `c`. The relationship has a `percent` property (0.0-1.0), `year`.
+- `(p:Blockholder)-[o:OWNS]->(c:Company)`: `p` owns `c`. The relationship has a `percent` property (0.0-1.0) and `year` for the latest loaded year, plus `years` and `percents` (parallel lists with the per-year ownership history).
 - `(c:Company)-[e:EXPOSED_TO]->(rf:RiskFactor)`: `c` is exposed to `rf`. The relationship has a `weight` property (0.0-1.0).
 # Business Logic & Best Practices:
 - A `Company`'s `direct_risk` is the sum of all `e.weight` values from its outgoing `EXPOSED_TO` relationships.
@@ -620,7 +900,7 @@ Now, translate the following natural language question into a valid, standalone
                         st.code(cypher_query, language="cypher")
                         
                         memgraph_client = Memgraph()
-                        results = memgraph_client.execute_and_fetch(cypher_query)
+                        results = execute_and_fetch(memgraph_client, cypher_query, name="app.nl_query")
                         
                         # --- FIX: Check for results before creating DataFrame ---
                         if results:
@@ -9,6 +9,10 @@ MEMGRAPH_URI = os.getenv("MEMGRAPH_URI", "bolt://localhost:7687")
 MEMGRAPH_USER = os.getenv("MEMGRAPH_USER", "neo4j")
 MEMGRAPH_PASSWORD = os.getenv("MEMGRAPH_PASSWORD", "password")
 
+# --- Graph Backend ---
+# "memgraph" (default) or "memory" for the in-process CSR graph store (no database needed).
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "memgraph")
+
 # --- File Paths ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -19,15 +23,75 @@ BLOCKHOLDERS_CSV = os.path.join(DATA_DIR, 'blockholders.csv')
 MARKET_CAP_CSV = os.path.join(DATA_DIR, 'market_cap.csv')
 CIK_TICKER_MAP_CSV = os.path.join(DATA_DIR, 'cik_ticker_map.csv')
 FEMA_RISK_MAP_CSV = os.path.join(DATA_DIR, 'fema_risk_by_location.csv')
+MARKET_CAP_HISTORY_DIR = os.path.join(DATA_DIR, 'market_cap_history')
+FACTOR_COVARIANCE_CSV = os.path.join(DATA_DIR, 'factor_covariance.csv')
+SYNTHETIC_BLOCKHOLDERS_CSV = os.path.join(DATA_DIR, 'synthetic_blockholders.csv')
+OWNERSHIP_INDEX_DIR = os.path.join(OUTPUT_DIR, 'ownership_index')
+LOAD_CHECKPOINT_DIR = os.path.join(OUTPUT_DIR, 'load_checkpoints')
+IN_MEMORY_GRAPH_DIR = os.path.join(OUTPUT_DIR, 'graph_store')
+IN_MEMORY_JOURNAL = os.path.join(IN_MEMORY_GRAPH_DIR, 'scenario_journal.json')
 
 OUTPUT_RISK_EXPOSURES_CSV = os.path.join(OUTPUT_DIR, "company_risk_exposures.csv")
 OUTPUT_METADATA_ENRICHED_CSV = os.path.join(OUTPUT_DIR, "company_metadata_enriched.csv")
 
+# Seconds an engine trusts its cached analytics before re-reading the graph version token
+# (writes by this process are noticed immediately).
+GRAPH_TOKEN_TTL_SECONDS = float(os.getenv("GRAPH_TOKEN_TTL_SECONDS", "2"))
+
 # --- Pipeline Parameters ---
 CHUNK_SIZE = 10000
+# Metadata, market cap and EXPOSED_TO reloads write only the rows that differ from the graph
+# (in pipeline runs that keep the graph, i.e. without the clear_db stage).
+RECONCILE_RELOADS = True
 MAX_RISK_ITERATIONS = 15
+MARKET_CAP_HISTORY_DAYS = 252
 RISK_CONCENTRATION_THRESHOLD = 0.3
 TOP_N_CRITICAL_NODES = 10
+RISK_OUTLIER_Z_THRESHOLD = 3.5
+TREEMAP_TOP_N_PER_SECTOR = 10
+SECTOR_DRILLDOWN_LIMIT = 500
+SEARCH_PAGE_SIZE = 25
+CASCADE_CAPITAL_RATIO = 1.0
+CASCADE_MAX_ROUNDS = 100
+CASCADE_TOP_N = 20
+INTEGRATED_OWNERSHIP_THRESHOLD = 1e-4
+CONTROL_THRESHOLD = 0.2
+CROWDING_SIMILARITY_THRESHOLD = 0.5
+CROWDING_MIN_CLUSTER_SIZE = 3
+HHI_ALERT_THRESHOLD = 0.5
+
+# --- Portfolio VaR / Expected Shortfall ---
+VAR_CONFIDENCE = 0.99
+VAR_NUM_SIMULATIONS = 10000
+FACTOR_DEFAULT_VOLATILITY = 0.2
+FACTOR_BASE_CORRELATION = 0.1
+# Estimate the factor covariance from the market cap history instead of the configured values below.
+ESTIMATE_FACTOR_COVARIANCE = False
+# Factors whose names start with one of the prefixes are correlated with each other.
+FACTOR_CORRELATION_GROUPS = {
+    "Climate": (["Climate Risk", "Hurricane Risk", "Flood Risk", "Rainfall Risk", "Winter Storm Risk", "Tornado Risk"], 0.6),
+    "Heat & Drought": (["Heat Risk", "Drought Risk", "Wildfire Risk"], 0.5),
+    "Market": (["Inherent Market Volatility", "Sector Market Risk"], 0.5),
+    "Geopolitical": (["Geopolitical Risk", "Regulatory Risk", "Supply Chain Disruption"], 0.4),
+}
+
+# --- Query Instrumentation ---
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "1000"))
+QUERY_METRICS_FILE = os.path.join(OUTPUT_DIR, 'query_metrics.prom')
+QUERY_METRICS_PORT = int(os.getenv("QUERY_METRICS_PORT", "0"))
+
+# --- Pipeline Profiling ---
+PIPELINE_PROFILE_REPORT = os.path.join(OUTPUT_DIR, 'pipeline_profile.json')
+PIPELINE_PROFILE_BASELINE = os.path.join(OUTPUT_DIR, 'pipeline_profile_baseline.json')
+PIPELINE_PROFILE_TRACEMALLOC = True
+PIPELINE_REGRESSION_THRESHOLD = 0.25  # Relative slow-down / throughput drop flagged as a regression
+PIPELINE_MAX_WORKERS = 4  # Pipeline stages running at once; graph writes are always serialized
+
+# --- Benchmarks ---
+BENCHMARK_SCALES = (10_000, 100_000, 1_000_000)  # Synthetic graph sizes in OWNS edges
+BENCHMARK_REPEATS = 5
+BENCHMARK_REPORT = os.path.join(OUTPUT_DIR, 'benchmark.json')
+BENCHMARK_REGRESSION_THRESHOLD = 0.25
 
 # --- App & UI Parameters ---
 LLM_ENABLED = True if os.getenv("GEMINI_API_KEY") else False
@@ -0,0 +1,195 @@
+import re
+
+import numpy as np
+
+
+class Bitset:
+    """
+    Compressed set of small non-negative integers. Sparse sets are stored as a sorted
+    uint32 array; once an array would take more bytes than a packed bitmap over the
+    universe (more than universe/32 members) the bitmap is used instead, as in Roaring.
+    """
+    __slots__ = ("universe", "members", "bitmap")
+
+    def __init__(self, universe, members=None, bitmap=None):
+        self.universe = universe
+        self.members = members
+        self.bitmap = bitmap
+
+    @classmethod
+    def from_indices(cls, indices, universe):
+        indices = np.unique(np.asarray(indices, dtype=np.uint32))
+        if len(indices) * 32 > universe:
+            mask = np.zeros(universe, dtype=bool)
+            mask[indices] = True
+            return cls(universe, bitmap=np.packbits(mask))
+        return cls(universe, members=indices)
+
+    @classmethod
+    def from_mask(cls, mask):
+        return cls.from_indices(np.flatnonzero(mask), len(mask))
+
+    def mask(self, universe=None):
+        universe = max(universe or 0, self.universe)
+        if self.bitmap is not None:
+            out = np.zeros(universe, dtype=bool)
+            out[:self.universe] = np.unpackbits(self.bitmap, count=self.universe).astype(bool)
+            return out
+        out = np.zeros(universe, dtype=bool)
+        out[self.members] = True
+        return out
+
+    def indices(self):
+        return np.flatnonzero(self.mask()) if self.bitmap is not None else self.members
+
+    def __len__(self):
+        if self.bitmap is not None:
+            return int(np.unpackbits(self.bitmap, count=self.universe).sum())
+        return len(self.members)
+
+    def __and__(self, other):
+        if self.members is not None and other.members is not None:
+            return Bitset(max(self.universe, other.universe), members=np.intersect1d(self.members, other.members, assume_unique=True))
+        universe = max(self.universe, other.universe)
+        return Bitset.from_mask(self.mask(universe) & other.mask(universe))
+
+    def __or__(self, other):
+        universe = max(self.universe, other.universe)
+        if self.members is not None and other.members is not None:
+            return Bitset.from_indices(np.union1d(self.members, other.members), universe)
+        return Bitset.from_mask(self.mask(universe) | other.mask(universe))
+
+    def nbytes(self):
+        return (self.bitmap if self.bitmap is not None else self.members).nbytes
+
+
+class CoOwnershipIndex:
+    """
+    Inverted co-ownership index over Blockholder -> Company OWNS edges: a compressed
+    bitset of holders per company and of holdings per blockholder. "Who owns both A and B",
+    "who owns any of A, B" and holder/holding overlap become bitset intersections and unions
+    instead of Cypher joins. Entities can be added and updated in place after loads.
+    """
+    def __init__(self):
+        self.company_ids, self.company_names, self.company_index = [], [], {}
+        self.blockholder_ids, self.blockholder_names, self.blockholder_index = [], [], {}
+        self.holders = []
+        self.holdings = []
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        snap = snapshot
+        index = cls()
+        index.company_ids, index.company_names = list(snap.company_ids), list(snap.company_names)
+        index.company_index = dict(snap.company_index)
+        index.blockholder_ids, index.blockholder_names = list(snap.blockholder_ids), list(snap.blockholder_names)
+        index.blockholder_index = dict(snap.blockholder_index)
+        mask = ~snap.owns_owner_is_company
+        index._build(snap.owns_owner[mask], snap.owns_company[mask])
+        return index
+
+    def _build(self, owners, companies):
+        num_companies, num_blockholders = len(self.company_ids), len(self.blockholder_ids)
+        order = np.argsort(companies, kind="stable")
+        bounds = np.searchsorted(companies[order], np.arange(num_companies + 1))
+        self.holders = [Bitset.from_indices(owners[order[bounds[c]:bounds[c + 1]]], num_blockholders) for c in range(num_companies)]
+        order = np.argsort(owners, kind="stable")
+        bounds = np.searchsorted(owners[order], np.arange(num_blockholders + 1))
+        self.holdings = [Bitset.from_indices(companies[order[bounds[b]:bounds[b + 1]]], num_companies) for b in range(num_blockholders)]
+
+    def _intern(self, node_id, name, ids, names, index, bitsets):
+        if node_id not in index:
+            index[node_id] = len(ids)
+            ids.append(node_id)
+            names.append(name if name is not None else node_id)
+            bitsets.append(Bitset.from_indices([], 0))
+        return index[node_id]
+
+    def update_companies(self, rows):
+        """
+        Replaces the holder sets of the given companies in place.
+        rows: iterable of {'company_id', 'company_name', 'holders': [{'id', 'name'}]}.
+        Unknown companies/blockholders are added; affected blockholder holding sets are patched.
+        """
+        for row in rows:
+            c = self._intern(row["company_id"], row.get("company_name"), self.company_ids, self.company_names, self.company_index, self.holders)
+            new = [self._intern(h["id"], h.get("name"), self.blockholder_ids, self.blockholder_names, self.blockholder_index, self.holdings)
+                   for h in row["holders"]]
+            old = self.holders[c].indices().tolist()
+            self.holders[c] = Bitset.from_indices(new, len(self.blockholder_ids))
+            new_set = set(new)
+            for b in set(old) ^ new_set:
+                members = self.holdings[b].indices()
+                members = np.union1d(members, [c]) if b in new_set else np.setdiff1d(members, [c])
+                self.holdings[b] = Bitset.from_indices(members, len(self.company_ids))
+
+    def _rows(self, bitset, ids, names):
+        return [{"id": ids[i], "name": names[i]} for i in bitset.indices().tolist()]
+
+    def _company_sets(self, company_ids):
+        return [self.holders[self.company_index[cid]] for cid in company_ids if cid in self.company_index]
+
+    def common_holders(self, company_ids) -> list:
+        """Blockholders holding every one of company_ids."""
+        sets = self._company_sets(company_ids)
+        if not sets or len(sets) < len(company_ids):
+            return []
+        result = sets[0]
+        for s in sorted(sets[1:], key=len):
+            result = result & s
+        return self._rows(result, self.blockholder_ids, self.blockholder_names)
+
+    def any_holders(self, company_ids) -> list:
+        """Blockholders holding at least one of company_ids."""
+        result = Bitset.from_indices([], len(self.blockholder_ids))
+        for s in self._company_sets(company_ids):
+            result = result | s
+        return self._rows(result, self.blockholder_ids, self.blockholder_names)
+
+    def common_holdings(self, blockholder_ids) -> list:
+        """Companies held by every one of blockholder_ids."""
+        sets = [self.holdings[self.blockholder_index[bid]] for bid in blockholder_ids if bid in self.blockholder_index]
+        if not sets or len(sets) < len(blockholder_ids):
+            return []
+        result = sets[0]
+        for s in sorted(sets[1:], key=len):
+            result = result & s
+        return self._rows(result, self.company_ids, self.company_names)
+
+    def overlap(self, first_id, second_id) -> dict:
+        """Shared count and Jaccard overlap of two companies' holders or two blockholders' holdings."""
+        if first_id in self.company_index and second_id in self.company_index:
+            a, b = self.holders[self.company_index[first_id]], self.holders[self.company_index[second_id]]
+        elif first_id in self.blockholder_index and second_id in self.blockholder_index:
+            a, b = self.holdings[self.blockholder_index[first_id]], self.holdings[self.blockholder_index[second_id]]
+        else:
+            return None
+        shared, either = len(a & b), len(a | b)
+        return {"shared": shared, "first": len(a), "second": len(b), "jaccard": shared / either if either else 0.0}
+
+    def nbytes(self):
+        return sum(s.nbytes() for s in self.holders) + sum(s.nbytes() for s in self.holdings)
+
+
+_CO_OWNERSHIP_PATTERNS = [
+    ("common_holders", re.compile(r"\bblockholders?\b.*\b(?:own|hold)s?\b.*\b(?:both|all of)\s+(?P<names>.+)$", re.I)),
+    ("any_holders", re.compile(r"\bblockholders?\b.*\b(?:own|hold)s?\b.*\b(?:either|any of)\s+(?P<names>.+)$", re.I)),
+    ("common_holdings", re.compile(r"\bcompanies\b.*\b(?:owned|held)\s+by\s+(?:both|all of)\s+(?P<names>.+)$", re.I)),
+]
+
+
+def parse_co_ownership_question(question):
+    """
+    Recognizes co-ownership questions the index can answer directly, e.g.
+    "Find all blockholders who own a stake in both Apple Inc. and Microsoft Corp.".
+    Returns (operation, [entity names]) or None.
+    """
+    text = question.strip().rstrip("?.!").strip()
+    for operation, pattern in _CO_OWNERSHIP_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            names = [n.strip().strip("'\"").strip() for n in re.split(r",\s*(?:and\s+|or\s+)?|\s+and\s+|\s+or\s+", match.group("names"))]
+            names = [n for n in names if n]
+            if len(names) >= 2:
+                return operation, names
+    return None
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from modules.risk_sensitivity import ownership_matrix
+from modules.portfolio_risk import factor_exposure_matrix
+
+DIMENSIONS = ("sector", "location", "risk_factor")
+
+
+def _grouped_company_risk(snapshot, group_values):
+    """Blockholder x group look-through dollarized risk: P @ (dollarized_risk one-hot by group)."""
+    snap = snapshot
+    codes, names = pd.factorize(pd.Series(group_values).fillna("N/A"))
+    company_groups = sp.csr_matrix(
+        (snap.company_dollarized_risk, (np.arange(snap.num_companies), codes)),
+        shape=(snap.num_companies, len(names)),
+    )
+    return (ownership_matrix(snap) @ company_groups).tocsr(), list(names)
+
+
+def herfindahl(matrix):
+    """
+    Per-row Herfindahl index (sum of squared shares), top column and its share of a
+    non-negative CSR matrix. Rows summing to zero get HHI 0 and top column -1.
+    """
+    matrix = matrix.tocsr()
+    matrix.eliminate_zeros()
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(totals[rows] > 0, matrix.data / totals[rows], 0.0)
+    hhi = np.bincount(rows, weights=shares ** 2, minlength=matrix.shape[0])
+    top = np.asarray(matrix.argmax(axis=1)).ravel()
+    top_value = np.asarray(matrix.max(axis=1).todense()).ravel()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        top_share = np.where(totals > 0, top_value / totals, 0.0)
+    top = np.where(totals > 0, top, -1)
+    return hhi, top, top_share
+
+
+def blockholder_concentration(snapshot) -> pd.DataFrame:
+    """
+    Concentration of every Blockholder's look-through dollarized risk across sectors,
+    locations and risk factors, computed for all blockholders at once from grouped sparse
+    products. One row per blockholder with hhi_<dim>, top_<dim> and top_<dim>_share columns.
+    """
+    snap = snapshot
+    frame = pd.DataFrame({"id": snap.blockholder_ids, "name": snap.blockholder_names,
+                          "dollarized_risk": snap.blockholder_dollarized_risk})
+    matrices = {
+        "sector": _grouped_company_risk(snap, snap.company_sectors),
+        "location": _grouped_company_risk(snap, snap.company_locations),
+        # Risk factor contributions: sum_c P_bc * market_cap_c * weight_cr.
+        "risk_factor": (factor_exposure_matrix(snap), list(snap.risk_factor_names)),
+    }
+    for dimension in DIMENSIONS:
+        matrix, names = matrices[dimension]
+        hhi, top, top_share = herfindahl(matrix)
+        frame[f"hhi_{dimension}"] = hhi
+        frame[f"top_{dimension}"] = [names[t] if t >= 0 else None for t in top]
+        frame[f"top_{dimension}_share"] = top_share
+    return frame
@@ -0,0 +1,93 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def impact_matrix(snapshot, capital_ratio=1.0):
+    """
+    DebtRank impact matrix over all nodes (companies first, then blockholders).
+    W[j, i] = percent_ji * market_cap_i / capital_j is the fraction of owner j's capital
+    lost when company i loses all of its value, where capital = capital_ratio * value,
+    a company's value is its market cap and a blockholder's is the value of its holdings.
+    Returns (W as CSR, value per node).
+    """
+    snap = snapshot
+    num_companies = snap.num_companies
+    owner = np.where(snap.owns_owner_is_company, snap.owns_owner, snap.owns_owner + num_companies)
+    holding_value = snap.owns_percent * snap.market_cap[snap.owns_company]
+    value = np.concatenate([
+        snap.market_cap,
+        np.bincount(snap.owns_owner[~snap.owns_owner_is_company], weights=holding_value[~snap.owns_owner_is_company],
+                    minlength=snap.num_blockholders),
+    ])
+    capital = capital_ratio * value[owner]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(capital > 0, holding_value / capital, 0.0)
+    num_nodes = num_companies + snap.num_blockholders
+    W = sp.csr_matrix((weights, (owner, snap.owns_company)), shape=(num_nodes, num_nodes))
+    return W, value
+
+
+def simulate_cascade(snapshot, shocks, capital_ratio=1.0, max_rounds=100, tolerance=1e-9, W=None, value=None):
+    """
+    Runs a DebtRank-style distress cascade to its fixed point. `shocks` maps company id to
+    the initial fraction of value lost (1.0 = default). Each round every node absorbs
+    W @ (change in its holdings' distress over the last round), capped at 1, so losses
+    travel up OWNS edges (including Company -> Company cross-holdings and cycles)
+    until no node's distress changes by more than `tolerance`.
+
+    Returns 'rounds' (per-round stats), per-node 'distress', 'loss', 'first_distressed_round'
+    and 'default_round' arrays (companies first, then blockholders; -1 = never), and totals.
+    """
+    snap = snapshot
+    if W is None or value is None:
+        W, value = impact_matrix(snap, capital_ratio)
+    num_nodes = W.shape[0]
+
+    h0 = np.zeros(num_nodes)
+    for company_id, fraction in shocks.items():
+        if company_id in snap.company_index:
+            h0[snap.company_index[company_id]] = min(max(float(fraction), 0.0), 1.0)
+
+    first_distressed = np.where(h0 > 0, 0, -1)
+    default_round = np.where(h0 >= 1.0, 0, -1)
+    h_prev = np.zeros(num_nodes)
+    h = h0.copy()
+    rounds = []
+    converged = False
+    for round_number in range(1, max_rounds + 1):
+        h_next = np.minimum(1.0, h + W @ (h - h_prev))
+        if (h_next - h).max(initial=0.0) <= tolerance:
+            converged = True
+            break
+        h_prev, h = h, h_next
+        newly_distressed = (h > tolerance) & (first_distressed < 0)
+        newly_defaulted = (h >= 1.0) & (default_round < 0)
+        first_distressed[newly_distressed] = round_number
+        default_round[newly_defaulted] = round_number
+        rounds.append({
+            "round": round_number,
+            "newly_distressed": int(newly_distressed.sum()),
+            "newly_defaulted": int(newly_defaulted.sum()),
+            "round_loss": float(((h - h_prev) * value).sum()),
+        })
+
+    loss = h * value
+    num_companies = snap.num_companies
+    company_value = value[:num_companies].sum()
+    induced_company_loss = float(((h - h0)[:num_companies] * value[:num_companies]).sum())
+    return {
+        "rounds": rounds,
+        "converged": converged,
+        "distress": h,
+        "loss": loss,
+        "first_distressed_round": first_distressed,
+        "default_round": default_round,
+        "initial_loss": float((h0 * value).sum()),
+        "induced_company_loss": induced_company_loss,
+        "company_loss": float(loss[:num_companies].sum()),
+        "blockholder_loss": float(loss[num_companies:].sum()),
+        # DebtRank: value lost beyond the initial shock, as a share of total company value.
+        "systemic_impact": induced_company_loss / company_value if company_value > 0 else 0.0,
+        "num_distressed": int((h > tolerance).sum()),
+        "num_defaulted": int((h >= 1.0).sum()),
+    }
@@ -0,0 +1,162 @@
+import numpy as np
+import scipy.sparse as sp
+
+from modules.risk_sensitivity import ownership_matrix
+
+# Mersenne prime 2^31 - 1 for the universal hash family h(x) = (a * x + b) mod p.
+_PRIME = np.uint64(2147483647)
+
+
+def minhash_signatures(holdings, num_hashes=64, seed=42, max_nnz_per_batch=200000):
+    """
+    MinHash signatures (rows x num_hashes, uint32) of the column sets of a binary CSR matrix,
+    computed with vectorized min-reductions over each row's hashed columns. Rows without any
+    column get the maximum value so they never collide with non-empty rows.
+    """
+    holdings = holdings.tocsr()
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size=num_hashes, dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), size=num_hashes, dtype=np.uint64)
+    column_hashes = ((np.arange(holdings.shape[1], dtype=np.uint64)[:, None] * a + b) % _PRIME).astype(np.uint32)
+
+    signatures = np.full((holdings.shape[0], num_hashes), np.iinfo(np.uint32).max, dtype=np.uint32)
+    indptr = holdings.indptr
+    row = 0
+    while row < holdings.shape[0]:
+        end = int(np.searchsorted(indptr, indptr[row] + max_nnz_per_batch, side="right")) - 1
+        end = min(max(end, row + 1), holdings.shape[0])
+        starts = indptr[row:end]
+        nonempty = np.flatnonzero(indptr[row + 1:end + 1] > starts)
+        if len(nonempty):
+            hashed = column_hashes[holdings.indices[indptr[row]:indptr[end]]]
+            reduced = np.minimum.reduceat(hashed, starts[nonempty] - indptr[row], axis=0)
+            signatures[row + nonempty] = reduced
+        row = end
+    return signatures
+
+
+def lsh_candidate_pairs(signatures, bands=16, max_bucket_size=200, seed=7):
+    """
+    Candidate similar pairs from banded LSH: rows whose signatures agree on every value of
+    at least one band share a bucket. Buckets up to max_bucket_size contribute all pairs;
+    larger buckets contribute consecutive pairs only, which keeps them connected without
+    a quadratic blow-up. Returns a unique (i, j) pair array with i < j.
+    """
+    num_rows, num_hashes = signatures.shape
+    rows_per_band = num_hashes // bands
+    multipliers = np.random.default_rng(seed).integers(1, 2 ** 61, size=rows_per_band, dtype=np.uint64)
+    empty = (signatures == np.iinfo(np.uint32).max).all(axis=1)
+    pairs = []
+    for band in range(bands):
+        block = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        keys = (block * multipliers).sum(axis=1)
+        members = np.flatnonzero(~empty)
+        order = members[np.argsort(keys[members], kind="stable")]
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(order)]])
+        sizes = ends - starts
+        # Consecutive pairs within every bucket (covers large buckets).
+        same = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+        pairs.append(np.stack([order[same], order[same + 1]], axis=1))
+        # All remaining pairs within small buckets.
+        for size in np.unique(sizes[(sizes > 2) & (sizes <= max_bucket_size)]):
+            bucket_starts = starts[sizes == size]
+            i, j = np.triu_indices(size, k=2)
+            pairs.append(np.stack([order[bucket_starts[:, None] + i].ravel(), order[bucket_starts[:, None] + j].ravel()], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(pairs).astype(np.int64)
+    pairs.sort(axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def label_propagation(num_nodes, edges, weights, max_iterations=20, seed=0):
+    """
+    Weighted label propagation over an undirected edge list, vectorized: every round each node
+    takes the label with the largest total edge weight among its neighbours (its own label
+    counts with half its strongest edge weight, which damps oscillation). Returns community
+    labels renumbered 0..k-1.
+    """
+    labels = np.arange(num_nodes)
+    if len(edges) == 0:
+        return labels
+    src = np.concatenate([edges[:, 0], edges[:, 1]])
+    dst = np.concatenate([edges[:, 1], edges[:, 0]])
+    w = np.concatenate([weights, weights])
+    self_weight = np.zeros(num_nodes)
+    np.maximum.at(self_weight, src, w / 2.0)
+    rng = np.random.default_rng(seed)
+    jitter = rng.random(num_nodes) * 1e-9
+    nodes_with_edges = np.unique(src)
+    for _ in range(max_iterations):
+        votes = sp.coo_matrix(
+            (np.concatenate([w, self_weight[nodes_with_edges]]),
+             (np.concatenate([src, nodes_with_edges]), np.concatenate([labels[dst], labels[nodes_with_edges]]))),
+            shape=(num_nodes, num_nodes),
+        ).tocsr()
+        votes.sum_duplicates()
+        # Tiny per-label jitter breaks ties deterministically.
+        votes.data = votes.data + jitter[votes.indices]
+        best = np.asarray(votes.argmax(axis=1)).ravel()
+        new_labels = labels.copy()
+        new_labels[nodes_with_edges] = best[nodes_with_edges]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels
+
+
+def crowding_clusters(snapshot, num_hashes=64, bands=16, similarity_threshold=0.5, min_cluster_size=3,
+                      min_holdings=2, top_holdings=5, max_bucket_size=200):
+    """
+    Groups blockholders with overlapping holdings ("crowded trades"):
+      1. binary blockholder x company holdings from the OWNS matrix,
+      2. MinHash signatures + banded LSH for candidate pairs (no all-pairs comparison),
+      3. pairs kept when their estimated Jaccard similarity >= similarity_threshold,
+      4. label propagation communities on that similarity graph.
+    Blockholders with fewer than min_holdings companies are left out.
+    Returns clusters of at least min_cluster_size members, largest aggregate dollarized risk first.
+    """
+    snap = snapshot
+    holdings = ownership_matrix(snap)
+    holdings.data = (holdings.data > 0).astype(float)
+    holdings.eliminate_zeros()
+    signatures = minhash_signatures(holdings, num_hashes=num_hashes)
+    signatures[np.diff(holdings.indptr) < min_holdings] = np.iinfo(np.uint32).max
+    pairs = lsh_candidate_pairs(signatures, bands=bands, max_bucket_size=max_bucket_size)
+    if len(pairs):
+        similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        keep = similarity >= similarity_threshold
+        pairs, similarity = pairs[keep], similarity[keep]
+    else:
+        similarity = np.empty(0)
+    labels = label_propagation(snap.num_blockholders, pairs, similarity)
+
+    sizes = np.bincount(labels)
+    risk = np.bincount(labels, weights=snap.blockholder_dollarized_risk)
+    pair_labels = labels[pairs[:, 0]] if len(pairs) else np.empty(0, dtype=np.int64)
+    internal = (labels[pairs[:, 1]] == pair_labels) if len(pairs) else np.empty(0, dtype=bool)
+    similarity_sum = np.bincount(pair_labels[internal], weights=similarity[internal], minlength=len(sizes))
+    similarity_count = np.bincount(pair_labels[internal], minlength=len(sizes))
+
+    order = np.argsort(labels, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    clusters = []
+    for label in np.flatnonzero(sizes >= min_cluster_size):
+        members = order[bounds[label]:bounds[label + 1]]
+        held_companies, holder_counts = np.unique(holdings[members].indices, return_counts=True)
+        top = np.argsort(-holder_counts, kind="stable")[:top_holdings]
+        clusters.append({
+            "size": int(sizes[label]),
+            "dollarized_risk": float(risk[label]),
+            "mean_similarity": float(similarity_sum[label] / similarity_count[label]) if similarity_count[label] else 0.0,
+            "members": [{"id": snap.blockholder_ids[i], "name": snap.blockholder_names[i],
+                         "dollarized_risk": float(snap.blockholder_dollarized_risk[i])} for i in members],
+            "top_holdings": [{"id": snap.company_ids[held_companies[k]], "name": snap.company_names[held_companies[k]],
+                              "holders": int(holder_counts[k])} for k in top],
+        })
+    clusters.sort(key=lambda c: -c["dollarized_risk"])
+    return clusters
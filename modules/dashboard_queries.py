@@ -0,0 +1,40 @@
+# Cypher issued directly by the dashboard, shared with the benchmark suite so both time the same queries.
+
+TOP_COMPANIES_QUERY = """
+    MATCH (c:Company) WHERE c.dollarized_risk IS NOT NULL AND c.dollarized_risk > 0
+    RETURN c.name AS Name, c.dollarized_risk AS DollarizedRisk
+    ORDER BY DollarizedRisk DESC LIMIT 10
+"""
+
+TOP_BLOCKHOLDERS_QUERY = """
+    MATCH (b:Blockholder) WHERE b.dollarized_risk IS NOT NULL AND b.dollarized_risk > 0
+    RETURN b.name AS Name, b.dollarized_risk AS DollarizedRisk
+    ORDER BY DollarizedRisk DESC LIMIT 10
+"""
+
+
+# Neighbourhood of a Company rendered on the Company/Blockholder View (parameter: $company_id).
+COMPANY_GRAPH_QUERY = """
+    MATCH (c:Company {id: $company_id})
+    OPTIONAL MATCH (bh:Blockholder)-[o:OWNS]->(c)
+    OPTIONAL MATCH (c)-[o2:OWNS]->(owned_c:Company)
+    OPTIONAL MATCH (owned_c)-[o3:OWNS]->(sub_owned_c:Company)
+    OPTIONAL MATCH (c)-[e1:EXPOSED_TO]->(rf1:RiskFactor)
+    OPTIONAL MATCH (owned_c)-[e2:EXPOSED_TO]->(rf2:RiskFactor)
+    OPTIONAL MATCH (sub_owned_c)-[e3:EXPOSED_TO]->(rf3:RiskFactor)
+    RETURN c, bh, o, owned_c, o2, sub_owned_c, o3, rf1, e1, rf2, e2, rf3, e3
+    LIMIT 100
+"""
+
+# Holdings of a Blockholder (three levels deep) rendered on the Company/Blockholder View (parameter: $blockholder_id).
+BLOCKHOLDER_GRAPH_QUERY = """
+    MATCH (bh:Blockholder {id: $blockholder_id})
+    OPTIONAL MATCH (bh)-[o1:OWNS]->(c1:Company)
+    OPTIONAL MATCH (c1)-[o2:OWNS]->(c2:Company)
+    OPTIONAL MATCH (c2)-[o3:OWNS]->(c3:Company)
+    OPTIONAL MATCH (c1)-[e1:EXPOSED_TO]->(rf1:RiskFactor)
+    OPTIONAL MATCH (c2)-[e2:EXPOSED_TO]->(rf2:RiskFactor)
+    OPTIONAL MATCH (c3)-[e3:EXPOSED_TO]->(rf3:RiskFactor)
+    RETURN bh, o1, c1, o2, c2, o3, c3, e1, rf1, e2, rf2, e3, rf3
+    LIMIT 200
+"""
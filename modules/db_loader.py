@@ -1,19 +1,121 @@
 import pandas as pd
-from neo4j import GraphDatabase
 import os
+import uuid
 from dotenv import load_dotenv
 from gqlalchemy import Node, Relationship
+from modules.query_metrics import instrumented_driver
+from modules.load_checkpoint import LoadCheckpoint
+from modules.reconcile import diff_properties, diff_edges
 
 # Load environment variables (from project root .env)
 load_dotenv()
 
+TRANSPORTS = ("columns", "records")
+
+
+def unwind_rows(columns, transport="columns") -> str:
+    """
+    Cypher prefix binding `row` for every input row. The "columns" transport sends one
+    typed list per column and zips them server-side by index, which avoids building and
+    packing one Python dict per row; "records" is the list-of-dicts form.
+    """
+    if transport == "records":
+        return "UNWIND $records AS row"
+    fields = ", ".join(f"{column}: ${column}[i]" for column in columns)
+    return f"UNWIND range(0, size(${columns[0]}) - 1) AS i\nWITH {{{fields}}} AS row"
+
+
+def touch_graph_version(session) -> str:
+    """
+    Records that the graph changed by giving the GraphVersion node a new random token.
+    Engines compare it with the token their cached analytics were built from, so writes by
+    any loader or process invalidate them. Returns the new token.
+    """
+    global _local_graph_writes
+    _local_graph_writes += 1
+    token = uuid.uuid4().hex
+    session.run("MERGE (v:GraphVersion) SET v.token = $token", token=token).consume()
+    return token
+
+
+# Graph writes issued by this process, so its engines notice them without waiting for the token TTL.
+_local_graph_writes = 0
+
+
+def local_graph_writes() -> int:
+    return _local_graph_writes
+
+
+def read_graph_version(session):
+    """The current GraphVersion token, or None if the graph was never written through a loader or engine."""
+    record = session.run("MATCH (v:GraphVersion) RETURN v.token AS token").single()
+    return record["token"] if record else None
+
+
+def apply_market_cap_deltas(tx, rows):
+    """
+    Sets new market caps (rows of {company_id, market_cap}) and keeps dollarized risk current
+    without a full dollarize_risk() pass: each changed Company's dollarized_risk becomes
+    total_risk * market_cap, and the difference to its previous value is added to its
+    Blockholder owners (times percent) and RiskFactors (times weight).
+    Returns (changed companies, updated blockholders, updated risk factors).
+    """
+    deltas = tx.run("""
+        UNWIND $rows AS row
+        MATCH (c:Company {id: row.company_id})
+        WITH c, toFloat(row.market_cap) AS new_cap, coalesce(c.market_cap, 0) AS old_cap
+        WHERE new_cap <> old_cap
+        WITH c, new_cap, coalesce(c.dollarized_risk, 0) AS old_dollars, coalesce(c.total_risk, 0) * new_cap AS new_dollars
+        SET c.market_cap = new_cap,
+            c.dollarized_risk = new_dollars
+        RETURN c.id AS company_id, new_dollars - old_dollars AS delta
+    """, rows=rows).data()
+    deltas = [d for d in deltas if d["delta"] != 0]
+    if not deltas:
+        return 0, 0, 0
+    owners = tx.run("""
+        UNWIND $deltas AS d
+        MATCH (bh:Blockholder)-[o:OWNS]->(c:Company {id: d.company_id})
+        WITH bh, sum(coalesce(o.percent, 0) * d.delta) AS delta
+        SET bh.dollarized_risk = coalesce(bh.dollarized_risk, 0) + delta
+        RETURN count(bh) AS updated
+    """, deltas=deltas).single()["updated"]
+    factors = tx.run("""
+        UNWIND $deltas AS d
+        MATCH (c:Company {id: d.company_id})-[e:EXPOSED_TO]->(rf:RiskFactor)
+        WITH rf, sum(coalesce(e.weight, 0) * d.delta) AS delta
+        SET rf.dollarized_risk = coalesce(rf.dollarized_risk, 0) + delta
+        RETURN count(rf) AS updated
+    """, deltas=deltas).single()["updated"]
+    return len(deltas), owners, factors
+
+
+def unwind_params(frame, columns, transport="columns") -> dict:
+    """Query parameters for unwind_rows(): one list per column, or a single list of row dicts."""
+    if transport == "records":
+        return {"records": frame[columns].to_dict(orient="records")}
+    return {column: frame[column].tolist() for column in columns}
+
+
 class DBLoader:
     """
     Handles all data loading and initial enrichment into Memgraph.
     Now loads blockholder data, enriched company metadata, and risk exposures
     from CSVs generated by data_enricher.py.
     """
-    def __init__(self, uri=None, user=None, password=None):
+    # Committed Memgraph transactions are durable, so chunk checkpoints are written right away.
+    _checkpoint_autosave = True
+    OWNERSHIP_COLUMNS = ["blockholder_id_graph", "blockholder_name", "company_id_graph", "company_name",
+                         "ownership_percent", "year", "block_type", "files_13F"]
+    EXPOSURE_KEYS = ["company_id", "risk_factor"]
+    _MERGE_EXPOSURE_QUERY = """
+        MATCH (c:Company {id: row.company_id})
+        MERGE (r:RiskFactor {name: row.risk_factor})
+        MERGE (c)-[e:EXPOSED_TO]->(r)
+        SET e.weight = toFloat(row.risk_weight)
+    """
+
+    def __init__(self, uri=None, user=None, password=None, checkpoint_dir="output/load_checkpoints", transport="columns"):
         self.uri = uri or os.getenv("MEMGRAPH_URI")
         self.user = user or os.getenv("MEMGRAPH_USER")
         self.password = password or os.getenv("MEMGRAPH_PASSWORD")
@@ -22,33 +124,87 @@ class DBLoader:
             raise ValueError("Memgraph connection details (URI, USER, PASSWORD) are required in .env file.")
 
         try:
-            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            self.driver = instrumented_driver(self.uri, (self.user, self.password))
             self.driver.verify_connectivity()
             print(f"INFO: DBLoader connected to Memgraph at {self.uri}.")
         except Exception as e:
             print(f"ERROR: DBLoader failed to connect to Memgraph at {self.uri}. Ensure Memgraph is running. Error: {e}")
             raise
+        self._init_state(checkpoint_dir, transport)
+
+    def _init_state(self, checkpoint_dir, transport):
+        # Rows written by the most recent load_* call, for pipeline throughput reporting.
+        self.last_rows_loaded = 0
+        # Insert/update/delete counts of the most recent reconciling load.
+        self.last_delta = None
+        self.checkpoint_dir = checkpoint_dir
+        self._checkpoints = []
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown loader transport {transport!r}; expected one of {', '.join(TRANSPORTS)}.")
+        self.transport = transport
 
     def close(self):
         if self.driver:
             self.driver.close()
             print("INFO: DBLoader connection closed.")
 
-    def load_blockholders(self, csv_file_path, chunk_size=10000, start_year=2020, end_year=2023):
+    def _touch_graph_version(self):
+        """
+        Invalidates engine caches after a load. Runs in the loads' `finally`, so a failure here
+        (e.g. Memgraph unreachable) is logged rather than raised over the load's own error.
+        """
+        try:
+            with self.driver.session() as session:
+                touch_graph_version(session)
+        except Exception as e:
+            print(f"WARNING: Could not update the graph version token; engines may serve cached results until the next write: {e}")
+
+    def _open_checkpoint(self, csv_file_path, **params):
+        checkpoint = LoadCheckpoint(self.checkpoint_dir, csv_file_path, params, autosave=self._checkpoint_autosave)
+        self._checkpoints.append(checkpoint)
+        return checkpoint
+
+    def load_blockholders(self, csv_file_path, chunk_size=10000, start_year=2020, end_year=2023, resume=False):
         """
         Loads the Blockholder dataset into Memgraph, filtering by a specific year range.
         Creates/merges Blockholder and Company nodes, and OWNS relationships.
+        Every committed chunk is recorded in a checkpoint manifest; with resume=True, chunks
+        committed by an earlier (interrupted) load of the same file are skipped.
         """
         print(f"\n--- Starting to load Blockholder data from: {csv_file_path} (filtered for years {start_year}-{end_year}) ---")
+        self.last_rows_loaded = 0
         total_rows_processed = 0
 
         try:
-            for i, chunk_df in enumerate(pd.read_csv(csv_file_path, chunksize=chunk_size)):
+            checkpoint = self._open_checkpoint(csv_file_path, chunk_size=chunk_size, start_year=start_year, end_year=end_year)
+            first_chunk = 0
+            if resume and checkpoint.matched:
+                if checkpoint.completed:
+                    print(f"INFO: {csv_file_path} was already loaded completely ({checkpoint.rows_loaded} rows); nothing to resume.")
+                    print("--- Finished loading 0 Blockholder data (filtered). ---")
+                    return
+                # Committed leading chunks are skipped without parsing them; later ones are skipped per chunk.
+                first_chunk = checkpoint.committed_prefix()
+                print(f"INFO: Resuming load: {len(checkpoint.committed)} chunks ({checkpoint.rows_loaded} rows) already committed, continuing at chunk {first_chunk + 1}.")
+            else:
+                if resume:
+                    print(f"WARNING: No matching load checkpoint for {csv_file_path} (file or load parameters changed); loading from the start.")
+                checkpoint.committed.clear()
+                checkpoint.rows_loaded = 0
+                checkpoint.completed = False
+
+            skipped_rows = first_chunk * chunk_size
+            reader = pd.read_csv(csv_file_path, chunksize=chunk_size,
+                                 skiprows=(lambda row: 0 < row <= skipped_rows) if skipped_rows else None)
+            for i, chunk_df in enumerate(reader, start=first_chunk):
+                if i in checkpoint:
+                    continue
                 print(f"INFO: Processing chunk {i+1} (approx. {len(chunk_df)} rows)...")
 
                 chunk_df_processed = chunk_df.dropna(subset=['blockholder_CIK', 'company_CIK', 'year']).copy()
                 if chunk_df_processed.empty:
                     print(f"WARNING: Chunk {i+1} empty after dropping NaNs. Skipping.")
+                    checkpoint.mark(i, 0)
                     continue
 
                 chunk_df_processed['blockholder_CIK'] = chunk_df_processed['blockholder_CIK'].astype(str).str.strip()
@@ -72,35 +228,171 @@ class DBLoader:
                 if len(chunk_df_processed) < initial_rows_in_chunk:
                     print(f"INFO: Filtered out {initial_rows_in_chunk - len(chunk_df_processed)} rows from chunk {i+1} outside {start_year}-{end_year}.")
 
-                records_to_load = chunk_df_processed[[
-                    "blockholder_id_graph", "blockholder_name",
-                    "company_id_graph", "company_name",
-                    "ownership_percent", "year", "block_type", "files_13F"
-                ]].to_dict(orient="records")
+                batch = chunk_df_processed[self.OWNERSHIP_COLUMNS]
 
-                if not records_to_load:
+                if batch.empty:
                     print(f"WARNING: No valid records to load in chunk {i+1} after preprocessing/filtering. Skipping.")
+                    checkpoint.mark(i, 0)
                     continue
 
-                with self.driver.session() as session:
-                    session.write_transaction(self._create_blockholder_ownership_batch, records_to_load)
-                    total_rows_processed += len(records_to_load)
-                    print(f"INFO: Successfully processed {len(records_to_load)} records in chunk {i+1}. Total rows loaded: {total_rows_processed}")
+                self._write_ownership_batch(batch)
+                checkpoint.mark(i, len(batch))
+                total_rows_processed += len(batch)
+                print(f"INFO: Successfully processed {len(batch)} records in chunk {i+1}. Total rows loaded: {total_rows_processed}")
         except FileNotFoundError:
             print(f"ERROR: CSV file not found at: {csv_file_path}. Please check the path.")
             raise
         except Exception as e:
             print(f"FATAL ERROR: An unexpected error occurred during Blockholder CSV loading: {e}")
             raise
+        finally:
+            self._touch_graph_version()
 
+        checkpoint.complete()
         print(f"--- Finished loading {total_rows_processed} Blockholder data (filtered). ---")
+        self.last_rows_loaded = total_rows_processed
+
+    # --- Storage hooks: the Memgraph writes below are overridden by the in-process backend ---
+
+    def clear_database(self):
+        """Deletes every node and relationship, drops the load checkpoints and (re)creates the lookup indexes."""
+        print("--- Clearing all data from Memgraph ---")
+        with self.driver.session() as session:
+            session.run("MATCH (n) DETACH DELETE n").consume()
+        LoadCheckpoint.clear_all(self.checkpoint_dir)
+        print("--- Database cleared. ---")
+        print("--- Creating indexes for faster data loading ---")
+        with self.driver.session() as session:
+            session.run("CREATE INDEX ON :Company(id)")
+            session.run("CREATE INDEX ON :Blockholder(id)")
+            session.run("CREATE INDEX ON :RiskFactor(name)")
+            session.run("CREATE INDEX ON :Company(sector)")
+        print("--- Indexes created. ---")
+        self._touch_graph_version()
+
+    def _run_unwind(self, body, frame, columns, chunk_size=5000):
+        """
+        Runs `body` (Cypher over `row`) for the rows of `frame`, one write transaction per
+        chunk of `chunk_size` rows sent with the loader's transport. Yields each chunk's size.
+        """
+        query = unwind_rows(columns, self.transport) + "\n" + body
+        for i in range(0, len(frame), chunk_size):
+            params = unwind_params(frame.iloc[i:i + chunk_size], columns, self.transport)
+            with self.driver.session() as session:
+                session.write_transaction(lambda tx: tx.run(query, **params))
+            yield min(chunk_size, len(frame) - i)
 
-    def _create_blockholder_ownership_batch(self, tx, records):
+    def _write_ownership_batch(self, batch):
+        """Writes one preprocessed ownership chunk (DataFrame) in a single transaction."""
+        with self.driver.session() as session:
+            session.write_transaction(self._create_blockholder_ownership_batch, batch)
+
+    def _write_company_metadata(self, metadata_df):
+        cypher_query = """
+            MATCH (c:Company {id: row.company_id_graph})
+            SET c.sector = row.sector,
+                c.location = row.location,
+                c.volatility = toFloat(row.volatility)
         """
-        Cypher query for batch creation of Blockholder and Company nodes and OWNS relationships.
+        for count in self._run_unwind(cypher_query, metadata_df, ["company_id_graph", "sector", "location", "volatility"]):
+            print(f"INFO: Updated {count} Company nodes with enriched metadata in chunk.")
+
+    def _replace_risk_exposures(self, exposures_df):
+        with self.driver.session() as session:
+            session.run("MATCH ()-[e:EXPOSED_TO]->() DELETE e")
+            print("INFO: Cleared existing EXPOSED_TO relationships.")
+
+        total = 0
+        for count in self._run_unwind(self._MERGE_EXPOSURE_QUERY, exposures_df, ["company_id", "risk_factor", "risk_weight"]):
+            total += count
+            print(f"INFO: Loaded {count} risk exposures in chunk. Total loaded: {total}")
+
+    def _current_company_properties(self, columns) -> pd.DataFrame:
+        """Every Company id (as company_id_graph) with the current values of `columns`."""
+        returns = ", ".join(["c.id AS company_id_graph"] + [f"c.{column} AS {column}" for column in columns])
+        with self.driver.session() as session:
+            rows = session.run(f"MATCH (c:Company) RETURN {returns}").data()
+        return pd.DataFrame(rows, columns=["company_id_graph"] + columns)
+
+    def _current_exposures(self) -> pd.DataFrame:
+        """Every EXPOSED_TO edge as company_id, risk_factor, risk_weight."""
+        with self.driver.session() as session:
+            rows = session.run("""
+                MATCH (c:Company)-[e:EXPOSED_TO]->(r:RiskFactor)
+                RETURN c.id AS company_id, r.name AS risk_factor, e.weight AS risk_weight
+            """).data()
+        return pd.DataFrame(rows, columns=self.EXPOSURE_KEYS + ["risk_weight"])
+
+    def _apply_exposure_delta(self, inserts, updates, deletes):
+        """Writes only the changed EXPOSED_TO edges, in chunked transactions."""
+        queries = [
+            ("Deleted", deletes, self.EXPOSURE_KEYS, """
+                MATCH (:Company {id: row.company_id})-[e:EXPOSED_TO]->(:RiskFactor {name: row.risk_factor})
+                DELETE e
+            """),
+            ("Updated", updates, self.EXPOSURE_KEYS + ["risk_weight"], """
+                MATCH (:Company {id: row.company_id})-[e:EXPOSED_TO]->(:RiskFactor {name: row.risk_factor})
+                SET e.weight = toFloat(row.risk_weight)
+            """),
+            ("Inserted", inserts, self.EXPOSURE_KEYS + ["risk_weight"], self._MERGE_EXPOSURE_QUERY),
+        ]
+        for action, frame, columns, cypher_query in queries:
+            for count in self._run_unwind(cypher_query, frame, columns):
+                print(f"INFO: {action} {count} risk exposures in chunk.")
+
+    def _changed_company_rows(self, frame, columns, numeric=()) -> pd.DataFrame:
+        """
+        Rows of `frame` whose values differ from the graph's current Company properties
+        (numeric columns compared as the toFloat() the write applies); records the delta.
+        """
+        desired = frame.copy()
+        for column in numeric:
+            desired[column] = pd.to_numeric(desired[column], errors="coerce")
+        changed = diff_properties(desired, self._current_company_properties(columns), "company_id_graph", columns)
+        self.last_delta = {"inserted": 0, "updated": len(changed), "deleted": 0}
+        print(f"INFO: Reconcile: {len(changed)} of {len(frame)} Company rows changed.")
+        return changed
+
+    def _reconcile_risk_exposures(self, exposures_df):
+        """Diffs the desired EXPOSED_TO edges against the graph and applies only the delta."""
+        desired = exposures_df.copy()
+        desired["risk_weight"] = pd.to_numeric(desired["risk_weight"], errors="coerce")
+        # The write MATCHes the Company, so rows for unknown companies would never land.
+        desired = desired[desired["company_id"].isin(self._current_company_properties([])["company_id_graph"])]
+        inserts, updates, deletes = diff_edges(desired, self._current_exposures(), self.EXPOSURE_KEYS, "risk_weight")
+        self.last_delta = {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+        print(f"INFO: Reconcile: {len(inserts)} EXPOSED_TO to insert, {len(updates)} to update, {len(deletes)} to delete.")
+        self._apply_exposure_delta(inserts, updates, deletes)
+
+    def _write_market_caps(self, market_cap_df, refresh_risk=False):
+        """
+        Sets Company market caps. With `refresh_risk`, rows with a market cap go through
+        apply_market_cap_deltas() so the dollarized risk of the changed companies, their
+        owners and their risk factors stays current without re-running dollarize_risk().
         """
+        if refresh_risk:
+            known = pd.to_numeric(market_cap_df["market_cap"], errors="coerce").notna()
+            rows = [{"company_id": cid, "market_cap": float(cap)}
+                    for cid, cap in zip(market_cap_df.loc[known, "company_id_graph"], market_cap_df.loc[known, "market_cap"])]
+            for i in range(0, len(rows), 5000):
+                with self.driver.session() as session:
+                    companies, owners, factors = session.write_transaction(apply_market_cap_deltas, rows[i:i + 5000])
+                print(f"INFO: Refreshed dollarized risk for {companies} companies, {owners} blockholders and {factors} risk factors.")
+            market_cap_df = market_cap_df[~known]
         cypher_query = """
-            UNWIND $records AS row
+            MATCH (c:Company {id: row.company_id_graph})
+            SET c.market_cap = toFloat(row.market_cap)
+        """
+        for count in self._run_unwind(cypher_query, market_cap_df, ["company_id_graph", "market_cap"]):
+            print(f"INFO: Updated {count} Company nodes with market cap data.")
+
+    def _create_blockholder_ownership_batch(self, tx, batch):
+        """
+        Cypher query for batch creation of Blockholder and Company nodes and OWNS relationships.
+        Each OWNS edge keeps its full per-year history in the parallel `years`/`percents`
+        lists; `percent`/`year` hold the latest loaded year so single-period queries are unchanged.
+        """
+        cypher_query = unwind_rows(self.OWNERSHIP_COLUMNS, self.transport) + """
             MERGE (b:Blockholder {id: row.blockholder_id_graph})
                 SET b.name = row.blockholder_name,
                     b.type = row.block_type,
@@ -108,78 +400,70 @@ class DBLoader:
             MERGE (c:Company {id: row.company_id_graph})
                 SET c.name = row.company_name
             MERGE (b)-[r:OWNS]->(c)
-                SET r.percent = toFloat(row.ownership_percent),
-                    r.year = toInteger(row.year)
+            WITH r, row,
+                 (r.year IS NULL OR toInteger(row.year) >= r.year) AS is_latest,
+                 coalesce(r.years, []) AS years,
+                 coalesce(r.percents, []) AS percents
+            WITH r, row, is_latest, years, percents,
+                 [i IN range(0, size(years) - 1) WHERE years[i] <> toInteger(row.year)] AS keep
+            SET r.years = [i IN keep | years[i]] + [toInteger(row.year)],
+                r.percents = [i IN keep | percents[i]] + [toFloat(row.ownership_percent)],
+                r.percent = CASE WHEN is_latest THEN toFloat(row.ownership_percent) ELSE r.percent END,
+                r.year = CASE WHEN is_latest THEN toInteger(row.year) ELSE r.year END
         """
-        tx.run(cypher_query, records=records)
+        tx.run(cypher_query, **unwind_params(batch, self.OWNERSHIP_COLUMNS, self.transport))
 
-    def load_enriched_company_metadata(self, csv_file_path: str):
+    def load_enriched_company_metadata(self, csv_file_path: str, reconcile=False):
         """
         Loads enriched company metadata (sector, location, volatility, market_cap)
-        and updates existing Company nodes.
+        and updates existing Company nodes. With `reconcile`, only the nodes whose
+        values differ from the graph are written.
         """
         print(f"\n--- Loading enriched company metadata from: {csv_file_path} ---")
+        self.last_rows_loaded = 0
+        self.last_delta = None
         try:
             metadata_df = pd.read_csv(csv_file_path)
-            records_to_update = metadata_df.to_dict(orient="records")
 
-            if not records_to_update:
+            if metadata_df.empty:
                 print("WARNING: Enriched company metadata CSV is empty. Skipping update.")
                 return
 
-            cypher_query = """
-                UNWIND $records AS row
-                MATCH (c:Company {id: row.company_id_graph})
-                SET c.sector = row.sector,
-                    c.location = row.location,
-                    c.volatility = toFloat(row.volatility)
-            """
-            chunk_size = 5000
-            for i in range(0, len(records_to_update), chunk_size):
-                chunk = records_to_update[i:i + chunk_size]
-                with self.driver.session() as session:
-                    session.write_transaction(lambda tx: tx.run(cypher_query, records=chunk))
-                print(f"INFO: Updated {len(chunk)} Company nodes with enriched metadata in chunk.")
-
-            print(f"INFO: Finished updating {len(records_to_update)} Company nodes with enriched metadata.")
+            to_write = self._changed_company_rows(metadata_df, ["sector", "location", "volatility"], numeric=["volatility"]) if reconcile else metadata_df
+            if not to_write.empty:
+                self._write_company_metadata(to_write)
+            print(f"INFO: Finished updating {len(to_write)} Company nodes with enriched metadata.")
+            self.last_rows_loaded = len(metadata_df)
         except FileNotFoundError:
             print(f"ERROR: Enriched company metadata CSV not found at: {csv_file_path}. Please run data_enricher.py first.")
             raise
         except Exception as e:
             print(f"FATAL ERROR: An unexpected error occurred during enriched company metadata loading: {e}")
             raise
+        finally:
+            self._touch_graph_version()
         print("--- Finished loading enriched company metadata. ---")
 
-    def load_risk_exposures_from_csv(self, csv_file_path: str):
+    def load_risk_exposures_from_csv(self, csv_file_path: str, reconcile=False):
         """
-        Loads risk exposure relationships (EXPOSED_TO) from a CSV.
+        Loads risk exposure relationships (EXPOSED_TO) from a CSV, replacing the existing
+        ones. With `reconcile`, only the edges to insert, update or delete are written.
         """
         print(f"\n--- Loading EXPOSED_TO relationships from: {csv_file_path} ---")
+        self.last_rows_loaded = 0
+        self.last_delta = None
         try:
             exposures_df = pd.read_csv(csv_file_path)
-            records_to_load = exposures_df.to_dict(orient="records")
 
-            if not records_to_load:
+            if exposures_df.empty:
                 print("WARNING: Risk exposures CSV is empty. Skipping EXPOSED_TO relationships.")
                 return
-            
-            with self.driver.session() as session:
-                session.run("MATCH ()-[e:EXPOSED_TO]->() DELETE e")
-                print("INFO: Cleared existing EXPOSED_TO relationships.")
-
-            cypher_query = """
-                UNWIND $records AS row
-                MATCH (c:Company {id: row.company_id})
-                MERGE (r:RiskFactor {name: row.risk_factor})
-                MERGE (c)-[e:EXPOSED_TO]->(r)
-                SET e.weight = toFloat(row.risk_weight)
-            """
-            chunk_size = 5000
-            for i in range(0, len(records_to_load), chunk_size):
-                chunk = records_to_load[i:i + chunk_size]
-                with self.driver.session() as session:
-                    session.write_transaction(lambda tx: tx.run(cypher_query, records=chunk))
-                print(f"INFO: Loaded {len(chunk)} risk exposures in chunk. Total loaded: {i + len(chunk)}")
+
+            if reconcile:
+                self._reconcile_risk_exposures(exposures_df)
+            else:
+                self._replace_risk_exposures(exposures_df)
+            self.last_rows_loaded = len(exposures_df)
 
         except FileNotFoundError:
             print(f"ERROR: Risk exposures CSV not found at: {csv_file_path}. Please run data_enricher.py first.")
@@ -187,39 +471,39 @@ class DBLoader:
         except Exception as e:
             print(f"FATAL ERROR: An unexpected error occurred during EXPOSED_TO loading: {e}")
             raise
+        finally:
+            self._touch_graph_version()
         print("--- Finished loading EXPOSED_TO relationships. ---")
 
-    def load_market_cap_data(self, csv_file_path: str):
+    def load_market_cap_data(self, csv_file_path: str, reconcile=False):
         """
-        Loads market cap data from a CSV and updates existing Company nodes.
+        Loads market cap data from a CSV and updates existing Company nodes. With
+        `reconcile`, only the nodes whose market cap changed are written, and their
+        dollarized risk (and that of their owners and risk factors) is refreshed in place.
         """
         print(f"\n--- Loading market capitalization data from: {csv_file_path} ---")
+        self.last_rows_loaded = 0
+        self.last_delta = None
         try:
             market_cap_df = pd.read_csv(csv_file_path)
-            records_to_update = market_cap_df.to_dict(orient="records")
 
-            if not records_to_update:
+            if market_cap_df.empty:
                 print("WARNING: Market cap CSV is empty. Skipping update.")
                 return
 
-            cypher_query = """
-                UNWIND $records AS row
-                MATCH (c:Company {id: row.company_id_graph})
-                SET c.market_cap = toFloat(row.market_cap)
-            """
-            chunk_size = 5000
-            for i in range(0, len(records_to_update), chunk_size):
-                chunk = records_to_update[i:i + chunk_size]
-                with self.driver.session() as session:
-                    session.write_transaction(lambda tx: tx.run(cypher_query, records=chunk))
-                print(f"INFO: Updated {len(chunk)} Company nodes with market cap data.")
-            print(f"INFO: Finished updating {len(records_to_update)} Company nodes with market cap.")
+            to_write = self._changed_company_rows(market_cap_df, ["market_cap"], numeric=["market_cap"]) if reconcile else market_cap_df
+            if not to_write.empty:
+                self._write_market_caps(to_write, refresh_risk=reconcile)
+            print(f"INFO: Finished updating {len(to_write)} Company nodes with market cap.")
+            self.last_rows_loaded = len(market_cap_df)
         except FileNotFoundError:
             print(f"ERROR: Market cap CSV not found at: {csv_file_path}. Please run generate_market_cap.py first.")
             raise
         except Exception as e:
             print(f"FATAL ERROR: An unexpected error occurred during market cap loading: {e}")
             raise
+        finally:
+            self._touch_graph_version()
         print("--- Finished loading market capitalization data. ---")
 
 # --- Moved data model classes to this file ---
@@ -257,6 +541,9 @@ class OWNS(Relationship):
     __type__ = "OWNS"
     percent: float = None
     year: int = None
+    # Per-year ownership history (parallel lists)
+    years: list = None
+    percents: list = None
 
 class EXPOSED_TO(Relationship):
     __type__ = "EXPOSED_TO"
@@ -0,0 +1,320 @@
+import os
+import csv
+import json
+import re
+import numpy as np
+import pandas as pd
+
+import config
+from modules.db_loader import DBLoader
+from modules.risk_engine import RiskEngine
+from modules.graph_store import InMemoryGraph
+from modules.load_checkpoint import LoadCheckpoint
+
+BACKENDS = ("memgraph", "memory")
+
+# One InMemoryGraph per persistence directory, shared by the loader and engine of a process.
+_graphs = {}
+
+
+def get_in_memory_graph(persist_dir=None) -> InMemoryGraph:
+    """Returns the process-wide in-memory graph for persist_dir, loading it from disk on first use."""
+    persist_dir = persist_dir or config.IN_MEMORY_GRAPH_DIR
+    if persist_dir not in _graphs:
+        if InMemoryGraph.exists(persist_dir):
+            _graphs[persist_dir] = InMemoryGraph.load(persist_dir)
+            print(f"INFO: Loaded in-memory graph from {persist_dir}.")
+        else:
+            _graphs[persist_dir] = InMemoryGraph()
+    return _graphs[persist_dir]
+
+
+def _check_backend(backend):
+    backend = backend or config.GRAPH_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown graph backend {backend!r}; expected one of {', '.join(BACKENDS)}.")
+    return backend
+
+
+def _nullable(series) -> np.ndarray:
+    """Object array with missing values as None, as Cypher stores them."""
+    return series.astype(object).where(series.notna(), None).to_numpy(dtype=object)
+
+
+def create_loader(backend=None, persist_dir=None, checkpoint_dir=None):
+    """DBLoader for the configured backend ('memgraph' or 'memory')."""
+    if _check_backend(backend) == "memory":
+        return InMemoryLoader(get_in_memory_graph(persist_dir), persist_dir=persist_dir or config.IN_MEMORY_GRAPH_DIR)
+    return DBLoader(uri=config.MEMGRAPH_URI, user=config.MEMGRAPH_USER, password=config.MEMGRAPH_PASSWORD,
+                    checkpoint_dir=checkpoint_dir or config.LOAD_CHECKPOINT_DIR)
+
+
+def create_risk_engine(backend=None, journal_path=None, persist_dir=None):
+    """RiskEngine for the configured backend ('memgraph' or 'memory')."""
+    if _check_backend(backend) == "memory":
+        persist_dir = persist_dir or config.IN_MEMORY_GRAPH_DIR
+        return InMemoryRiskEngine(get_in_memory_graph(persist_dir), journal_path=journal_path or config.IN_MEMORY_JOURNAL,
+                                  persist_dir=persist_dir)
+    return RiskEngine(uri=config.MEMGRAPH_URI, user=config.MEMGRAPH_USER, password=config.MEMGRAPH_PASSWORD,
+                      journal_path=journal_path or "output/scenario_journal.json")
+
+
+class InMemoryLoader(DBLoader):
+    """
+    DBLoader that writes into an InMemoryGraph instead of Memgraph. CSV parsing and
+    filtering are inherited; only the storage hooks are replaced.
+    """
+    # Loaded chunks only become durable when the graph is saved, so checkpoints are
+    # written by close() right after the save (never ahead of the persisted graph).
+    _checkpoint_autosave = False
+
+    def __init__(self, graph: InMemoryGraph, persist_dir=None, transport="columns"):
+        self.graph = graph
+        self.persist_dir = persist_dir
+        self.driver = None
+        print("INFO: DBLoader using the in-memory graph backend.")
+        self._init_state(os.path.join(persist_dir, "load_checkpoints") if persist_dir else None, transport)
+
+    def close(self):
+        if not self.persist_dir:
+            return
+        if self.graph.dirty:
+            self.graph.save(self.persist_dir)
+            print(f"INFO: Saved in-memory graph to {self.persist_dir}.")
+        for checkpoint in self._checkpoints:
+            checkpoint.save()
+
+    def _touch_graph_version(self):
+        pass  # Every InMemoryGraph mutation bumps graph.version itself.
+
+    def clear_database(self):
+        print("--- Clearing all data from the in-memory graph ---")
+        self.graph.clear()
+        LoadCheckpoint.clear_all(self.checkpoint_dir)
+        print("--- Graph cleared. ---")
+
+    def _write_ownership_batch(self, batch):
+        self.graph.load_ownership(batch)
+
+    def _write_company_metadata(self, metadata_df):
+        updated = self.graph.update_companies(
+            metadata_df["company_id_graph"].to_numpy(dtype=object),
+            sector=_nullable(metadata_df["sector"]),
+            location=_nullable(metadata_df["location"]),
+            volatility=pd.to_numeric(metadata_df["volatility"], errors="coerce").to_numpy(dtype=float),
+        )
+        print(f"INFO: Updated {updated} Company nodes with enriched metadata.")
+
+    def _replace_risk_exposures(self, exposures_df):
+        loaded = self.graph.replace_exposures(exposures_df["company_id"].to_numpy(dtype=object),
+                                              exposures_df["risk_factor"].to_numpy(dtype=object),
+                                              exposures_df["risk_weight"])
+        print(f"INFO: Replaced EXPOSED_TO relationships; loaded {loaded} risk exposures.")
+
+    def _write_market_caps(self, market_cap_df, refresh_risk=False):
+        company_ids = market_cap_df["company_id_graph"].to_numpy(dtype=object)
+        market_caps = pd.to_numeric(market_cap_df["market_cap"], errors="coerce").to_numpy(dtype=float)
+        if refresh_risk:
+            known = ~np.isnan(market_caps)
+            companies, owners, factors = self.graph.apply_market_caps(company_ids[known], market_caps[known])
+            print(f"INFO: Refreshed dollarized risk for {companies} companies, {owners} blockholders and {factors} risk factors.")
+            company_ids, market_caps = company_ids[~known], market_caps[~known]
+        updated = self.graph.update_companies(company_ids, market_cap=market_caps)
+        print(f"INFO: Updated {updated} Company nodes with market cap data.")
+
+    def _current_company_properties(self, columns):
+        table = self.graph.companies
+        return pd.DataFrame({"company_id_graph": pd.Series(table.ids, dtype=object),
+                             **{column: table[column].copy() for column in columns}})
+
+    def _current_exposures(self):
+        return pd.DataFrame({
+            "company_id": np.asarray(self.graph.companies.ids, dtype=object)[self.graph.exposure_company],
+            "risk_factor": np.asarray(self.graph.risk_factors.ids, dtype=object)[self.graph.exposure_factor],
+            "risk_weight": self.graph.exposure_weight.copy(),
+        })
+
+    def _apply_exposure_delta(self, inserts, updates, deletes):
+        upserts = pd.concat([inserts, updates], ignore_index=True)
+        self.graph.apply_exposure_delta(upserts["company_id"].to_numpy(dtype=object), upserts["risk_factor"].to_numpy(dtype=object),
+                                        upserts["risk_weight"], deletes["company_id"].to_numpy(dtype=object),
+                                        deletes["risk_factor"].to_numpy(dtype=object))
+        print(f"INFO: Applied EXPOSED_TO delta: {len(upserts)} upserted, {len(deletes)} deleted.")
+
+
+class InMemoryRiskEngine(RiskEngine):
+    """
+    RiskEngine over an InMemoryGraph: propagation and dollarization are sparse matrix
+    products, scenarios mutate the arrays and are journaled as named graph operations,
+    and every snapshot-based analytic is inherited unchanged.
+    """
+    _RESTORE_BLOCKHOLDER_OWNS_QUERY = "restore_blockholder_owns"
+    _RESTORE_COMPANY_OWNS_QUERY = "restore_company_owns"
+    _RESTORE_ROLE_QUERY = "set_role"
+    _DELETE_COMPANY_OWNS_QUERY = "delete_company_owns"
+    _RESTORE_EXPOSURE_WEIGHTS_QUERY = "set_exposure_weights"
+    GRAPH_TOKEN_TTL = 0.0  # The token is graph.version, so checking it on every call is free.
+
+    def __init__(self, graph: InMemoryGraph, journal_path=None, persist_dir=None):
+        self.graph = graph
+        self.persist_dir = persist_dir
+        self.driver = None
+        print("INFO: RiskEngine using the in-memory graph backend.")
+        self._init_state(journal_path or config.IN_MEMORY_JOURNAL)
+
+    def close(self):
+        if self.persist_dir and self.graph.dirty:
+            self.graph.save(self.persist_dir)
+            print(f"INFO: Saved in-memory graph to {self.persist_dir}.")
+
+    # --- Storage hooks ---
+
+    def _load_snapshot(self):
+        return self.graph.snapshot()
+
+    def _read_graph_token(self):
+        return self.graph.version
+
+    def _write_graph_token(self):
+        return self.graph.version
+
+    def _run_write(self, work, *args):
+        return work(None, *args)
+
+    def _write_node_properties(self, updates, batch_size=10000):
+        tables = {"Company": self.graph.companies, "Blockholder": self.graph.blockholders}
+        for label, rows, columns in updates:
+            if not rows:
+                continue
+            table = tables[label]
+            frame = pd.DataFrame(rows)
+            positions = table.lookup(frame["id"].to_numpy(dtype=object))
+            found = positions >= 0
+            for column in columns:
+                table.set(column, positions[found], frame[column].to_numpy()[found])
+        self.graph.dirty = True
+
+    def _acquisition_tx(self, tx, acquiring_company_id, acquired_company_id, ownership_percent, current_year):
+        return self.graph.acquisition(acquiring_company_id, acquired_company_id, ownership_percent, current_year)
+
+    def _divestiture_tx(self, tx, divesting_company_id, divested_company_id):
+        return self.graph.divestiture(divesting_company_id, divested_company_id)
+
+    def _risk_event_tx(self, tx, risk_factor_name, impact_multiplier, target_company_id, target_sector, target_location):
+        return self.graph.risk_event(risk_factor_name, impact_multiplier, target_company_id, target_sector, target_location)
+
+    def _market_cap_delta_tx(self, tx, rows):
+        return self.graph.apply_market_caps([r["company_id"] for r in rows], [r["market_cap"] for r in rows])
+
+    def _apply_inverse_ops(self, entries):
+        for entry in entries:
+            for op in entry["inverse_ops"]:
+                self.graph.apply_op(op["query"], op["params"])
+
+    # --- Whole-graph passes ---
+
+    def compute_total_risk(self, max_iterations=15):
+        print("\n--- Starting Total Risk Propagation ---")
+        self.graph.compute_total_risk()
+        print("INFO: Initial direct risks assigned to Companies.")
+        print("INFO: Propagated risk to Blockholders from owned companies.")
+        self._bump_graph_version()
+        print("--- Total Risk Propagation Complete ---")
+
+    def dollarize_risk(self):
+        print("\n--- Starting Dollarized Risk Calculation ---")
+        self.graph.dollarize_risk()
+        self._bump_graph_version()
+        print("--- Dollarized Risk Calculation Complete ---")
+
+    def normalize_risk_scores(self, new_property_name="normalized_risk", max_score=100.0):
+        print(f"\n--- Starting Risk Score Normalization for '{new_property_name}' ---")
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", new_property_name):
+            raise ValueError(f"Invalid property name for normalized risk: {new_property_name!r}")
+        tables = (self.graph.companies, self.graph.blockholders)
+        max_total_risk = max((float(t["total_risk"].max()) for t in tables if len(t)), default=0.0)
+        max_total_risk = max_total_risk if max_total_risk > 0 else 1.0
+        for table in tables:
+            table.set(new_property_name, np.arange(len(table)), table["total_risk"] / max_total_risk * max_score)
+        self.graph.dirty = True
+        self._bump_graph_version()
+        print(f"INFO: Normalized risk scores for {sum(len(t) for t in tables)} nodes. Max original risk was {max_total_risk:.2f}.")
+        print("--- Finished Risk Score Normalization ---")
+
+    # --- Reads ---
+
+    def _risky_companies(self) -> pd.DataFrame:
+        """Companies with a sector and positive dollarized risk, largest first."""
+        companies = self.graph.companies
+        frame = pd.DataFrame({"id": companies.ids, "name": companies["name"], "sector": companies["sector"],
+                              "risk": companies["dollarized_risk"]})
+        frame = frame[(frame["risk"] > 0) & frame["sector"].notna()]
+        return frame.sort_values("risk", ascending=False, kind="stable")
+
+    def compute_sector_concentration(self, threshold=0.3):
+        print("\n--- Computing Sectoral Concentration Risk (Dollarized) ---")
+        sector_risk = self._risky_companies().groupby("sector", sort=False)["risk"].sum()
+        total_portfolio_risk = float(sector_risk.sum())
+        overexposed = []
+        for sector, risk in sector_risk.items():
+            ratio = risk / total_portfolio_risk if total_portfolio_risk else 0
+            if ratio > threshold:
+                overexposed.append({"sector": sector, "share_pct": round(ratio * 100, 2)})
+        print("--- Finished Computing Sectoral Concentration Risk ---")
+        return overexposed
+
+    def get_sector_treemap(self, top_n=10) -> list:
+        def build():
+            rows = []
+            for sector, group in self._risky_companies().groupby("sector", sort=False):
+                top = group.head(top_n)
+                for company in top.itertuples():
+                    rows.append({"Sector": sector, "Company": company.name or company.id, "CompanyId": company.id, "DollarizedRisk": float(company.risk)})
+                remaining = len(group) - len(top)
+                if remaining > 0:
+                    rows.append({"Sector": sector, "Company": f"Other ({remaining} companies)", "CompanyId": None,
+                                 "DollarizedRisk": max(float(group["risk"].sum() - top["risk"].sum()), 0.0)})
+            return rows
+        return self._cached(("sector_treemap", top_n), build)
+
+    def get_sector_companies(self, sector: str, limit=500, skip=0) -> list:
+        frame = self._risky_companies()
+        frame = frame[frame["sector"] == sector].iloc[skip:skip + limit]
+        return [{"CompanyId": r.id, "Company": r.name, "DollarizedRisk": float(r.risk)} for r in frame.itertuples()]
+
+    def get_critical_nodes_by_degree(self, top_n=10):
+        print("\n--- Computing Critical Companies by Network Degree ---")
+        company_degree, blockholder_degree = self.graph.node_degrees()
+        names = list(self.graph.companies["name"]) + list(self.graph.blockholders["name"])
+        degree = np.concatenate([company_degree, blockholder_degree])
+        top = [i for i in np.argsort(-degree, kind="stable")[:top_n] if degree[i] > 0]
+        print("--- Finished Computing Critical Companies by Network Degree ---")
+        return [{"name": names[i], "degree": int(degree[i])} for i in top]
+
+    def export_risks_to_csv(self, filename="output/risk_scores.csv"):
+        print(f"--- Exporting dollarized risk scores to {filename} ---")
+        os.makedirs("output", exist_ok=True)
+        companies, blockholders = self.graph.companies, self.graph.blockholders
+        names = list(companies["name"]) + list(blockholders["name"])
+        risk = np.concatenate([companies["dollarized_risk"], blockholders["dollarized_risk"]])
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Node Name", "Dollarized Risk"])
+            for i in np.argsort(-risk, kind="stable"):
+                writer.writerow([names[i], round(float(risk[i]), 2)])
+        print("--- Risk scores exported. ---")
+
+    def export_snapshot(self, filepath):
+        print(f"--- Exporting snapshot to {filepath} ---")
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        companies = self.graph.companies
+        result = [{
+            "id": cid, "name": name,
+            "direct_risk": float(direct), "total_risk": float(total), "dollarized_risk": float(dollarized),
+            "sector": sector if sector is not None else "N/A", "location": location if location is not None else "N/A",
+        } for cid, name, direct, total, dollarized, sector, location in zip(
+            companies.ids, companies["name"], companies["direct_risk"], companies["total_risk"],
+            companies["dollarized_risk"], companies["sector"], companies["location"])]
+        with open(filepath, "w") as f:
+            json.dump(result, f, indent=2)
+        print("--- Snapshot exported. ---")
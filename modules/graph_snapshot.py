@@ -0,0 +1,180 @@
+import numpy as np
+
+
+class GraphSnapshot:
+    """
+    Read-only, array-backed copy of the risk graph (Companies, Blockholders,
+    RiskFactors, OWNS and EXPOSED_TO) pulled from Memgraph in a handful of bulk queries,
+    or built directly from the columns of the in-process graph store.
+    Analytics that need to look at many nodes at once work off this snapshot
+    instead of issuing one Cypher query per node.
+    """
+    def __init__(self, companies, blockholders, risk_factors, owns, exposures):
+        self.company_ids = [row["id"] for row in companies]
+        self.company_names = [row["name"] for row in companies]
+        self.company_sectors = [row["sector"] for row in companies]
+        self.company_locations = [row["location"] for row in companies]
+        self.market_cap = np.array([row["market_cap"] for row in companies], dtype=float)
+        self.company_total_risk = np.array([row["total_risk"] for row in companies], dtype=float)
+        self.company_dollarized_risk = np.array([row["dollarized_risk"] for row in companies], dtype=float)
+        self.company_index = {cid: i for i, cid in enumerate(self.company_ids)}
+
+        self.blockholder_ids = [row["id"] for row in blockholders]
+        self.blockholder_names = [row["name"] for row in blockholders]
+        self.blockholder_total_risk = np.array([row["total_risk"] for row in blockholders], dtype=float)
+        self.blockholder_dollarized_risk = np.array([row["dollarized_risk"] for row in blockholders], dtype=float)
+        self.blockholder_index = {bid: i for i, bid in enumerate(self.blockholder_ids)}
+
+        self.risk_factor_names = [row["name"] for row in risk_factors]
+        self.risk_factor_dollarized_risk = np.array([row["dollarized_risk"] for row in risk_factors], dtype=float)
+        self.risk_factor_index = {name: i for i, name in enumerate(self.risk_factor_names)}
+
+        # OWNS edges whose endpoints are both known. The owner is either a Blockholder
+        # or (after an acquisition scenario) a Company, flagged by owns_owner_is_company.
+        owns = [row for row in owns
+                if row["company_id"] in self.company_index
+                and (row["owner_id"] in self.company_index if row["owner_is_company"] else row["owner_id"] in self.blockholder_index)]
+        self.owns_owner_is_company = np.array([bool(row["owner_is_company"]) for row in owns], dtype=bool)
+        self.owns_owner = np.array([
+            self.company_index[row["owner_id"]] if row["owner_is_company"] else self.blockholder_index[row["owner_id"]]
+            for row in owns
+        ], dtype=np.int64)
+        self.owns_company = np.array([self.company_index[row["company_id"]] for row in owns], dtype=np.int64)
+        self.owns_percent = np.array([row["percent"] for row in owns], dtype=float)
+        self.owns_year = np.array([row["year"] if row["year"] is not None else -1 for row in owns], dtype=np.int64)
+
+        # Per-year ownership history, flattened: one entry per (OWNS edge, year).
+        # Edges without a history (e.g. created by scenarios) contribute their single percent/year.
+        history_edge, history_year, history_percent = [], [], []
+        for pos, row in enumerate(owns):
+            years = row.get("years") or ([row["year"]] if row["year"] is not None else [])
+            percents = row.get("percents") or [row["percent"]] * len(years)
+            for year, percent in zip(years, percents):
+                history_edge.append(pos)
+                history_year.append(year)
+                history_percent.append(percent if percent is not None else 0.0)
+        self.owns_history_edge = np.array(history_edge, dtype=np.int64)
+        self.owns_history_year = np.array(history_year, dtype=np.int64)
+        self.owns_history_percent = np.array(history_percent, dtype=float)
+
+        exposures = [row for row in exposures
+                     if row["company_id"] in self.company_index and row["risk_factor"] in self.risk_factor_index]
+        self.exposure_company = np.array([self.company_index[row["company_id"]] for row in exposures], dtype=np.int64)
+        self.exposure_factor = np.array([self.risk_factor_index[row["risk_factor"]] for row in exposures], dtype=np.int64)
+        self.exposure_weight = np.array([row["weight"] for row in exposures], dtype=float)
+
+        self._blockholder_edges = None
+        self._company_exposures = None
+
+    @classmethod
+    def from_session(cls, session):
+        """Builds a snapshot from an open neo4j session using one query per entity type."""
+        companies = session.run("""
+            MATCH (c:Company)
+            RETURN c.id AS id, coalesce(c.name, c.id) AS name,
+                   c.sector AS sector, c.location AS location,
+                   toFloat(coalesce(c.market_cap, 0)) AS market_cap,
+                   toFloat(coalesce(c.total_risk, 0)) AS total_risk,
+                   toFloat(coalesce(c.dollarized_risk, 0)) AS dollarized_risk
+        """).data()
+        blockholders = session.run("""
+            MATCH (b:Blockholder)
+            RETURN b.id AS id, coalesce(b.name, b.id) AS name,
+                   toFloat(coalesce(b.total_risk, 0)) AS total_risk,
+                   toFloat(coalesce(b.dollarized_risk, 0)) AS dollarized_risk
+        """).data()
+        risk_factors = session.run("""
+            MATCH (r:RiskFactor)
+            RETURN r.name AS name, toFloat(coalesce(r.dollarized_risk, 0)) AS dollarized_risk
+        """).data()
+        owns = session.run("""
+            MATCH (p)-[o:OWNS]->(c:Company)
+            WHERE p:Blockholder OR p:Company
+            RETURN p.id AS owner_id, 'Company' IN labels(p) AS owner_is_company, c.id AS company_id,
+                   toFloat(coalesce(o.percent, 0)) AS percent, o.year AS year,
+                   o.years AS years, o.percents AS percents
+        """).data()
+        exposures = session.run("""
+            MATCH (c:Company)-[e:EXPOSED_TO]->(r:RiskFactor)
+            RETURN c.id AS company_id, r.name AS risk_factor, toFloat(coalesce(e.weight, 0)) AS weight
+        """).data()
+        return cls(companies, blockholders, risk_factors, owns, exposures)
+
+    @classmethod
+    def from_arrays(cls, companies, blockholders, risk_factors, owns, exposures):
+        """
+        Builds a snapshot from position-indexed columns (e.g. an in-process graph store) without
+        going through row dicts. `owns` holds owner_is_company/owner/company/percent/year and the
+        flattened history_edge/history_year/history_percent; `exposures` holds company/factor/weight
+        as positions. Values must already be coalesced as in from_session().
+        """
+        snap = cls.__new__(cls)
+        snap.company_ids = list(companies["id"])
+        snap.company_names = list(companies["name"])
+        snap.company_sectors = list(companies["sector"])
+        snap.company_locations = list(companies["location"])
+        snap.market_cap = np.asarray(companies["market_cap"], dtype=float)
+        snap.company_total_risk = np.asarray(companies["total_risk"], dtype=float)
+        snap.company_dollarized_risk = np.asarray(companies["dollarized_risk"], dtype=float)
+        snap.company_index = {cid: i for i, cid in enumerate(snap.company_ids)}
+
+        snap.blockholder_ids = list(blockholders["id"])
+        snap.blockholder_names = list(blockholders["name"])
+        snap.blockholder_total_risk = np.asarray(blockholders["total_risk"], dtype=float)
+        snap.blockholder_dollarized_risk = np.asarray(blockholders["dollarized_risk"], dtype=float)
+        snap.blockholder_index = {bid: i for i, bid in enumerate(snap.blockholder_ids)}
+
+        snap.risk_factor_names = list(risk_factors["name"])
+        snap.risk_factor_dollarized_risk = np.asarray(risk_factors["dollarized_risk"], dtype=float)
+        snap.risk_factor_index = {name: i for i, name in enumerate(snap.risk_factor_names)}
+
+        snap.owns_owner_is_company = np.asarray(owns["owner_is_company"], dtype=bool)
+        snap.owns_owner = np.asarray(owns["owner"], dtype=np.int64)
+        snap.owns_company = np.asarray(owns["company"], dtype=np.int64)
+        snap.owns_percent = np.asarray(owns["percent"], dtype=float)
+        snap.owns_year = np.asarray(owns["year"], dtype=np.int64)
+        snap.owns_history_edge = np.asarray(owns["history_edge"], dtype=np.int64)
+        snap.owns_history_year = np.asarray(owns["history_year"], dtype=np.int64)
+        snap.owns_history_percent = np.asarray(owns["history_percent"], dtype=float)
+
+        snap.exposure_company = np.asarray(exposures["company"], dtype=np.int64)
+        snap.exposure_factor = np.asarray(exposures["factor"], dtype=np.int64)
+        snap.exposure_weight = np.asarray(exposures["weight"], dtype=float)
+
+        snap._blockholder_edges = None
+        snap._company_exposures = None
+        return snap
+
+    @property
+    def num_companies(self):
+        return len(self.company_ids)
+
+    @property
+    def num_blockholders(self):
+        return len(self.blockholder_ids)
+
+    @property
+    def num_risk_factors(self):
+        return len(self.risk_factor_names)
+
+    def company_direct_risk(self):
+        """Sum of EXPOSED_TO weights per company, as in RiskEngine.compute_total_risk."""
+        return np.bincount(self.exposure_company, weights=self.exposure_weight, minlength=self.num_companies)
+
+    def blockholder_edges(self, blockholder_idx):
+        """Returns the OWNS edge positions owned by one Blockholder."""
+        if self._blockholder_edges is None:
+            edges = {}
+            for pos in np.flatnonzero(~self.owns_owner_is_company):
+                edges.setdefault(int(self.owns_owner[pos]), []).append(pos)
+            self._blockholder_edges = {k: np.array(v, dtype=np.int64) for k, v in edges.items()}
+        return self._blockholder_edges.get(blockholder_idx, np.empty(0, dtype=np.int64))
+
+    def company_exposures(self, company_idx):
+        """Returns the EXPOSED_TO edge positions of one Company."""
+        if self._company_exposures is None:
+            exposures = {}
+            for pos, ci in enumerate(self.exposure_company):
+                exposures.setdefault(int(ci), []).append(pos)
+            self._company_exposures = {k: np.array(v, dtype=np.int64) for k, v in exposures.items()}
+        return self._company_exposures.get(company_idx, np.empty(0, dtype=np.int64))
@@ -0,0 +1,568 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from modules.graph_snapshot import GraphSnapshot
+
+
+class _Column:
+    """Growable 1-D NumPy array with amortized O(1) appends; `values` is a writable view."""
+    def __init__(self, dtype, fill):
+        self.dtype = dtype
+        self.fill = fill
+        self._data = np.empty(0, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def values(self):
+        return self._data[:self._size]
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        end = self._size + len(values)
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data), 16), dtype=self.dtype)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:end] = values
+        self._size = end
+
+    def grow(self, count):
+        self.extend(np.full(count, self.fill, dtype=self.dtype))
+
+
+class _NodeTable:
+    """Node ids, an id -> position index and one growable column per property."""
+    def __init__(self, columns):
+        self.ids = []
+        self.index = {}
+        self.columns = {name: _Column(dtype, fill) for name, (dtype, fill) in columns.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, name):
+        return self.columns[name].values
+
+    def ensure(self, ids) -> np.ndarray:
+        """Positions of `ids`, creating missing nodes (MERGE)."""
+        ids = pd.Series(ids, dtype=object).reset_index(drop=True)
+        new = [node_id for node_id in pd.unique(ids) if node_id not in self.index]
+        if new:
+            start = len(self.ids)
+            self.ids.extend(new)
+            self.index.update((node_id, start + k) for k, node_id in enumerate(new))
+            for column in self.columns.values():
+                column.grow(len(new))
+        return ids.map(self.index).to_numpy(dtype=np.int64)
+
+    def lookup(self, ids) -> np.ndarray:
+        """Positions of `ids`, -1 for unknown ones (MATCH)."""
+        return pd.Series(ids, dtype=object).map(self.index).fillna(-1).to_numpy(dtype=np.int64)
+
+    def set(self, name, positions, values):
+        """Sets a property, adding the column (float, else object) the first time it is written."""
+        values = np.asarray(values)
+        if name not in self.columns:
+            numeric = values.dtype.kind in "fiub"
+            self.columns[name] = _Column(float if numeric else object, np.nan if numeric else None)
+            self.columns[name].grow(len(self.ids))
+        self.columns[name].values[positions] = values
+
+    def clear(self):
+        self.ids, self.index = [], {}
+        for column in self.columns.values():
+            column._data, column._size = np.empty(0, dtype=column.dtype), 0
+
+
+def _last_per_key(*keys):
+    """Boolean mask of the last occurrence of every key (tuple of the given arrays, input order)."""
+    return ~pd.DataFrame({i: np.asarray(k) for i, k in enumerate(keys)}).duplicated(keep="last").to_numpy()
+
+
+class InMemoryGraph:
+    """
+    In-process replacement for the Memgraph risk graph. Nodes live in column arrays,
+    OWNS edges in growable COO arrays (with the per-year history stored alongside) and
+    EXPOSED_TO in flat arrays; propagation and dollarization use a blockholder x company
+    CSR matrix built on demand. Loading, propagation, dollarization, scenarios and
+    snapshots follow the semantics of the Cypher in DBLoader/RiskEngine.
+    """
+    ARRAYS_FILE = "graph.npz"
+    NODES_FILE = "nodes.json"
+
+    def __init__(self):
+        self.companies = _NodeTable({
+            "name": (object, None), "sector": (object, None), "location": (object, None), "role": (object, None),
+            "volatility": (float, np.nan), "market_cap": (float, np.nan),
+            "direct_risk": (float, 0.0), "total_risk": (float, 0.0), "dollarized_risk": (float, 0.0),
+        })
+        self.blockholders = _NodeTable({
+            "name": (object, None), "type": (object, None), "files_13F": (float, np.nan),
+            "total_risk": (float, 0.0), "dollarized_risk": (float, 0.0),
+        })
+        self.risk_factors = _NodeTable({"dollarized_risk": (float, 0.0)})
+        self._init_edges()
+        self.dirty = False
+        # Bumped by every structural change; engines cache derived results per version.
+        self.version = 0
+
+    def _init_edges(self):
+        self.owns = {
+            "owner_is_company": _Column(bool, False), "owner": _Column(np.int64, -1),
+            "company": _Column(np.int64, -1), "percent": _Column(float, np.nan),
+            "year": _Column(np.int64, -1), "alive": _Column(bool, True),
+        }
+        # (owner << 32 | company) -> edge position, separately for Blockholder and Company owners.
+        self._owns_index = {False: {}, True: {}}
+        self.history = {"edge": _Column(np.int64, -1), "year": _Column(np.int64, -1), "percent": _Column(float, np.nan)}
+        self.exposure_company = np.empty(0, dtype=np.int64)
+        self.exposure_factor = np.empty(0, dtype=np.int64)
+        self.exposure_weight = np.empty(0, dtype=float)
+        self._holdings = None
+
+    def clear(self):
+        """Drops every node and edge (MATCH (n) DETACH DELETE n)."""
+        for table in (self.companies, self.blockholders, self.risk_factors):
+            table.clear()
+        self._init_edges()
+        self._changed()
+
+    def _changed(self):
+        self._holdings = None
+        self.dirty = True
+        self.version += 1
+
+    # --- OWNS storage ---
+
+    def _owns(self, name):
+        return self.owns[name].values
+
+    def _merge_owns(self, owner_is_company, owners, companies) -> np.ndarray:
+        """Edge positions for (owner, company) pairs, creating the missing edges (MERGE)."""
+        keys = (np.asarray(owners, dtype=np.int64) << 32) | np.asarray(companies, dtype=np.int64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        index = self._owns_index[owner_is_company]
+        positions = np.fromiter((index.get(k, -1) for k in unique_keys.tolist()), dtype=np.int64, count=len(unique_keys))
+        new = positions < 0
+        if new.any():
+            start = len(self.owns["owner"])
+            positions[new] = np.arange(start, start + int(new.sum()))
+            index.update(zip(unique_keys[new].tolist(), positions[new].tolist()))
+            count = int(new.sum())
+            self.owns["owner_is_company"].extend(np.full(count, owner_is_company))
+            self.owns["owner"].extend(unique_keys[new] >> 32)
+            self.owns["company"].extend(unique_keys[new] & 0xFFFFFFFF)
+            for name in ("percent", "year", "alive"):
+                self.owns[name].grow(count)
+        self._changed()
+        return positions[inverse]
+
+    def _delete_owns(self, edges):
+        alive = self._owns("alive")
+        for edge in edges:
+            key = (int(self._owns("owner")[edge]) << 32) | int(self._owns("company")[edge])
+            self._owns_index[bool(self._owns("owner_is_company")[edge])].pop(key, None)
+            alive[edge] = False
+        self._changed()
+
+    def _edges_into(self, company, owner_is_company=None) -> np.ndarray:
+        mask = self._owns("alive") & (self._owns("company") == company)
+        if owner_is_company is not None:
+            mask &= self._owns("owner_is_company") == owner_is_company
+        return np.flatnonzero(mask)
+
+    def _removed_rows(self, edges) -> list:
+        """{owner_id, owner_is_company, props} per edge, props shaped like Cypher's properties(o)."""
+        positions = np.flatnonzero(np.isin(self.history["edge"].values, edges))
+        hist_edge = self.history["edge"].values[positions]
+        positions = positions[_last_per_key(hist_edge, self.history["year"].values[positions])]
+        rows = []
+        for edge in edges:
+            is_company = bool(self._owns("owner_is_company")[edge])
+            props = {"percent": float(self._owns("percent")[edge])}
+            if self._owns("year")[edge] >= 0:
+                props["year"] = int(self._owns("year")[edge])
+            own = positions[self.history["edge"].values[positions] == edge]
+            if len(own):
+                props["years"] = self.history["year"].values[own].tolist()
+                props["percents"] = self.history["percent"].values[own].tolist()
+            table = self.companies if is_company else self.blockholders
+            rows.append({"owner_id": table.ids[self._owns("owner")[edge]], "owner_is_company": is_company, "props": props})
+        return rows
+
+    def holdings_matrix(self) -> sp.csr_matrix:
+        """Blockholder x company CSR matrix of current OWNS percents (null percents count as 0)."""
+        if self._holdings is None:
+            mask = self._owns("alive") & ~self._owns("owner_is_company")
+            self._holdings = sp.csr_matrix(
+                (np.nan_to_num(self._owns("percent")[mask]), (self._owns("owner")[mask], self._owns("company")[mask])),
+                shape=(len(self.blockholders), len(self.companies)),
+            )
+        return self._holdings
+
+    def _blockholders_with_holdings(self) -> np.ndarray:
+        mask = self._owns("alive") & ~self._owns("owner_is_company")
+        return np.bincount(self._owns("owner")[mask], minlength=len(self.blockholders)) > 0
+
+    # --- Loading ---
+
+    def load_ownership(self, frame) -> int:
+        """
+        MERGEs Blockholder/Company nodes and OWNS edges for a DBLoader ownership batch, keeping
+        each edge's per-year history and setting percent/year from the latest year.
+        """
+        frame = frame.reset_index(drop=True)
+        blockholders = self.blockholders.ensure(frame["blockholder_id_graph"])
+        companies = self.companies.ensure(frame["company_id_graph"])
+        last = _last_per_key(blockholders)
+        self.blockholders["name"][blockholders[last]] = frame["blockholder_name"].to_numpy(dtype=object)[last]
+        self.blockholders["type"][blockholders[last]] = frame["block_type"].to_numpy(dtype=object)[last]
+        self.blockholders["files_13F"][blockholders[last]] = np.floor(pd.to_numeric(frame["files_13F"], errors="coerce").to_numpy(dtype=float))[last]
+        last = _last_per_key(companies)
+        self.companies["name"][companies[last]] = frame["company_name"].to_numpy(dtype=object)[last]
+
+        edges = self._merge_owns(False, blockholders, companies)
+        years = pd.to_numeric(frame["year"]).to_numpy(dtype=np.int64)
+        percents = pd.to_numeric(frame["ownership_percent"], errors="coerce").to_numpy(dtype=float)
+        self.history["edge"].extend(edges)
+        self.history["year"].extend(years)
+        self.history["percent"].extend(percents)
+
+        # percent/year follow the latest year; a later row for the same year overwrites.
+        order = np.lexsort((np.arange(len(edges)), years, edges))
+        sorted_edges = edges[order]
+        latest = order[np.r_[sorted_edges[1:] != sorted_edges[:-1], True]]
+        edge, year, percent = edges[latest], years[latest], percents[latest]
+        current = self._owns("year")[edge]
+        update = (current < 0) | (year >= current)
+        self._owns("year")[edge[update]] = year[update]
+        self._owns("percent")[edge[update]] = percent[update]
+        return len(frame)
+
+    def update_companies(self, company_ids, **columns) -> int:
+        """Sets properties on existing Companies (MATCH ... SET); unknown ids are skipped."""
+        positions = self.companies.lookup(company_ids)
+        found = positions >= 0
+        for name, values in columns.items():
+            self.companies.set(name, positions[found], np.asarray(values)[found])
+        self._changed()
+        return int(found.sum())
+
+    def replace_exposures(self, company_ids, risk_factors, weights) -> int:
+        """Replaces all EXPOSED_TO edges; rows for unknown companies are skipped, RiskFactors are MERGEd."""
+        companies = self.companies.lookup(company_ids)
+        found = companies >= 0
+        factors = self.risk_factors.ensure(pd.Series(risk_factors, dtype=object)[found])
+        companies = companies[found]
+        weights = pd.to_numeric(pd.Series(weights)[found], errors="coerce").to_numpy(dtype=float)
+        last = _last_per_key(companies, factors)
+        self.exposure_company, self.exposure_factor, self.exposure_weight = companies[last], factors[last], weights[last]
+        self._changed()
+        return int(found.sum())
+
+    def apply_exposure_delta(self, company_ids, risk_factors, weights, deleted_company_ids, deleted_risk_factors) -> int:
+        """
+        Upserts the given EXPOSED_TO edges and deletes the `deleted_*` ones, keeping every other
+        edge (the incremental counterpart of replace_exposures). Returns the number of upserts.
+        """
+        deleted = pd.MultiIndex.from_arrays([self.companies.lookup(deleted_company_ids), self.risk_factors.lookup(deleted_risk_factors)])
+        keep = ~pd.MultiIndex.from_arrays([self.exposure_company, self.exposure_factor]).isin(deleted)
+        companies = self.companies.lookup(company_ids)
+        found = companies >= 0
+        factors = self.risk_factors.ensure(pd.Series(risk_factors, dtype=object)[found])
+        weights = pd.to_numeric(pd.Series(weights)[found], errors="coerce").to_numpy(dtype=float)
+        companies = np.concatenate([self.exposure_company[keep], companies[found]])
+        factors = np.concatenate([self.exposure_factor[keep], factors])
+        weights = np.concatenate([self.exposure_weight[keep], weights])
+        last = _last_per_key(companies, factors)
+        self.exposure_company, self.exposure_factor, self.exposure_weight = companies[last], factors[last], weights[last]
+        self._changed()
+        return int(found.sum())
+
+    # --- Propagation ---
+
+    def compute_total_risk(self):
+        """Direct risk = sum of EXPOSED_TO weights per Company; Blockholder total_risk = sum percent * company total_risk."""
+        n = len(self.companies)
+        has_exposure = np.bincount(self.exposure_company, minlength=n) > 0
+        direct = np.bincount(self.exposure_company, weights=np.nan_to_num(self.exposure_weight), minlength=n)
+        self.companies["direct_risk"][has_exposure] = direct[has_exposure]
+        self.companies["total_risk"][:] = np.where(has_exposure, direct, 0.0)
+        self.blockholders["total_risk"][:] = self.holdings_matrix() @ self.companies["total_risk"]
+        self._changed()
+
+    def dollarize_risk(self):
+        """Dollarized risk for Companies (total_risk * market_cap), their Blockholder owners and RiskFactors."""
+        company = self.companies["total_risk"] * np.nan_to_num(self.companies["market_cap"])
+        self.companies["dollarized_risk"][:] = company
+        holders = self._blockholders_with_holdings()
+        self.blockholders["dollarized_risk"][holders] = (self.holdings_matrix() @ company)[holders]
+        exposed = np.bincount(self.exposure_factor, minlength=len(self.risk_factors)) > 0
+        by_factor = np.bincount(self.exposure_factor, weights=company[self.exposure_company] * np.nan_to_num(self.exposure_weight),
+                                minlength=len(self.risk_factors))
+        self.risk_factors["dollarized_risk"][exposed] = by_factor[exposed]
+        self._changed()
+
+    def apply_market_caps(self, company_ids, market_caps):
+        """
+        Incremental market cap refresh: sets each changed Company's dollarized_risk to
+        total_risk * new cap and adds the difference to the previous value to its Blockholder
+        owners (times percent) and its RiskFactors (times weight).
+        Returns (changed companies, updated blockholders, updated risk factors).
+        """
+        positions = self.companies.lookup(company_ids)
+        found = positions >= 0
+        positions, new_caps = positions[found], np.asarray(market_caps, dtype=float)[found]
+        last = _last_per_key(positions)
+        positions, new_caps = positions[last], new_caps[last]
+        old_caps = np.nan_to_num(self.companies["market_cap"][positions])
+        changed = new_caps != old_caps
+        positions, new_caps, old_caps = positions[changed], new_caps[changed], old_caps[changed]
+        new_dollars = self.companies["total_risk"][positions] * new_caps
+        delta = new_dollars - self.companies["dollarized_risk"][positions]
+        self.companies["market_cap"][positions] = new_caps
+        self.companies["dollarized_risk"][positions] = new_dollars
+        if len(positions):
+            self._changed()
+        nonzero = delta != 0
+        positions, delta = positions[nonzero], delta[nonzero]
+        if not len(positions):
+            return 0, 0, 0
+        company_delta = np.zeros(len(self.companies))
+        company_delta[positions] = delta
+        holdings = self.holdings_matrix()[:, positions]
+        owners = np.flatnonzero(np.diff(holdings.tocsr().indptr))
+        self.blockholders["dollarized_risk"][:] += holdings @ delta
+        exposure = np.isin(self.exposure_company, positions)
+        factors = np.unique(self.exposure_factor[exposure])
+        self.risk_factors["dollarized_risk"][:] += np.bincount(
+            self.exposure_factor[exposure],
+            weights=np.nan_to_num(self.exposure_weight[exposure]) * company_delta[self.exposure_company[exposure]],
+            minlength=len(self.risk_factors))
+        self._changed()
+        return len(positions), len(owners), len(factors)
+
+    # --- Scenarios ---
+
+    def acquisition(self, acquiring_company_id, acquired_company_id, ownership_percent, current_year):
+        """Replaces every owner of the acquired Company with one Company -> Company OWNS edge."""
+        acquirer = self.companies.index.get(acquiring_company_id)
+        acquired = self.companies.index.get(acquired_company_id)
+        if acquirer is None or acquired is None:
+            return None
+        previous_role = self.companies["role"][acquired]
+        edges = self._edges_into(acquired)
+        removed = self._removed_rows(edges)
+        self._delete_owns(edges)
+        edge = self._merge_owns(True, [acquirer], [acquired])[0]
+        self._owns("percent")[edge] = ownership_percent
+        self._owns("year")[edge] = current_year
+        self.companies["role"][acquired] = "acquired"
+        return {"previous_role": previous_role, "removed_edges": removed}
+
+    def divestiture(self, divesting_company_id, divested_company_id):
+        """Deletes a Company -> Company OWNS edge, resetting the divested role when it has no Company owners left."""
+        divesting = self.companies.index.get(divesting_company_id)
+        divested = self.companies.index.get(divested_company_id)
+        if divesting is None or divested is None:
+            return None
+        edges = [e for e in self._edges_into(divested, owner_is_company=True) if self._owns("owner")[e] == divesting]
+        if not edges:
+            return None
+        previous_role = self.companies["role"][divested]
+        removed = [dict(row, previous_role=previous_role) for row in self._removed_rows(edges)]
+        self._delete_owns(edges)
+        role_reset = len(self._edges_into(divested, owner_is_company=True)) == 0
+        if role_reset:
+            self.companies["role"][divested] = "company"
+        return {"removed_edges": removed, "previous_role": previous_role, "role_reset": role_reset}
+
+    def risk_event(self, risk_factor_name, impact_multiplier, target_company_id=None, target_sector=None, target_location=None) -> list:
+        """Scales matching EXPOSED_TO weights (clipped to [0, 1]); returns the previous weights."""
+        factor = self.risk_factors.index.get(risk_factor_name)
+        if factor is None:
+            return []
+        mask = self.exposure_factor == factor
+        if target_company_id:
+            mask &= self.exposure_company == self.companies.index.get(target_company_id, -1)
+        if target_sector:
+            mask &= self.companies["sector"][self.exposure_company] == target_sector
+        if target_location:
+            mask &= self.companies["location"][self.exposure_company] == target_location
+        positions = np.flatnonzero(mask)
+        previous = self.exposure_weight[positions].copy()
+        self.exposure_weight[positions] = np.clip(previous * impact_multiplier, 0.0, 1.0)
+        self._changed()
+        return [{"company_id": self.companies.ids[c], "weight": float(w)}
+                for c, w in zip(self.exposure_company[positions], previous)]
+
+    # Journal operations: RiskEngine records (op name, params) pairs and rolls back via apply_op().
+
+    def delete_company_owns(self, acquiring_company_id, acquired_company_id):
+        owner = self.companies.index.get(acquiring_company_id)
+        company = self.companies.index.get(acquired_company_id)
+        if owner is not None and company is not None:
+            self._delete_owns([e for e in self._edges_into(company, owner_is_company=True) if self._owns("owner")[e] == owner])
+
+    def restore_owns(self, rows, company_id, owner_is_company=False):
+        company = self.companies.index.get(company_id)
+        if company is None:
+            return
+        table = self.companies if owner_is_company else self.blockholders
+        for row in rows:
+            owner = table.index.get(row["owner_id"])
+            if owner is None:
+                continue
+            props = row["props"]
+            edge = self._merge_owns(owner_is_company, [owner], [company])[0]
+            self._owns("percent")[edge] = props.get("percent", np.nan)
+            self._owns("year")[edge] = props.get("year", -1) if props.get("year") is not None else -1
+            # SET o = row.props replaces the history lists, so a replayed restore must not append them twice.
+            if props.get("years") and not np.any(self.history["edge"].values == edge):
+                self.history["edge"].extend(np.full(len(props["years"]), edge))
+                self.history["year"].extend(props["years"])
+                self.history["percent"].extend(props["percents"])
+
+    def set_role(self, company_id, role):
+        company = self.companies.index.get(company_id)
+        if company is not None:
+            self.companies["role"][company] = role
+            self._changed()
+
+    def set_exposure_weights(self, rows, risk_factor_name):
+        factor = self.risk_factors.index.get(risk_factor_name)
+        if factor is None:
+            return
+        for row in rows:
+            company = self.companies.index.get(row["company_id"], -1)
+            self.exposure_weight[(self.exposure_company == company) & (self.exposure_factor == factor)] = row["weight"]
+        self._changed()
+
+    def apply_op(self, name, params):
+        {"delete_company_owns": self.delete_company_owns,
+         "restore_blockholder_owns": lambda **p: self.restore_owns(owner_is_company=False, **p),
+         "restore_company_owns": lambda **p: self.restore_owns(owner_is_company=True, **p),
+         "set_role": self.set_role, "set_exposure_weights": self.set_exposure_weights}[name](**params)
+
+    # --- Reads ---
+
+    def node_degrees(self):
+        """(company degree, blockholder degree) counting OWNS in both directions and EXPOSED_TO."""
+        alive = self._owns("alive")
+        owner, company, is_company = self._owns("owner")[alive], self._owns("company")[alive], self._owns("owner_is_company")[alive]
+        n = len(self.companies)
+        company_degree = (np.bincount(company, minlength=n) + np.bincount(owner[is_company], minlength=n)
+                          + np.bincount(self.exposure_company, minlength=n))
+        return company_degree, np.bincount(owner[~is_company], minlength=len(self.blockholders))
+
+    def snapshot(self) -> GraphSnapshot:
+        """GraphSnapshot of the current state, built straight from the arrays."""
+        alive = np.flatnonzero(self._owns("alive"))
+        remap = np.full(len(self._owns("alive")), -1, dtype=np.int64)
+        remap[alive] = np.arange(len(alive))
+
+        # Per-year history: latest write per (edge, year), live edges only; edges without
+        # a history (scenario edges) contribute their single year/percent, as in from_session().
+        hist_edge = remap[self.history["edge"].values]
+        hist_year, hist_percent = self.history["year"].values, self.history["percent"].values
+        live = hist_edge >= 0
+        hist_edge, hist_year, hist_percent = hist_edge[live], hist_year[live], hist_percent[live]
+        keep = _last_per_key(hist_edge, hist_year)
+        hist_edge, hist_year, hist_percent = hist_edge[keep], hist_year[keep], hist_percent[keep]
+        year = self._owns("year")[alive]
+        fallback = np.flatnonzero((np.bincount(hist_edge, minlength=len(alive)) == 0) & (year >= 0))
+        hist_edge = np.concatenate([hist_edge, fallback])
+        hist_year = np.concatenate([hist_year, year[fallback]])
+        hist_percent = np.concatenate([hist_percent, self._owns("percent")[alive][fallback]])
+        order = np.argsort(hist_edge, kind="stable")
+
+        def names(table):
+            return [name if name is not None else node_id for node_id, name in zip(table.ids, table["name"])]
+
+        return GraphSnapshot.from_arrays(
+            companies={"id": list(self.companies.ids), "name": names(self.companies),
+                       "sector": list(self.companies["sector"]), "location": list(self.companies["location"]),
+                       "market_cap": np.nan_to_num(self.companies["market_cap"]),
+                       "total_risk": self.companies["total_risk"].copy(), "dollarized_risk": self.companies["dollarized_risk"].copy()},
+            blockholders={"id": list(self.blockholders.ids), "name": names(self.blockholders),
+                          "total_risk": self.blockholders["total_risk"].copy(), "dollarized_risk": self.blockholders["dollarized_risk"].copy()},
+            risk_factors={"name": list(self.risk_factors.ids), "dollarized_risk": self.risk_factors["dollarized_risk"].copy()},
+            owns={"owner_is_company": self._owns("owner_is_company")[alive], "owner": self._owns("owner")[alive],
+                  "company": self._owns("company")[alive], "percent": np.nan_to_num(self._owns("percent")[alive]),
+                  "year": year, "history_edge": hist_edge[order], "history_year": hist_year[order],
+                  "history_percent": np.nan_to_num(hist_percent[order])},
+            exposures={"company": self.exposure_company.copy(), "factor": self.exposure_factor.copy(),
+                       "weight": np.nan_to_num(self.exposure_weight)},
+        )
+
+    # --- Persistence ---
+
+    def save(self, directory):
+        """Writes numeric columns to graph.npz and ids/string columns to nodes.json."""
+        os.makedirs(directory, exist_ok=True)
+        arrays, nodes = {}, {}
+        for label, table in (("Company", self.companies), ("Blockholder", self.blockholders), ("RiskFactor", self.risk_factors)):
+            nodes[label] = {"ids": table.ids, "columns": {}, "numeric": []}
+            for name, column in table.columns.items():
+                if column.dtype is object:
+                    nodes[label]["columns"][name] = list(column.values)
+                else:
+                    arrays[f"{label}.{name}"] = column.values
+                    nodes[label]["numeric"].append(name)
+        snapshot_edges = np.flatnonzero(self._owns("alive"))
+        for name in self.owns:
+            arrays[f"owns.{name}"] = self._owns(name)[snapshot_edges]
+        remap = np.full(len(self._owns("alive")), -1, dtype=np.int64)
+        remap[snapshot_edges] = np.arange(len(snapshot_edges))
+        hist_edge = remap[self.history["edge"].values]
+        live = hist_edge >= 0
+        arrays["history.edge"] = hist_edge[live]
+        arrays["history.year"] = self.history["year"].values[live]
+        arrays["history.percent"] = self.history["percent"].values[live]
+        arrays["exposure.company"], arrays["exposure.factor"], arrays["exposure.weight"] = \
+            self.exposure_company, self.exposure_factor, self.exposure_weight
+        np.savez(os.path.join(directory, self.ARRAYS_FILE), **arrays)
+        with open(os.path.join(directory, self.NODES_FILE), "w") as f:
+            json.dump(nodes, f, default=str)
+        self.dirty = False
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, cls.ARRAYS_FILE)) and os.path.exists(os.path.join(directory, cls.NODES_FILE))
+
+    @classmethod
+    def load(cls, directory) -> "InMemoryGraph":
+        graph = cls()
+        with np.load(os.path.join(directory, cls.ARRAYS_FILE)) as data:
+            arrays = {key: data[key] for key in data.files}
+        with open(os.path.join(directory, cls.NODES_FILE)) as f:
+            nodes = json.load(f)
+        for label, table in (("Company", graph.companies), ("Blockholder", graph.blockholders), ("RiskFactor", graph.risk_factors)):
+            state = nodes[label]
+            table.ensure(state["ids"])
+            for name, values in state["columns"].items():
+                table.set(name, np.arange(len(state["ids"])), np.array(values, dtype=object))
+            for name in state["numeric"]:
+                table.set(name, np.arange(len(state["ids"])), arrays[f"{label}.{name}"].astype(float))
+        saved_to_new = np.empty(len(arrays["owns.owner"]), dtype=np.int64)
+        for is_company in (False, True):
+            mask = np.flatnonzero(arrays["owns.owner_is_company"] == is_company)
+            if len(mask):
+                edges = graph._merge_owns(is_company, arrays["owns.owner"][mask], arrays["owns.company"][mask])
+                graph._owns("percent")[edges] = arrays["owns.percent"][mask]
+                graph._owns("year")[edges] = arrays["owns.year"][mask]
+                saved_to_new[mask] = edges
+        graph.history["edge"].extend(saved_to_new[arrays["history.edge"]])
+        graph.history["year"].extend(arrays["history.year"])
+        graph.history["percent"].extend(arrays["history.percent"])
+        graph.exposure_company = arrays["exposure.company"].astype(np.int64)
+        graph.exposure_factor = arrays["exposure.factor"].astype(np.int64)
+        graph.exposure_weight = arrays["exposure.weight"].astype(float)
+        graph.dirty = False
+        return graph
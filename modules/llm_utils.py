@@ -56,6 +56,38 @@ def explain_query_result(query: str, preview_df: pd.DataFrame, llm="gemini") ->
     )
     return query_llm(prompt, llm=llm)
 
+def format_attribution(attribution: dict, top_k=5) -> str:
+    """
+    Renders a RiskEngine.explain_risk attribution as a few compact text lines.
+    """
+    lines = [f"{attribution['label']} '{attribution['name']}': dollarized risk ${attribution['dollarized_risk']:,.0f}"]
+    companies = ", ".join(f"{r['company_name']} (${r['contribution']:,.0f})" for r in attribution["by_company"][:top_k])
+    factors = ", ".join(f"{r['risk_factor']} (${r['contribution']:,.0f})" for r in attribution["by_risk_factor"][:top_k])
+    if companies:
+        lines.append(f"  Top companies: {companies}")
+    if factors:
+        lines.append(f"  Top risk factors: {factors}")
+    return "\n".join(lines)
+
+def summarize_scenario_attribution(scenario: str, diff_df: pd.DataFrame, attributions: dict, llm="gemini") -> str:
+    """
+    Uses the LLM to summarize a scenario from the largest risk movers and their
+    attribution (per company / risk factor) instead of the raw diff table.
+    """
+    movers = diff_df.reindex(diff_df["delta"].abs().sort_values(ascending=False).index).head(10)
+    mover_lines = "\n".join(
+        f"- {row['name']}: {row['risk_before']:,.0f} -> {row['risk_after']:,.0f} (delta {row['delta']:,.0f})"
+        for _, row in movers.iterrows()
+    )
+    attribution_lines = "\n".join(format_attribution(a) for a in attributions.values())
+    prompt = (
+        f"You are a risk analyst. A '{scenario}' scenario was simulated on a company ownership risk graph.\n"
+        f"Largest dollarized risk changes:\n{mover_lines}\n\n"
+        f"Where the post-scenario risk of these nodes comes from:\n{attribution_lines}\n\n"
+        "Summarize the top gainers/losers and explain which companies and risk factors drive the changes (4–6 lines)."
+    )
+    return query_llm(prompt, llm=llm)
+
 def create_cypher_query_from_llm(question: str) -> str:
     """
     Constructs a detailed prompt with schema and examples to get a precise Cypher query.
@@ -71,11 +103,11 @@ Do not include any comments, explanations, or extra text outside of the query it
 
 # Node Properties:
 - `Company`: `id`, `name`, `sector`, `location`, `total_risk`, `direct_risk`, `dollarized_risk`, `market_cap`.
-- `Blockholder`: `id`, `name`, `type`, `total_risk`, `dollarized_risk`.
+- `Blockholder`: `id`, `name`, `type`, `total_risk`, `dollarized_risk`, `hhi_sector`, `hhi_location`, `hhi_risk_factor`, `top_sector`, `top_location`, `top_risk_factor` (and `top_*_share`).
 - `RiskFactor`: `name`.
 
 # Relationship Properties:
-- `(p:Blockholder)-[o:OWNS]->(c:Company)`: `percent` (0.0-1.0), `year`.
+- `(p:Blockholder)-[o:OWNS]->(c:Company)`: `percent` (0.0-1.0), `year` (latest loaded year), `years` and `percents` (parallel lists with the per-year ownership history).
 - `(c:Company)-[e:EXPOSED_TO]->(rf:RiskFactor)`: `weight` (0.0-1.0).
 
 # Business Logic & Best Practices:
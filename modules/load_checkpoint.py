@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import datetime
+
+
+class LoadCheckpoint:
+    """
+    Durable manifest of the chunks of one CSV load that are committed to the graph, so an
+    interrupted load can resume where it stopped. The manifest is keyed by the file's
+    path, size and modification time plus the load parameters (chunk size, year range);
+    if any of them changed, nothing counts as committed. Loads are MERGE-based, so
+    re-running a chunk that was committed but not yet recorded is harmless.
+    """
+    def __init__(self, directory, csv_file_path, params, autosave=True):
+        self.directory = directory
+        self.autosave = autosave
+        abspath = os.path.abspath(csv_file_path)
+        stat = os.stat(abspath)
+        self.signature = {"file": abspath, "size": stat.st_size, "mtime": stat.st_mtime, **params}
+        digest = hashlib.sha1(abspath.encode()).hexdigest()[:10]
+        self.path = os.path.join(directory, f"{os.path.basename(abspath)}.{digest}.json") if directory else None
+        self.committed = set()
+        self.rows_loaded = 0
+        self.completed = False
+        self.matched = False
+
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Could not read load checkpoint {self.path}, ignoring it. Error: {e}")
+                manifest = None
+            if manifest is not None and manifest.get("signature") == self.signature:
+                self.matched = True
+                self.committed = {i for start, end in manifest["committed"] for i in range(start, end + 1)}
+                self.rows_loaded = manifest.get("rows_loaded", 0)
+                self.completed = manifest.get("completed", False)
+
+    def __contains__(self, chunk_index):
+        return chunk_index in self.committed
+
+    def committed_prefix(self) -> int:
+        """Number of consecutive committed chunks from the start of the file."""
+        count = 0
+        while count in self.committed:
+            count += 1
+        return count
+
+    def ranges(self) -> list:
+        """Committed chunk indexes as inclusive [start, end] ranges."""
+        ranges = []
+        for i in sorted(self.committed):
+            if ranges and ranges[-1][1] == i - 1:
+                ranges[-1][1] = i
+            else:
+                ranges.append([i, i])
+        return ranges
+
+    def mark(self, chunk_index, rows):
+        """Records a committed chunk; call only after its write transaction succeeded."""
+        self.committed.add(chunk_index)
+        self.rows_loaded += rows
+        if self.autosave:
+            self.save()
+
+    def complete(self):
+        self.completed = True
+        if self.autosave:
+            self.save()
+
+    def save(self):
+        """Atomically rewrites the manifest (temp file + rename)."""
+        if not self.path:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "signature": self.signature,
+                "committed": self.ranges(),
+                "rows_loaded": self.rows_loaded,
+                "completed": self.completed,
+                "updated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def clear_all(directory):
+        """Deletes every manifest in directory, e.g. after the graph has been cleared."""
+        if not directory or not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(directory, name))
@@ -0,0 +1,90 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from modules.risk_sensitivity import ownership_matrix
+
+
+class MarketCapStore:
+    """
+    Daily market cap series for all companies, stored as a memory-mapped
+    company x date float64 array (market_cap.npy) plus a JSON sidecar with the
+    company ids and ISO dates. Missing observations are NaN.
+    """
+    ARRAY_FILE = "market_cap.npy"
+    META_FILE = "meta.json"
+
+    def __init__(self, directory, company_ids, dates, values):
+        self.directory = directory
+        self.company_ids = list(company_ids)
+        self.dates = pd.DatetimeIndex(pd.to_datetime(dates))
+        self.values = values
+        self._company_index = pd.Index(self.company_ids)
+
+    @classmethod
+    def create(cls, directory, company_ids, dates):
+        """Creates an empty (all-NaN) store on disk and returns it opened for writing."""
+        os.makedirs(directory, exist_ok=True)
+        dates = pd.DatetimeIndex(pd.to_datetime(dates))
+        values = np.lib.format.open_memmap(
+            os.path.join(directory, cls.ARRAY_FILE), mode="w+", dtype=np.float64,
+            shape=(len(company_ids), len(dates)),
+        )
+        values[:] = np.nan
+        with open(os.path.join(directory, cls.META_FILE), "w") as f:
+            json.dump({"company_ids": list(company_ids), "dates": [d.strftime("%Y-%m-%d") for d in dates]}, f)
+        return cls(directory, company_ids, dates, values)
+
+    @classmethod
+    def open(cls, directory, mode="r"):
+        """Opens an existing store; the array is memory-mapped, not read into RAM."""
+        with open(os.path.join(directory, cls.META_FILE)) as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(directory, cls.ARRAY_FILE), mmap_mode=mode)
+        return cls(directory, meta["company_ids"], meta["dates"], values)
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, cls.ARRAY_FILE)) and os.path.exists(os.path.join(directory, cls.META_FILE))
+
+    def flush(self):
+        if isinstance(self.values, np.memmap):
+            self.values.flush()
+
+    def date_slice(self, start_date=None, end_date=None):
+        """Returns the column slice covering [start_date, end_date]."""
+        start = self.dates.searchsorted(pd.Timestamp(start_date)) if start_date is not None else 0
+        end = self.dates.searchsorted(pd.Timestamp(end_date), side="right") if end_date is not None else len(self.dates)
+        return slice(start, end)
+
+    def aligned(self, company_ids, start_date=None, end_date=None):
+        """
+        Returns (dates, array) with one row per requested company id, in that order.
+        Companies missing from the store get all-NaN rows.
+        """
+        columns = self.date_slice(start_date, end_date)
+        positions = self._company_index.get_indexer(list(company_ids))
+        out = np.full((len(positions), columns.stop - columns.start), np.nan)
+        found = positions >= 0
+        out[found] = self.values[positions[found], columns]
+        return self.dates[columns], out
+
+
+def dollarized_risk_history(snapshot, store, start_date=None, end_date=None):
+    """
+    Dollarized risk time series for every company and blockholder as one vectorized
+    product over the current risk vector: company[c, t] = total_risk[c] * market_cap[c, t],
+    blockholder = P @ company, with P the Blockholder x Company ownership matrix.
+    """
+    dates, caps = store.aligned(snapshot.company_ids, start_date, end_date)
+    company = snapshot.company_total_risk[:, None] * np.nan_to_num(caps, nan=0.0)
+    blockholder = ownership_matrix(snapshot) @ company
+    return {
+        "dates": dates,
+        "company_ids": snapshot.company_ids,
+        "company": company,
+        "blockholder_ids": snapshot.blockholder_ids,
+        "blockholder": np.asarray(blockholder),
+    }
@@ -0,0 +1,144 @@
+import re
+import bisect
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+
+def normalize_name(name) -> str:
+    """Lowercase, ASCII-folded name with punctuation collapsed to single spaces."""
+    text = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    In-memory typeahead index over Company/Blockholder names.
+    - Prefix matches (whole name or any word) come from a sorted key array searched with bisect.
+    - Fuzzy/substring matches come from a trigram inverted index scored by Jaccard similarity.
+    Results are ranked, paginated and carry the node id, so entities sharing a name
+    stay distinguishable (their display string includes the id). Only the requested page
+    is ranked, so short queries matching much of the index stay cheap.
+    """
+    EXACT_SCORE = 3.0
+    NAME_PREFIX_SCORE = 2.0
+    WORD_PREFIX_SCORE = 1.5
+
+    def __init__(self, entries, min_trigram_similarity=0.3):
+        """entries: iterable of (id, name, label) tuples; missing (None/NaN) names fall back to the id."""
+        entries = list(entries)
+        self.ids = [e[0] for e in entries]
+        self.names = [e[1] if isinstance(e[1], str) else str(e[0]) for e in entries]
+        self.labels = [e[2] for e in entries]
+        self._labels = np.array(self.labels, dtype=object)
+        self.normalized = [normalize_name(n) for n in self.names]
+        self.min_trigram_similarity = min_trigram_similarity
+
+        name_counts = Counter(self.normalized)
+        self.display = [
+            f"{name} ({node_id})" if name_counts[norm] > 1 else name
+            for node_id, name, norm in zip(self.ids, self.names, self.normalized)
+        ]
+
+        # Position of each entry in the tie-break order (shorter names first, then alphabetical).
+        self._tie_rank = np.empty(len(entries), dtype=np.int64)
+        self._tie_rank[sorted(range(len(entries)), key=lambda i: (len(self.names[i]), self.names[i]))] = np.arange(len(entries))
+
+        keys = []
+        for i, norm in enumerate(self.normalized):
+            for match in re.finditer(r"\S+", norm):
+                keys.append((norm[match.start():], i, match.start() == 0))
+        keys.sort()
+        self._prefix_keys = [k for k, _, _ in keys]
+        self._prefix_entries = np.array([i for _, i, _ in keys], dtype=np.int64)
+        self._prefix_is_name_start = np.array([start for _, _, start in keys], dtype=bool)
+
+        postings = {}
+        self._trigram_counts = np.zeros(len(entries), dtype=np.int64)
+        for i, norm in enumerate(self.normalized):
+            grams = _trigrams(norm)
+            self._trigram_counts[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: str, label=None, limit=20, offset=0) -> dict:
+        """
+        Returns {'total': number of matches, 'total_exact', 'results': [{'id', 'name', 'label',
+        'display', 'score'}]} for one page of ranked matches, optionally restricted to one
+        node label. Prefix matches always outrank trigram matches, so when they alone fill the
+        page the trigram pass is skipped and 'total' only counts them ('total_exact' is False).
+        """
+        q = normalize_name(query)
+        if not q:
+            return {"total": 0, "total_exact": True, "results": []}
+        wanted = offset + limit
+
+        lo = bisect.bisect_left(self._prefix_keys, q)
+        hi = bisect.bisect_left(self._prefix_keys, q + "\x7f")
+        exact = bisect.bisect_right(self._prefix_keys, q, lo, hi) - lo
+        entries = self._prefix_entries[lo:hi]
+        name_start = self._prefix_is_name_start[lo:hi]
+        scores = np.where(name_start, self.NAME_PREFIX_SCORE, self.WORD_PREFIX_SCORE)
+        scores[:exact][name_start[:exact]] = self.EXACT_SCORE
+        # An entry matches once per matching word; keep its best score.
+        order = np.lexsort((-scores, entries))
+        entries, scores = entries[order], scores[order]
+        first = np.ones(len(entries), dtype=bool)
+        first[1:] = entries[1:] != entries[:-1]
+        entries, scores = entries[first], scores[first]
+        if label is not None:
+            keep = self._labels[entries] == label
+            entries, scores = entries[keep], scores[keep]
+
+        total_exact = len(entries) < wanted
+        if total_exact:
+            query_grams = _trigrams(q)
+            lists = [self._postings[g] for g in query_grams if g in self._postings]
+            if lists:
+                candidates, shared = np.unique(np.concatenate(lists), return_counts=True)
+                similarity = shared / (len(query_grams) + self._trigram_counts[candidates] - shared)
+                keep = (similarity >= self.min_trigram_similarity) & ~np.isin(candidates, entries)
+                if label is not None:
+                    keep &= self._labels[candidates] == label
+                entries = np.concatenate([entries, candidates[keep]])
+                scores = np.concatenate([scores, similarity[keep]])
+
+        total = len(entries)
+        entries, scores = self._top(entries, scores, wanted)
+        return {
+            "total": total,
+            "total_exact": total_exact,
+            "results": [{
+                "id": self.ids[i],
+                "name": self.names[i],
+                "label": self.labels[i],
+                "display": self.display[i],
+                "score": score,
+            } for i, score in zip(entries[offset:].tolist(), scores[offset:].tolist())],
+        }
+
+    def _top(self, entries, scores, k):
+        """The k best matches in rank order: higher score first, then the tie-break order."""
+        if k <= 0:
+            return entries[:0], scores[:0]
+        if len(entries) > k:
+            threshold = -np.partition(-scores, k - 1)[k - 1]
+            above = np.flatnonzero(scores > threshold)
+            tied = np.flatnonzero(scores == threshold)
+            need = k - len(above)
+            if len(tied) > need:
+                tied = tied[np.argpartition(self._tie_rank[entries[tied]], need - 1)[:need]]
+            chosen = np.concatenate([above, tied])
+            entries, scores = entries[chosen], scores[chosen]
+        order = np.lexsort((self._tie_rank[entries], -scores))
+        return entries[order], scores[order]
@@ -0,0 +1,161 @@
+import os
+import json
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
+
+
+def ownership_adjacency(snapshot):
+    """
+    Sparse N x N direct ownership matrix A[owner, owned] over all nodes (companies first,
+    then blockholders), with duplicate OWNS edges summed.
+    """
+    snap = snapshot
+    num_nodes = snap.num_companies + snap.num_blockholders
+    owner = np.where(snap.owns_owner_is_company, snap.owns_owner, snap.owns_owner + snap.num_companies)
+    A = sp.csr_matrix((snap.owns_percent, (owner, snap.owns_company)), shape=(num_nodes, num_nodes))
+    A.sum_duplicates()
+    return A
+
+
+def integrated_ownership(A, threshold=1e-4, max_depth=20):
+    """
+    Truncated (I - A)^-1 - I = A + A^2 + A^3 + ...: the total stake every node holds in
+    every company through all ownership chains. Each power is pruned below `threshold`
+    before the next multiplication, which keeps the series sparse and makes it terminate
+    on cyclic cross-holdings.
+    """
+    term = A.copy()
+    term.data[term.data < threshold] = 0.0
+    term.eliminate_zeros()
+    total = term.copy()
+    for _ in range(max_depth - 1):
+        term = (term @ A).tocsr()
+        term.data[term.data < threshold] = 0.0
+        term.eliminate_zeros()
+        if term.nnz == 0:
+            break
+        total = total + term
+    total = total.tocsr()
+    total.data[total.data < threshold] = 0.0
+    total.eliminate_zeros()
+    return total
+
+
+class OwnershipIndex:
+    """
+    Integrated ownership index. Rows of `holdings` (CSR) list everything a node owns
+    directly or indirectly; rows of `owners` (the CSR transpose) list a company's direct
+    and ultimate owners, so both lookups are O(k) in the number of results.
+    Strongest control paths are found on the direct ownership graph with Dijkstra over
+    -log(percent), i.e. the path maximizing the product of stakes.
+    """
+    FILE = "ownership_index.npz"
+    META_FILE = "ownership_index.json"
+
+    def __init__(self, ids, names, labels, direct, holdings, fingerprint=None):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.labels = list(labels)
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        self.direct = direct.tocsr()
+        self.holdings = holdings.tocsr()
+        self.owners = holdings.T.tocsr()
+        self.fingerprint = fingerprint
+        self._path_graph = None
+
+    @staticmethod
+    def fingerprint_for(snapshot, threshold, max_depth):
+        """Cheap identity of the OWNS data an index was built from, used to reuse a persisted index."""
+        return f"{snapshot.num_companies}:{snapshot.num_blockholders}:{len(snapshot.owns_percent)}:{snapshot.owns_percent.sum():.9f}:{threshold}:{max_depth}"
+
+    @classmethod
+    def build(cls, snapshot, threshold=1e-4, max_depth=20):
+        snap = snapshot
+        A = ownership_adjacency(snap)
+        return cls(
+            snap.company_ids + snap.blockholder_ids,
+            snap.company_names + snap.blockholder_names,
+            ["Company"] * snap.num_companies + ["Blockholder"] * snap.num_blockholders,
+            A, integrated_ownership(A, threshold, max_depth),
+            fingerprint=cls.fingerprint_for(snap, threshold, max_depth),
+        )
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            os.path.join(directory, self.FILE),
+            direct_data=self.direct.data, direct_indices=self.direct.indices, direct_indptr=self.direct.indptr,
+            data=self.holdings.data, indices=self.holdings.indices, indptr=self.holdings.indptr,
+        )
+        with open(os.path.join(directory, self.META_FILE), "w") as f:
+            json.dump({"ids": self.ids, "names": self.names, "labels": self.labels, "fingerprint": self.fingerprint}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Loads a persisted index, or returns None if there is none."""
+        try:
+            with open(os.path.join(directory, cls.META_FILE)) as f:
+                meta = json.load(f)
+            arrays = np.load(os.path.join(directory, cls.FILE))
+        except (OSError, ValueError):
+            return None
+        n = len(meta["ids"])
+        direct = sp.csr_matrix((arrays["direct_data"], arrays["direct_indices"], arrays["direct_indptr"]), shape=(n, n))
+        holdings = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=(n, n))
+        return cls(meta["ids"], meta["names"], meta["labels"], direct, holdings, fingerprint=meta.get("fingerprint"))
+
+    def _row(self, matrix, node_id, min_percent):
+        if node_id not in self.index:
+            return []
+        i = self.index[node_id]
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        cols, vals = matrix.indices[start:end], matrix.data[start:end]
+        keep = (vals >= min_percent) & (cols != i)
+        order = np.argsort(-vals[keep])
+        return [{
+            "id": self.ids[j], "name": self.names[j], "label": self.labels[j],
+            "integrated_percent": float(v),
+        } for j, v in zip(cols[keep][order].tolist(), vals[keep][order].tolist())]
+
+    def ultimate_owners(self, company_id, min_percent=0.0) -> list:
+        """Every node holding at least min_percent of company_id directly or through intermediate companies."""
+        return self._with_direct(self._row(self.owners, company_id, min_percent), company_id, owners=True)
+
+    def controlled_by(self, owner_id, min_percent=0.2) -> list:
+        """Every company in which owner_id holds at least min_percent, directly or indirectly."""
+        return self._with_direct(self._row(self.holdings, owner_id, min_percent), owner_id, owners=False)
+
+    def _with_direct(self, rows, node_id, owners):
+        i = self.index.get(node_id)
+        for row in rows:
+            j = self.index[row["id"]]
+            row["direct_percent"] = float(self.direct[j, i] if owners else self.direct[i, j])
+        return rows
+
+    def strongest_control_path(self, owner_id, company_id):
+        """
+        The ownership chain from owner_id to company_id with the largest product of stakes.
+        Returns {'path': [{'id', 'name', 'label'}], 'percent': product of stakes} or None.
+        """
+        if owner_id not in self.index or company_id not in self.index:
+            return None
+        if self._path_graph is None:
+            graph = self.direct.copy()
+            # Stakes of 100% cost 0; a tiny positive cost keeps those edges explicit for csgraph.
+            graph.data = np.maximum(-np.log(np.clip(graph.data, 1e-12, 1.0)), 1e-12)
+            self._path_graph = graph
+        source, target = self.index[owner_id], self.index[company_id]
+        distances, predecessors = dijkstra(self._path_graph, directed=True, indices=source, return_predecessors=True)
+        if not np.isfinite(distances[target]) or source == target:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        path.reverse()
+        percent = float(np.prod([self.direct[a, b] for a, b in zip(path[:-1], path[1:])]))
+        return {
+            "path": [{"id": self.ids[i], "name": self.names[i], "label": self.labels[i]} for i in path],
+            "percent": percent,
+        }
@@ -0,0 +1,171 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from modules.logging_utils import logger
+
+
+class Stage:
+    """
+    One pipeline step: `run(record)` is called inside the profiler stage (set record["rows"]
+    to report throughput). `depends_on` names the stages whose outputs it reads; stages
+    sharing a name in `resources` never run at the same time (e.g. everything writing to
+    the graph holds "graph").
+    """
+    def __init__(self, name, run, depends_on=(), resources=(), description=""):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.resources = frozenset(resources)
+        self.description = description
+
+
+class PipelineDAG:
+    """Dependency graph of pipeline stages, validated for unknown dependencies and cycles."""
+    def __init__(self, stages):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate pipeline stage {stage.name!r}.")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            unknown = [d for d in stage.depends_on if d not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name!r} depends on unknown stage(s): {', '.join(unknown)}.")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list:
+        remaining = {name: set(stage.depends_on) for name, stage in self.stages.items()}
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline stages form a cycle: {', '.join(sorted(remaining))}.")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def select(self, targets=None, skip=(), with_dependencies=True) -> list:
+        """
+        Stages to run, in topological order: `targets` (default all) plus, unless
+        with_dependencies is False, everything upstream of them; minus `skip` and whatever
+        is only needed by skipped stages. Dependencies outside the selection are assumed
+        to be satisfied already.
+        """
+        unknown = [name for name in list(targets or []) + list(skip) if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown pipeline stage(s): {', '.join(unknown)}. Known: {', '.join(self.order)}.")
+        skip = set(skip)
+        selected = set(targets or self.stages) - skip
+        if with_dependencies:
+            pending = list(selected)
+            while pending:
+                for dep in self.stages[pending.pop()].depends_on:
+                    if dep not in selected and dep not in skip:
+                        selected.add(dep)
+                        pending.append(dep)
+        return [name for name in self.order if name in selected]
+
+    def _selected_deps(self, name, selected):
+        return [d for d in self.stages[name].depends_on if d in selected]
+
+    def waves(self, selected) -> list:
+        """Groups the selected stages by dependency depth; each wave only needs earlier waves."""
+        selected = set(selected)
+        depth = {}
+        for name in self.order:
+            if name in selected:
+                depth[name] = 1 + max((depth[d] for d in self._selected_deps(name, selected)), default=-1)
+        return [[n for n in self.order if depth.get(n) == level] for level in range(max(depth.values(), default=-1) + 1)]
+
+    def critical_path(self, selected, durations, default=1.0):
+        """(seconds, stage names) of the longest dependency chain, given per-stage durations."""
+        selected = set(selected)
+        finish, previous = {}, {}
+        for name in self.order:
+            if name not in selected:
+                continue
+            deps = self._selected_deps(name, selected)
+            start = max((finish[d] for d in deps), default=0.0)
+            previous[name] = max(deps, key=finish.get) if deps else None
+            finish[name] = start + durations.get(name, default)
+        if not finish:
+            return 0.0, []
+        name = max(finish, key=finish.get)
+        total, path = finish[name], []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return total, path[::-1]
+
+    def _priorities(self, selected, durations, default=1.0):
+        """Longest remaining path (own duration plus the slowest downstream chain) per stage."""
+        selected = set(selected)
+        dependents = {name: [] for name in selected}
+        for name in selected:
+            for dep in self._selected_deps(name, selected):
+                dependents[dep].append(name)
+        priority = {}
+        for name in reversed(self.order):
+            if name in selected:
+                priority[name] = durations.get(name, default) + max((priority[d] for d in dependents[name]), default=0.0)
+        return priority
+
+    def run(self, profiler, selected, max_workers=4, durations=None):
+        """
+        Runs the selected stages on a pool of `max_workers` threads as soon as their
+        dependencies have finished and their resources are free, highest remaining
+        critical path first (estimated from `durations`, e.g. a baseline profile).
+        After a failure no new stages start; running ones finish, the rest are skipped,
+        and the first error is re-raised.
+        """
+        durations = durations or {}
+        max_workers = max(1, max_workers)
+        selected = list(selected)
+        deps = {name: self._selected_deps(name, set(selected)) for name in selected}
+        priority = self._priorities(selected, durations)
+        pending = set(selected)
+        done, running, held = set(), {}, set()
+        error = None
+
+        def execute(stage):
+            with profiler.stage(stage.name) as record:
+                record["dependencies"] = deps[stage.name]
+                stage.run(record)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as pool:
+            while pending or running:
+                if error is None:
+                    ready = sorted((name for name in pending if all(d in done for d in deps[name])),
+                                   key=lambda name: -priority[name])
+                    for name in ready:
+                        if len(running) >= max_workers:
+                            break
+                        stage = self.stages[name]
+                        if stage.resources & held:
+                            continue
+                        held |= stage.resources
+                        pending.discard(name)
+                        running[pool.submit(execute, stage)] = name
+                        logger.info(f"[dag] Started {name} ({len(running)} running)")
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    held -= self.stages[name].resources
+                    if future.exception() is not None:
+                        if error is None:
+                            error = future.exception()
+                        logger.error(f"[dag] Stage {name} failed: {future.exception()}")
+                    else:
+                        done.add(name)
+        if error is not None:
+            if pending:
+                logger.warning(f"[dag] Skipped {len(pending)} stage(s) after the failure: {', '.join(n for n in selected if n in pending)}")
+            raise error
+        logger.info(f"[dag] Ran {len(done)} stage(s) in {time.perf_counter() - started:.2f}s with up to {max_workers} workers.")
+        return done
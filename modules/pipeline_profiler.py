@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import cProfile
+import datetime
+import contextlib
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then omitted.
+    resource = None
+
+from modules.logging_utils import logger
+from modules.query_metrics import metrics as query_metrics
+
+
+def _peak_rss_mb():
+    """Process high-water RSS in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+class PipelineProfiler:
+    """
+    Times every pipeline stage: wall and CPU time, rows processed and rows/sec and DB round
+    trips (from the query metrics registry). Optionally captures a cProfile per stage.
+    The run report is plain JSON so it can be stored as a baseline and compared later.
+    Stages may run on concurrent threads, so CPU time and DB round trips are counted for
+    the stage's own thread. Memory cannot be split by thread: the peak Python heap
+    (tracemalloc) and peak RSS (resource) are reported for the whole run only.
+    cProfile captures require stages to run one at a time.
+    """
+    def __init__(self, trace_memory=True, cprofile_dir=None):
+        self.trace_memory = trace_memory
+        self.cprofile_dir = cprofile_dir
+        self.stages = []
+        self.summary = {}
+        self.started_at = datetime.datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name, rows=None):
+        """
+        Profiles the enclosed block as one stage. Yields the stage record; set
+        record["rows"] inside the block when the row count is only known at the end.
+        """
+        record = {"stage": name, "rows": rows, "status": "ok"}
+        queries_before, db_rows_before = query_metrics.thread_totals()
+        profiler = cProfile.Profile() if self.cprofile_dir else None
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        except Exception:
+            record["status"] = "failed"
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.cprofile_dir, f"{name}.prof"))
+            wall = time.perf_counter() - wall_start
+            queries_after, db_rows_after = query_metrics.thread_totals()
+            record.update({
+                "started_seconds": wall_start - self._start,
+                "wall_seconds": wall,
+                "cpu_seconds": time.thread_time() - cpu_start,
+                "db_round_trips": queries_after - queries_before,
+                "db_rows_returned": db_rows_after - db_rows_before,
+            })
+            record["rows_per_second"] = record["rows"] / wall if record["rows"] and wall > 0 else None
+            self.stages.append(record)
+            logger.info(
+                f"[profile] {name}: {wall:.2f}s wall, {record['cpu_seconds']:.2f}s CPU, "
+                f"{record['db_round_trips']} DB round trips"
+                + (f", {record['rows']} rows ({record['rows_per_second']:.0f}/s)" if record["rows_per_second"] else "")
+            )
+
+    def report(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "total_wall_seconds": time.perf_counter() - self._start,
+            "peak_traced_mb": tracemalloc.get_traced_memory()[1] / (1024 * 1024) if self.trace_memory else None,
+            "peak_rss_mb": _peak_rss_mb(),
+            "stages": self.stages,
+            **self.summary,
+        }
+
+    def write_report(self, path) -> dict:
+        report = self.report()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Pipeline profile written to {path}")
+        return report
+
+
+def load_report(path):
+    """Reads a stored run report, or returns None if it does not exist."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_to_baseline(report, baseline, threshold=0.25, min_seconds=1.0) -> list:
+    """
+    Stages whose wall time grew by more than `threshold` (relative) and `min_seconds`
+    (absolute), or whose throughput dropped by more than `threshold`, versus the baseline.
+    """
+    baseline_stages = {s["stage"]: s for s in baseline.get("stages", [])}
+    regressions = []
+    for current in report["stages"]:
+        base = baseline_stages.get(current["stage"])
+        if base is None or current["status"] != "ok":
+            continue
+        wall_delta = current["wall_seconds"] - base["wall_seconds"]
+        if wall_delta > min_seconds and current["wall_seconds"] > base["wall_seconds"] * (1 + threshold):
+            regressions.append({"stage": current["stage"], "metric": "wall_seconds",
+                                "baseline": base["wall_seconds"], "current": current["wall_seconds"],
+                                "change_pct": 100.0 * wall_delta / base["wall_seconds"] if base["wall_seconds"] else None})
+        if base.get("rows_per_second") and current.get("rows_per_second") \
+                and current["rows_per_second"] < base["rows_per_second"] * (1 - threshold):
+            regressions.append({"stage": current["stage"], "metric": "rows_per_second",
+                                "baseline": base["rows_per_second"], "current": current["rows_per_second"],
+                                "change_pct": 100.0 * (current["rows_per_second"] / base["rows_per_second"] - 1)})
+    return regressions
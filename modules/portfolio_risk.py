@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.stats import norm
+
+from modules.risk_sensitivity import ownership_matrix
+
+
+def factor_exposure_matrix(snapshot):
+    """
+    Dollar exposure of every Blockholder to every RiskFactor through its holdings:
+    X[b, r] = sum_c P[b, c] * market_cap[c] * weight[c, r]  (sparse, blockholders x factors).
+    """
+    snap = snapshot
+    company_factor = sp.csr_matrix(
+        (snap.market_cap[snap.exposure_company] * snap.exposure_weight, (snap.exposure_company, snap.exposure_factor)),
+        shape=(snap.num_companies, snap.num_risk_factors),
+    )
+    return (ownership_matrix(snap) @ company_factor).tocsr()
+
+
+def configured_factor_covariance(factor_names, default_volatility=0.2, correlation_groups=None, base_correlation=0.0):
+    """
+    Builds a factor covariance matrix from local configuration: one volatility for every
+    factor and a correlation for factors in the same group. `correlation_groups` maps a
+    group name to (list of factor-name prefixes, correlation).
+    """
+    n = len(factor_names)
+    group_of = [None] * n
+    group_corr = {}
+    for group, (prefixes, corr) in (correlation_groups or {}).items():
+        group_corr[group] = corr
+        for i, name in enumerate(factor_names):
+            if group_of[i] is None and any(name.startswith(prefix) for prefix in prefixes):
+                group_of[i] = group
+    corr = np.full((n, n), base_correlation, dtype=float)
+    for i in range(n):
+        for j in range(n):
+            if group_of[i] is not None and group_of[i] == group_of[j]:
+                corr[i, j] = group_corr[group_of[i]]
+    np.fill_diagonal(corr, 1.0)
+    vol = np.full(n, default_volatility, dtype=float)
+    return corr * np.outer(vol, vol)
+
+
+def load_factor_covariance_csv(path, factor_names, fallback):
+    """
+    Reads a square covariance CSV (factor names as index and header) and aligns it with
+    factor_names; factors missing from the file keep their entries from `fallback`.
+    """
+    frame = pd.read_csv(path, index_col=0)
+    cov = fallback.copy()
+    positions = pd.Index(frame.index).get_indexer(factor_names)
+    found = np.flatnonzero(positions >= 0)
+    cov[np.ix_(found, found)] = frame.to_numpy(dtype=float)[np.ix_(positions[found], positions[found])]
+    return cov
+
+
+def estimate_factor_covariance(snapshot, store, shrinkage=0.1):
+    """
+    Estimates factor covariance from the market cap history with a cross-sectional
+    regression per day (company log returns = exposure weights @ factor returns),
+    then shrinks the sample covariance toward its diagonal.
+    """
+    snap = snapshot
+    _, caps = store.aligned(snap.company_ids)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(caps), axis=1)
+    valid = np.isfinite(returns).all(axis=1)
+    weights = np.zeros((snap.num_companies, snap.num_risk_factors))
+    np.add.at(weights, (snap.exposure_company, snap.exposure_factor), snap.exposure_weight)
+    factor_returns, *_ = np.linalg.lstsq(weights[valid], returns[valid], rcond=None)
+    sample = np.cov(factor_returns)
+    return (1.0 - shrinkage) * sample + shrinkage * np.diag(np.diag(sample))
+
+
+def _matrix_root(cov):
+    """L with L @ L.T == cov, after clipping negative eigenvalues (configured matrices need not be exactly PSD)."""
+    values, vectors = np.linalg.eigh((cov + cov.T) / 2.0)
+    return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+
+def compute_var_es(exposures, cov, confidence=0.99, num_simulations=0, seed=42, batch_size=2000):
+    """
+    Parametric (Gaussian) and optionally Monte Carlo VaR / Expected Shortfall of the loss
+    exposures @ f with factor shocks f ~ N(0, cov), for every row of `exposures` at once.
+    Returns a dict of arrays, one entry per row.
+    """
+    X = exposures.tocsr() if sp.issparse(exposures) else sp.csr_matrix(exposures)
+    sigma = np.sqrt(np.maximum(np.asarray(X.multiply(X @ cov).sum(axis=1)).ravel(), 0.0))
+    z = norm.ppf(confidence)
+    result = {
+        "volatility": sigma,
+        "var_parametric": z * sigma,
+        "es_parametric": sigma * norm.pdf(z) / (1.0 - confidence),
+    }
+    if num_simulations:
+        rng = np.random.default_rng(seed)
+        shocks = rng.standard_normal((num_simulations, cov.shape[0])) @ _matrix_root(cov).T
+        tail = max(int(np.ceil(num_simulations * (1.0 - confidence))), 1)
+        var_sim = np.zeros(X.shape[0])
+        es_sim = np.zeros(X.shape[0])
+        for start in range(0, X.shape[0], batch_size):
+            losses = np.asarray(X[start:start + batch_size] @ shocks.T)
+            worst = -np.partition(-losses, tail - 1, axis=1)[:, :tail]
+            var_sim[start:start + batch_size] = worst.min(axis=1)
+            es_sim[start:start + batch_size] = worst.mean(axis=1)
+        result["var_simulated"] = var_sim
+        result["es_simulated"] = es_sim
+    return result
+
+
+def factor_covariance(snapshot, covariance_csv=None, store=None, default_volatility=0.2, correlation_groups=None, base_correlation=0.0):
+    """
+    Chooses the factor covariance: a configured matrix, overridden by a covariance CSV if
+    one exists, or estimated from the market cap history when `store` is given.
+    """
+    configured = configured_factor_covariance(snapshot.risk_factor_names, default_volatility, correlation_groups, base_correlation)
+    if store is not None:
+        return estimate_factor_covariance(snapshot, store)
+    if covariance_csv and os.path.exists(covariance_csv):
+        return load_factor_covariance_csv(covariance_csv, snapshot.risk_factor_names, configured)
+    return configured
@@ -0,0 +1,457 @@
+import os
+import sys
+import time
+import atexit
+import tempfile
+import threading
+import contextlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+from neo4j import GraphDatabase
+
+import config
+from modules.logging_utils import get_logger
+
+COUNTER_NAMES = (
+    "nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted",
+    "properties_set", "labels_added", "labels_removed", "indexes_added",
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QueryStats:
+    """Running totals for one named query plus a rolling window of recent durations."""
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.wall_seconds = 0.0
+        self.server_seconds = 0.0
+        self.rows = 0
+        self.counters = dict.fromkeys(COUNTER_NAMES, 0)
+        self.recent = deque(maxlen=window)
+
+    def quantiles(self):
+        if not self.recent:
+            return dict.fromkeys(QUANTILES, 0.0)
+        values = np.percentile(np.fromiter(self.recent, dtype=float), [q * 100 for q in QUANTILES])
+        return dict(zip(QUANTILES, values.tolist()))
+
+
+class QueryMetrics:
+    """
+    Process-wide registry of Cypher query timings. Every instrumented query records wall time,
+    server time (when the driver reports it), rows returned and write counters under its name;
+    queries slower than slow_query_ms go to logs/slow_queries.log with their parameters.
+    Once configure()d, metrics are exported in Prometheus text format to a file and,
+    optionally, over HTTP.
+    """
+    def __init__(self, slow_query_ms=1000.0, window=1024, metrics_file=None, flush_interval=10.0):
+        self.slow_query_ms = slow_query_ms
+        self.window = window
+        self.metrics_file = metrics_file
+        self.flush_interval = flush_interval
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._server = None
+        self._exit_hook = False
+        # Per-thread (queries, rows) totals, so concurrent pipeline stages can each count their own.
+        self._thread_totals = threading.local()
+
+    def record(self, name, query, params, wall_seconds, rows=0, server_seconds=None, counters=None, error=False):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = QueryStats(self.window)
+            stats.count += 1
+            stats.errors += int(error)
+            stats.wall_seconds += wall_seconds
+            stats.server_seconds += server_seconds or 0.0
+            stats.rows += rows
+            stats.recent.append(wall_seconds)
+            for key, value in (counters or {}).items():
+                stats.counters[key] += value
+        self._thread_totals.queries = getattr(self._thread_totals, "queries", 0) + 1
+        self._thread_totals.rows = getattr(self._thread_totals, "rows", 0) + rows
+        if wall_seconds * 1000.0 >= self.slow_query_ms:
+            get_logger("slow_queries").warning(
+                f"Slow query {name}: {wall_seconds * 1000.0:.1f} ms wall, "
+                f"{(server_seconds or 0.0) * 1000.0:.1f} ms server, {rows} rows; "
+                f"params={_summarize_params(params)}; query={' '.join(str(query).split())[:2000]}"
+            )
+        if self.metrics_file and time.monotonic() - self._last_flush >= self.flush_interval:
+            with self._flush_lock:
+                # Another thread may have flushed while this one waited for the lock.
+                if time.monotonic() - self._last_flush >= self.flush_interval:
+                    self.write_prometheus(self.metrics_file)
+
+    def configure(self, metrics_file=None, port=0, host="127.0.0.1"):
+        """
+        Enables export: `metrics_file` is rewritten every flush_interval seconds and at exit,
+        and a non-zero `port` serves /metrics over HTTP. Safe to call again (e.g. on Streamlit
+        reruns); the server and the exit hook are only started once.
+        """
+        if metrics_file:
+            self.metrics_file = metrics_file
+            if not self._exit_hook:
+                atexit.register(self.write_prometheus)
+                self._exit_hook = True
+        if port and self._server is None:
+            try:
+                self._server = self.start_http_server(port, host)
+            except OSError as e:
+                print(f"WARNING: Could not start query metrics server on port {port}: {e}")
+
+    def totals(self):
+        """(total queries, total rows returned) across all names and threads."""
+        with self._lock:
+            return sum(s.count for s in self.stats.values()), sum(s.rows for s in self.stats.values())
+
+    def thread_totals(self):
+        """(queries, rows returned) recorded by the calling thread, e.g. to count DB round trips of a block."""
+        return getattr(self._thread_totals, "queries", 0), getattr(self._thread_totals, "rows", 0)
+
+    def snapshot(self) -> list:
+        """One dict per query name with totals and rolling p50/p95/p99 wall times (seconds)."""
+        with self._lock:
+            rows = []
+            for name, stats in self.stats.items():
+                quantiles = stats.quantiles()
+                rows.append({
+                    "query": name, "count": stats.count, "errors": stats.errors,
+                    "wall_seconds": stats.wall_seconds, "server_seconds": stats.server_seconds,
+                    "rows": stats.rows,
+                    "p50": quantiles[0.5], "p95": quantiles[0.95], "p99": quantiles[0.99],
+                    **stats.counters,
+                })
+        return sorted(rows, key=lambda r: -r["wall_seconds"])
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP cypher_query_duration_seconds Wall time of Cypher queries (rolling window quantiles).",
+            "# TYPE cypher_query_duration_seconds summary",
+        ]
+        rows = self.snapshot()
+        for row in rows:
+            label = _prometheus_label(row["query"])
+            for q in QUANTILES:
+                lines.append(f'cypher_query_duration_seconds{{query="{label}",quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'cypher_query_duration_seconds_sum{{query="{label}"}} {row["wall_seconds"]:.6f}')
+            lines.append(f'cypher_query_duration_seconds_count{{query="{label}"}} {row["count"]}')
+        for metric, key, help_text in (
+            ("cypher_query_server_seconds_total", "server_seconds", "Server-reported time of Cypher queries."),
+            ("cypher_query_rows_total", "rows", "Rows returned by Cypher queries."),
+            ("cypher_query_errors_total", "errors", "Failed Cypher queries."),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{query="{_prometheus_label(row["query"])}"}} {row[key]}' for row in rows]
+        lines += ["# HELP cypher_query_updates_total Write counters reported for Cypher queries.", "# TYPE cypher_query_updates_total counter"]
+        for row in rows:
+            for counter in COUNTER_NAMES:
+                if row[counter]:
+                    lines.append(f'cypher_query_updates_total{{query="{_prometheus_label(row["query"])}",counter="{counter}"}} {row[counter]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Atomically rewrites the metrics file. Failures are logged, never raised into a query."""
+        path = path or self.metrics_file
+        if not path:
+            return
+        self._last_flush = time.monotonic()
+        tmp_path = None
+        try:
+            directory = os.path.dirname(path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARNING: Could not write query metrics to {path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serves /metrics on a daemon thread. Returns the server."""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"INFO: Serving query metrics at http://{host}:{port}/metrics")
+        return server
+
+
+def _summarize_params(params, max_items=5, max_length=500):
+    """Short repr of query parameters: large lists are truncated to their first items and length."""
+    summary = {}
+    for key, value in (params or {}).items():
+        if isinstance(value, (list, tuple)) and len(value) > max_items:
+            summary[key] = f"{list(value[:max_items])!r}... ({len(value)} items)"
+        else:
+            summary[key] = value
+    text = repr(summary)
+    return text if len(text) <= max_length else text[:max_length] + "..."
+
+
+def _prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Records only; run_pipeline and app.py call metrics.configure() to export.
+metrics = QueryMetrics(slow_query_ms=config.SLOW_QUERY_MS)
+
+_query_name_override = threading.local()
+
+
+@contextlib.contextmanager
+def query_name(name):
+    """Names every query issued inside the block (instead of the calling function's name)."""
+    previous = getattr(_query_name_override, "name", None)
+    _query_name_override.name = name
+    try:
+        yield
+    finally:
+        _query_name_override.name = previous
+
+
+def _caller_name():
+    """module.Class.function of the first caller outside this module and the neo4j driver."""
+    override = getattr(_query_name_override, "name", None)
+    if override:
+        return override
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module != __name__ and not module.startswith("neo4j"):
+            qualname = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            if qualname == "<module>":
+                # Top-level script code (e.g. app.py under Streamlit) is named by file and line.
+                return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno}"
+            # Nested helpers and lambdas are reported under the method that defines them.
+            qualname = qualname.split(".<locals>")[0]
+            return f"{module.rsplit('.', 1)[-1]}.{qualname}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class InstrumentedResult:
+    """
+    Streaming wrapper around neo4j.Result offering the parts of it this project uses. Records
+    are passed through as they arrive; the query is recorded in `metrics` once the result is
+    finished: iterated to the end, read through data()/single()/value()/values(), consume()d,
+    or closed along with its session or transaction.
+    """
+    def __init__(self, result, name, query, params, start):
+        self._result = result
+        self._name = name
+        self._query = query
+        self._params = params
+        self._start = start
+        self._end = None
+        self._rows = 0
+        self._summary = None
+
+    def __iter__(self):
+        try:
+            for record in self._result:
+                self._rows += 1
+                yield record
+        except Exception:
+            self._record_error()
+            raise
+        self._finish()
+
+    def keys(self):
+        return self._result.keys()
+
+    def data(self, *keys):
+        return [record.data(*keys) for record in self]
+
+    def single(self, strict=False):
+        records = iter(self)
+        record = next(records, None)
+        if strict and (record is None or next(records, None) is not None):
+            self._finish()
+            raise ValueError("Expected a single record.")
+        self._finish()
+        return record
+
+    def peek(self):
+        return self._result.peek()
+
+    def value(self, key=0, default=None):
+        return [record.value(key, default) for record in self]
+
+    def values(self, *keys):
+        return [record.values(*keys) for record in self]
+
+    def consume(self):
+        return self._finish()
+
+    def _stop_clock(self):
+        """Called when its session or transaction runs another query: the driver buffers this result then."""
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    def _record_error(self):
+        if self._summary is None:
+            self._summary = False
+            metrics.record(self._name, self._query, self._params, (self._end or time.perf_counter()) - self._start,
+                           rows=self._rows, error=True)
+
+    def _finish(self):
+        """Consumes the rest of the result (once) and records the query. Returns the result summary."""
+        if self._summary is not None:
+            return self._summary or None
+        try:
+            summary = self._result.consume()
+        except Exception:
+            self._record_error()
+            raise
+        self._summary = summary
+        wall = (self._end or time.perf_counter()) - self._start
+        server_ms = (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+        counters = {key: getattr(summary.counters, key, 0) for key in COUNTER_NAMES}
+        metrics.record(self._name, self._query, self._params, wall, rows=self._rows, server_seconds=server_ms / 1000.0, counters=counters)
+        return summary
+
+
+class _ResultOwner:
+    """Session/transaction wrapper base: runs instrumented queries and finishes their results when it closes."""
+    def __init__(self, runner):
+        self._runner = runner
+        self._pending = []
+
+    def run(self, query, parameters=None, **kwargs):
+        name = _caller_name()
+        for result in self._pending:
+            result._stop_clock()
+        params = dict(parameters or {}, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = self._runner.run(query, params)
+        except Exception:
+            metrics.record(name, query, params, time.perf_counter() - start, error=True)
+            raise
+        result = InstrumentedResult(result, name, query, params, start)
+        self._pending = [r for r in self._pending if r._summary is None] + [result]
+        return result
+
+    def _finish_pending(self, raise_errors=True):
+        """Finishes the results not read to the end; errors are recorded, and raised only if `raise_errors`."""
+        pending, self._pending = self._pending, []
+        for result in pending:
+            try:
+                result._finish()
+            except Exception:
+                if raise_errors:
+                    raise
+
+    def __getattr__(self, item):
+        return getattr(self._runner, item)
+
+    def __enter__(self):
+        self._runner.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._finish_pending(raise_errors=exc[0] is None)
+        return self._runner.__exit__(*exc)
+
+
+class InstrumentedTransaction(_ResultOwner):
+    def commit(self):
+        self._finish_pending()
+        return self._runner.commit()
+
+    def rollback(self):
+        self._finish_pending()
+        return self._runner.rollback()
+
+    def close(self):
+        self._finish_pending()
+        return self._runner.close()
+
+
+class InstrumentedSession(_ResultOwner):
+    def _wrap_work(self, work):
+        def run_work(tx, *args, **kwargs):
+            instrumented = InstrumentedTransaction(tx)
+            try:
+                value = work(instrumented, *args, **kwargs)
+            except Exception:
+                instrumented._finish_pending(raise_errors=False)
+                raise
+            instrumented._finish_pending()
+            return value
+        return run_work
+
+    def read_transaction(self, work, *args, **kwargs):
+        return self._session.read_transaction(self._wrap_work(work), *args, **kwargs)
+
+    def write_transaction(self, work, *args, **kwargs):
+        return self._session.write_transaction(self._wrap_work(work), *args, **kwargs)
+
+    def execute_read(self, work, *args, **kwargs):
+        return self._session.execute_read(self._wrap_work(work), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return self._session.execute_write(self._wrap_work(work), *args, **kwargs)
+
+    def begin_transaction(self, *args, **kwargs):
+        self._finish_pending()
+        return InstrumentedTransaction(self._session.begin_transaction(*args, **kwargs))
+
+    @property
+    def _session(self):
+        return self._runner
+
+    def close(self):
+        self._finish_pending()
+        return self._runner.close()
+
+
+class InstrumentedDriver:
+    """neo4j driver wrapper whose sessions and transactions record every query in `metrics`."""
+    def __init__(self, driver):
+        self._driver = driver
+
+    def session(self, *args, **kwargs):
+        return InstrumentedSession(self._driver.session(*args, **kwargs))
+
+    def __getattr__(self, item):
+        return getattr(self._driver, item)
+
+
+def instrumented_driver(uri, auth, **kwargs) -> InstrumentedDriver:
+    """GraphDatabase.driver(...) routed through the query metrics registry."""
+    return InstrumentedDriver(GraphDatabase.driver(uri, auth=auth, **kwargs))
+
+
+def execute_and_fetch(client, query, name=None, parameters=None) -> list:
+    """Runs a query on a gqlalchemy Memgraph client and records it like the neo4j queries."""
+    name = name or _caller_name()
+    start = time.perf_counter()
+    try:
+        results = list(client.execute_and_fetch(query, parameters or {}))
+    except Exception:
+        metrics.record(name, query, parameters, time.perf_counter() - start, error=True)
+        raise
+    metrics.record(name, query, parameters, time.perf_counter() - start, rows=len(results))
+    return results
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+
+def _same(left, right) -> np.ndarray:
+    """Element-wise equality where two missing values (None/NaN) also count as equal."""
+    return ((left == right) | (left.isna() & right.isna())).to_numpy(dtype=bool)
+
+
+def diff_properties(desired, current, key, columns) -> pd.DataFrame:
+    """
+    Rows of `desired` that would change `current` (MATCH ... SET semantics): keys missing
+    from `current` are dropped, as the write would not match them, and for repeated keys
+    the last row wins.
+    """
+    desired = desired.loc[desired[key].notna(), [key] + columns].drop_duplicates(key, keep="last")
+    merged = desired.merge(current[[key] + columns], on=key, how="inner", suffixes=("", "_current"))
+    changed = np.zeros(len(merged), dtype=bool)
+    for column in columns:
+        changed |= ~_same(merged[column], merged[f"{column}_current"])
+    return merged.loc[changed, [key] + columns].reset_index(drop=True)
+
+
+def diff_edges(desired, current, keys, value):
+    """
+    (inserts, updates, deletes) that turn the `current` edges into `desired`, both frames
+    keyed by the `keys` columns with one `value` property. Repeated desired keys keep their
+    last row; deletes carry only the key columns.
+    """
+    desired = desired.dropna(subset=keys)[keys + [value]].drop_duplicates(keys, keep="last")
+    merged = desired.merge(current[keys + [value]], on=keys, how="outer", suffixes=("", "_current"), indicator=True)
+    both = merged[merged["_merge"] == "both"]
+    inserts = merged.loc[merged["_merge"] == "left_only", keys + [value]]
+    updates = both.loc[~_same(both[value], both[f"{value}_current"]), keys + [value]]
+    deletes = merged.loc[merged["_merge"] == "right_only", keys]
+    return inserts.reset_index(drop=True), updates.reset_index(drop=True), deletes.reset_index(drop=True)
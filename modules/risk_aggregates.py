@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+METRICS = ["companies", "market_cap", "direct_risk", "dollarized_risk", "held_risk"]
+
+
+def compute_risk_aggregates(snapshot) -> pd.DataFrame:
+    """
+    Per sector, location and risk factor totals from a snapshot: the number of companies,
+    their market cap, direct risk (sum of EXPOSED_TO weights), dollarized risk (direct
+    risk * market cap) and the part of it held by Blockholders (sum of OWNS percents * dollarized risk). Risk factor rows weight each
+    company's values by its exposure weight.
+    """
+    snap = snapshot
+    cap = np.nan_to_num(snap.market_cap)
+    direct = snap.company_direct_risk()
+    dollars = direct * cap
+    by_blockholder = ~snap.owns_owner_is_company
+    held = np.bincount(snap.owns_company[by_blockholder], weights=snap.owns_percent[by_blockholder],
+                       minlength=snap.num_companies) * dollars
+
+    frames = []
+    for kind, names in (("sector", snap.company_sectors), ("location", snap.company_locations)):
+        frames.append(pd.DataFrame({"kind": kind, "name": pd.Series(names, dtype=object), "companies": 1,
+                                    "market_cap": cap, "direct_risk": direct, "dollarized_risk": dollars, "held_risk": held}))
+    company, weight = snap.exposure_company, snap.exposure_weight
+    frames.append(pd.DataFrame({
+        "kind": "risk_factor", "name": np.asarray(snap.risk_factor_names, dtype=object)[snap.exposure_factor], "companies": 1,
+        "market_cap": cap[company], "direct_risk": weight, "dollarized_risk": weight * dollars[company], "held_risk": weight * held[company],
+    }))
+    rows = pd.concat(frames, ignore_index=True).dropna(subset=["name"])
+    return rows.groupby(["kind", "name"], as_index=False)[METRICS].sum()
@@ -0,0 +1,130 @@
+import numpy as np
+
+
+class RiskAttributor:
+    """
+    Decomposes the dollarized_risk of any node into contributions per owned company,
+    per ownership path and per risk factor, following the same rules as
+    RiskEngine.compute_total_risk / dollarize_risk:
+      - Company:     dollarized = market_cap * sum(EXPOSED_TO weight)
+      - Blockholder: dollarized = sum(OWNS percent * owned Company dollarized)
+      - RiskFactor:  dollarized = sum(Company dollarized * EXPOSED_TO weight)
+    Per-company factor breakdowns are memoized, so explaining many blockholders
+    that hold the same companies only decomposes each company once.
+    """
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._company_memo = {}
+        self._company_dollarized = None
+
+    def _company_breakdown(self, company_idx):
+        """Memoized {risk_factor: dollarized contribution} for one company."""
+        breakdown = self._company_memo.get(company_idx)
+        if breakdown is None:
+            snap = self.snapshot
+            breakdown = {}
+            market_cap = snap.market_cap[company_idx]
+            for pos in snap.company_exposures(company_idx):
+                factor = snap.risk_factor_names[snap.exposure_factor[pos]]
+                breakdown[factor] = breakdown.get(factor, 0.0) + float(market_cap * snap.exposure_weight[pos])
+            self._company_memo[company_idx] = breakdown
+        return breakdown
+
+    def explain(self, node_id, top_k=None):
+        """
+        Returns the attribution of one node as a dict with 'by_company', 'by_path' and
+        'by_risk_factor' lists sorted by contribution, or None if the node is unknown.
+        """
+        snap = self.snapshot
+        if node_id in snap.company_index:
+            return self._explain_company(snap.company_index[node_id], top_k)
+        if node_id in snap.blockholder_index:
+            return self._explain_blockholder(snap.blockholder_index[node_id], top_k)
+        if node_id in snap.risk_factor_index:
+            return self._explain_risk_factor(snap.risk_factor_index[node_id], top_k)
+        return None
+
+    def _explain_company(self, ci, top_k):
+        snap = self.snapshot
+        cid = snap.company_ids[ci]
+        by_factor = self._company_breakdown(ci)
+        explained = sum(by_factor.values())
+        return self._result(
+            node_id=cid, name=snap.company_names[ci], label="Company",
+            dollarized_risk=snap.company_dollarized_risk[ci],
+            by_company=[{"company_id": cid, "company_name": snap.company_names[ci], "percent": 1.0, "contribution": explained}],
+            by_path=[{"path": [cid], "percent": 1.0, "contribution": explained}],
+            by_factor=by_factor, top_k=top_k,
+        )
+
+    def _explain_blockholder(self, bi, top_k):
+        snap = self.snapshot
+        bid = snap.blockholder_ids[bi]
+        by_company = {}
+        by_path = []
+        by_factor = {}
+        for pos in snap.blockholder_edges(bi):
+            ci = int(snap.owns_company[pos])
+            percent = float(snap.owns_percent[pos])
+            company_factors = self._company_breakdown(ci)
+            contribution = percent * sum(company_factors.values())
+            cid = snap.company_ids[ci]
+            by_path.append({"path": [bid, cid], "percent": percent, "contribution": contribution})
+            entry = by_company.setdefault(cid, {"company_id": cid, "company_name": snap.company_names[ci], "percent": 0.0, "contribution": 0.0})
+            entry["percent"] += percent
+            entry["contribution"] += contribution
+            for factor, value in company_factors.items():
+                by_factor[factor] = by_factor.get(factor, 0.0) + percent * value
+        return self._result(
+            node_id=bid, name=snap.blockholder_names[bi], label="Blockholder",
+            dollarized_risk=snap.blockholder_dollarized_risk[bi],
+            by_company=list(by_company.values()), by_path=by_path,
+            by_factor=by_factor, top_k=top_k,
+        )
+
+    def _explain_risk_factor(self, ri, top_k):
+        snap = self.snapshot
+        name = snap.risk_factor_names[ri]
+        if self._company_dollarized is None:
+            self._company_dollarized = snap.market_cap * snap.company_direct_risk()
+        company_dollarized = self._company_dollarized
+        by_company = []
+        by_path = []
+        total = 0.0
+        for pos in np.flatnonzero(snap.exposure_factor == ri):
+            ci = int(snap.exposure_company[pos])
+            weight = float(snap.exposure_weight[pos])
+            contribution = float(company_dollarized[ci]) * weight
+            cid = snap.company_ids[ci]
+            by_company.append({"company_id": cid, "company_name": snap.company_names[ci], "percent": weight, "contribution": contribution})
+            by_path.append({"path": [cid, name], "percent": weight, "contribution": contribution})
+            total += contribution
+        return self._result(
+            node_id=name, name=name, label="RiskFactor",
+            dollarized_risk=snap.risk_factor_dollarized_risk[ri],
+            by_company=by_company, by_path=by_path,
+            by_factor={name: total}, top_k=top_k,
+        )
+
+    @staticmethod
+    def _result(node_id, name, label, dollarized_risk, by_company, by_path, by_factor, top_k):
+        by_company = sorted(by_company, key=lambda r: r["contribution"], reverse=True)
+        by_path = sorted(by_path, key=lambda r: r["contribution"], reverse=True)
+        by_risk_factor = sorted(
+            ({"risk_factor": k, "contribution": v} for k, v in by_factor.items()),
+            key=lambda r: r["contribution"], reverse=True,
+        )
+        explained = sum(r["contribution"] for r in by_company)
+        if top_k:
+            by_company, by_path, by_risk_factor = by_company[:top_k], by_path[:top_k], by_risk_factor[:top_k]
+        return {
+            "id": node_id,
+            "name": name,
+            "label": label,
+            "dollarized_risk": float(dollarized_risk),
+            "explained_risk": float(explained),
+            "residual": float(dollarized_risk) - float(explained),
+            "by_company": by_company,
+            "by_path": by_path,
+            "by_risk_factor": by_risk_factor,
+        }
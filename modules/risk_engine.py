@@ -1,19 +1,41 @@
 import os
+import re
 import csv
 import json
+import time
 import datetime
-from neo4j import GraphDatabase
+import threading
+from concurrent.futures import Future
 from dotenv import load_dotenv
 
 load_dotenv()
-from modules.db_loader import Blockholder, Company, RiskFactor, OWNS, EXPOSED_TO
+import config
+from modules.db_loader import Blockholder, Company, RiskFactor, OWNS, EXPOSED_TO, touch_graph_version, read_graph_version, local_graph_writes, apply_market_cap_deltas
+from modules.query_metrics import instrumented_driver
+from modules.graph_snapshot import GraphSnapshot
+from modules.risk_attribution import RiskAttributor
+from modules.risk_sensitivity import compute_sensitivity_report
+from modules.scenario_journal import ScenarioJournal
+from modules.risk_statistics import RiskStatistics
+from modules.name_index import NameIndex
+from modules.market_data import MarketCapStore, dollarized_risk_history
+from modules.yearly_risk import compute_risk_by_year
+from modules.portfolio_risk import factor_exposure_matrix, factor_covariance, compute_var_es
+from modules.contagion import impact_matrix, simulate_cascade
+from modules.ownership_index import OwnershipIndex
+from modules.co_ownership import CoOwnershipIndex, parse_co_ownership_question
+from modules.crowding import crowding_clusters
+from modules.concentration import blockholder_concentration, DIMENSIONS as CONCENTRATION_DIMENSIONS
+from modules.risk_aggregates import compute_risk_aggregates
 
 class RiskEngine:
     """
     Manages risk propagation, calculation of derived metrics, snapshotting,
     and scenario simulations.
     """
-    def __init__(self, uri=None, user=None, password=None):
+    # Seconds between GraphVersion token reads: how long another process's writes may go unnoticed.
+    GRAPH_TOKEN_TTL = config.GRAPH_TOKEN_TTL_SECONDS
+    def __init__(self, uri=None, user=None, password=None, journal_path="output/scenario_journal.json"):
         self.uri = uri or os.getenv("MEMGRAPH_URI")
         self.user = user or os.getenv("MEMGRAPH_USER")
         self.password = password or os.getenv("MEMGRAPH_PASSWORD")
@@ -22,18 +44,417 @@ class RiskEngine:
             raise ValueError("Memgraph connection details (URI, USER, PASSWORD) are required in .env file.")
 
         try:
-            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            self.driver = instrumented_driver(self.uri, (self.user, self.password))
             self.driver.verify_connectivity()
             print(f"INFO: RiskEngine connected to Memgraph at {self.uri}.")
         except Exception as e:
             print(f"ERROR: RiskEngine failed to connect to Memgraph at {self.uri}. Ensure Memgraph is running. Error: {e}")
             raise
+        self._init_state(journal_path)
+
+    def _init_state(self, journal_path):
+        # Bumped by every method that writes to the graph, and whenever the graph-side token
+        # shows a write by someone else; derived results are cached per version.
+        self.graph_version = 0
+        self._version_cache = {}
+        self._version_cache_version = self.graph_version
+        self._graph_token = None
+        self._token_checked_at = None
+        self._token_local_writes = None
+        # One engine is shared by pipeline stage threads and by every Streamlit session. The lock
+        # only guards the cache dicts; builds run outside it, one per key (others wait on its future).
+        self._cache_lock = threading.RLock()
+        self._token_lock = threading.Lock()
+        self._building = {}
+        self.journal = ScenarioJournal(journal_path)
 
     def close(self):
         if self.driver:
             self.driver.close()
             print("INFO: RiskEngine connection closed.")
 
+    def _bump_graph_version(self):
+        """Marks the graph as changed, here and for every other engine on it, so per-version caches are rebuilt."""
+        token = self._write_graph_token()
+        with self._cache_lock:
+            self.graph_version += 1
+            self._graph_token = token
+
+    def _check_graph_token(self):
+        """
+        Compares the graph-side token, so loads and other processes' writes invalidate the
+        cache as well. It is read at most once per GRAPH_TOKEN_TTL, and right away after
+        this process wrote the graph.
+        """
+        with self._token_lock:
+            writes = local_graph_writes()
+            now = time.monotonic()
+            if (self._token_checked_at is not None and writes == self._token_local_writes
+                    and now - self._token_checked_at < self.GRAPH_TOKEN_TTL):
+                return
+            token = self._read_graph_token()
+            self._token_checked_at, self._token_local_writes = now, writes
+        with self._cache_lock:
+            if token != self._graph_token:
+                self._graph_token = token
+                self.graph_version += 1
+
+    def _cached(self, key, builder):
+        """
+        Returns builder() memoized for the current graph version. Concurrent callers of the
+        same key wait for one build instead of each pulling the graph again, while cache hits
+        and other keys are served during the build.
+        """
+        self._check_graph_token()
+        with self._cache_lock:
+            if self._version_cache_version != self.graph_version:
+                self._version_cache = {}
+                self._building = {}
+                self._version_cache_version = self.graph_version
+            if key in self._version_cache:
+                return self._version_cache[key]
+            version = self.graph_version
+            future = self._building.get(key)
+            if future is None:
+                future = self._building[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return future.result()
+        try:
+            value = builder()
+        except BaseException as e:
+            with self._cache_lock:
+                if self._building.get(key) is future:
+                    del self._building[key]
+            future.set_exception(e)
+            raise
+        with self._cache_lock:
+            if self._building.get(key) is future:
+                del self._building[key]
+            # A build that straddled a graph change serves its caller but is not cached.
+            if self._version_cache_version == version == self.graph_version:
+                self._version_cache[key] = value
+        future.set_result(value)
+        return value
+
+    def invalidate_cache(self, keep=("snapshot",)):
+        """Drops the cached per-version results except those named in `keep`, so they are rebuilt on next use."""
+        with self._cache_lock:
+            self._version_cache = {key: value for key, value in self._version_cache.items() if key in keep}
+
+    def get_graph_snapshot(self) -> GraphSnapshot:
+        """Returns an array-backed snapshot of the graph, cached per graph version."""
+        def build():
+            snapshot = self._load_snapshot()
+            print(f"INFO: Built graph snapshot v{self.graph_version} ({snapshot.num_companies} companies, {snapshot.num_blockholders} blockholders, {len(snapshot.owns_percent)} OWNS edges).")
+            return snapshot
+        return self._cached("snapshot", build)
+
+    # --- Storage hooks: the Memgraph reads/writes below are overridden by the in-process backend ---
+
+    def _load_snapshot(self) -> GraphSnapshot:
+        with self.driver.session() as session:
+            return GraphSnapshot.from_session(session)
+
+    def _read_graph_token(self):
+        with self.driver.session() as session:
+            return read_graph_version(session)
+
+    def _write_graph_token(self):
+        with self.driver.session() as session:
+            return touch_graph_version(session)
+
+    def _run_write(self, work, *args):
+        """Runs work(tx, *args) in one explicit write transaction and returns its result."""
+        with self.driver.session() as session:
+            return session.write_transaction(work, *args)
+
+    def _write_node_properties(self, updates, batch_size=10000):
+        """
+        Sets properties on nodes matched by id, all in one write transaction. `updates` is a
+        list of (label, rows, columns) with rows as dicts holding 'id' and every column.
+        """
+        def write(tx):
+            for label, rows, columns in updates:
+                assignments = ",\n                        ".join(f"n.{column} = row.{column}" for column in columns)
+                for i in range(0, len(rows), batch_size):
+                    tx.run(f"""
+                        UNWIND $rows AS row
+                        MATCH (n:{label} {{id: row.id}})
+                        SET {assignments}
+                    """, rows=rows[i:i + batch_size])
+        self._run_write(write)
+
+    def explain_risk(self, node_ids, top_k=None) -> dict:
+        """
+        Decomposes the dollarized_risk of each node (Company/Blockholder id or RiskFactor name)
+        into contributions per owned company, ownership path and risk factor.
+        Returns {node_id: attribution}; unknown ids are omitted. Results are cached per graph version.
+        """
+        if isinstance(node_ids, str):
+            node_ids = [node_ids]
+        attributor = self._cached("attributor", lambda: RiskAttributor(self.get_graph_snapshot()))
+        explanations = self._cached("attributions", dict)
+        results = {}
+        for node_id in node_ids:
+            key = (node_id, top_k)
+            if key not in explanations:
+                explanations[key] = attributor.explain(node_id, top_k=top_k)
+            if explanations[key] is not None:
+                results[node_id] = explanations[key]
+        return results
+
+    def sensitivity_report(self, top_n=10, blockholder_ids=None) -> dict:
+        """
+        Returns the analytic sensitivity of Blockholder dollarized_risk to every EXPOSED_TO
+        weight and OWNS percent, computed in one vectorized pass instead of one
+        simulate_risk_event run per weight. Contains 'global' top drivers and
+        'per_blockholder' top drivers. Cached per graph version.
+        """
+        key = ("sensitivity", top_n, tuple(blockholder_ids) if blockholder_ids is not None else None)
+        def build():
+            print("\n--- Computing Risk Sensitivity Report ---")
+            report = compute_sensitivity_report(self.get_graph_snapshot(), top_n=top_n, blockholder_ids=blockholder_ids)
+            print(f"--- Sensitivity Report Complete ({len(report['per_blockholder'])} blockholders) ---")
+            return report
+        return self._cached(key, build)
+
+    def search_entities(self, query: str, label=None, limit=20, offset=0) -> dict:
+        """
+        Typeahead search over Company/Blockholder names using an in-memory prefix/trigram
+        index built once per graph version. Returns one page of ranked matches with ids.
+        """
+        def build():
+            snap = self.get_graph_snapshot()
+            entries = [(cid, name, "Company") for cid, name in zip(snap.company_ids, snap.company_names)]
+            entries += [(bid, name, "Blockholder") for bid, name in zip(snap.blockholder_ids, snap.blockholder_names)]
+            index = NameIndex(entries)
+            print(f"INFO: Built name search index over {len(index)} entities.")
+            return index
+        return self._cached("name_index", build).search(query, label=label, limit=limit, offset=offset)
+
+    def get_dollarized_risk_history(self, store_dir="data/market_cap_history", start_date=None, end_date=None):
+        """
+        Dollarized risk time series for every company and blockholder, computed as one
+        vectorized product of the current total_risk vector with the memory-mapped
+        market cap history (no per-date graph queries). Returns a dict with 'dates',
+        'company_ids'/'company' and 'blockholder_ids'/'blockholder' (node x date arrays),
+        or None if no history has been generated. Cached per graph version.
+        """
+        if not MarketCapStore.exists(store_dir):
+            print(f"WARNING: No market cap history found at {store_dir}. Run generate_market_cap_history() first.")
+            return None
+        store_mtime = os.path.getmtime(os.path.join(store_dir, MarketCapStore.ARRAY_FILE))
+        key = ("risk_history", store_dir, store_mtime, str(start_date), str(end_date))
+        return self._cached(key, lambda: dollarized_risk_history(self.get_graph_snapshot(), MarketCapStore.open(store_dir), start_date, end_date))
+
+    def compute_risk_by_year(self, years=None) -> dict:
+        """
+        Blockholder total_risk and dollarized_risk for every loaded ownership year (from the
+        per-year OWNS history), computed as one stacked sparse product and cached per
+        graph version. Returns 'years', 'blockholder_ids', 'total_risk' and 'dollarized_risk'.
+        """
+        key = ("risk_by_year", tuple(years) if years is not None else None)
+        def build():
+            print("\n--- Computing Per-Year Blockholder Risk ---")
+            result = compute_risk_by_year(self.get_graph_snapshot(), years=years)
+            print(f"--- Per-Year Risk Complete for years {result['years']} ---")
+            return result
+        return self._cached(key, build)
+
+    def compute_portfolio_var(self, confidence=0.99, num_simulations=10000, covariance_csv=None,
+                              market_cap_history_dir=None, default_volatility=0.2, correlation_groups=None,
+                              base_correlation=0.0) -> dict:
+        """
+        Parametric and Monte Carlo VaR / Expected Shortfall of every Blockholder's look-through
+        portfolio under correlated factor shocks, computed from the blockholder x factor dollar
+        exposure matrix. The factor covariance is estimated from the market cap history when
+        market_cap_history_dir is given (and exists), otherwise read from covariance_csv or built
+        from the configured volatility/correlation groups. Cached per graph version.
+        Returns 'blockholder_ids', 'factor_names', 'covariance' and per-blockholder result arrays.
+        """
+        key = ("portfolio_var", confidence, num_simulations, covariance_csv, market_cap_history_dir,
+               default_volatility, repr(correlation_groups), base_correlation)
+        def build():
+            print("\n--- Computing Portfolio VaR / Expected Shortfall ---")
+            snap = self.get_graph_snapshot()
+            store = None
+            if market_cap_history_dir and MarketCapStore.exists(market_cap_history_dir):
+                store = MarketCapStore.open(market_cap_history_dir)
+            cov = factor_covariance(snap, covariance_csv=covariance_csv, store=store, default_volatility=default_volatility,
+                                    correlation_groups=correlation_groups, base_correlation=base_correlation)
+            result = compute_var_es(factor_exposure_matrix(snap), cov, confidence=confidence, num_simulations=num_simulations)
+            result.update({"blockholder_ids": snap.blockholder_ids, "factor_names": snap.risk_factor_names,
+                           "covariance": cov, "confidence": confidence})
+            print(f"--- Portfolio VaR Complete for {snap.num_blockholders} blockholders and {snap.num_risk_factors} factors ---")
+            return result
+        return self._cached(key, build)
+
+    def simulate_contagion(self, company_ids, shock=1.0, capital_ratio=1.0, max_rounds=100, top_n=20) -> dict:
+        """
+        Read-only default cascade: shocks the given companies (losing `shock` of their value)
+        and propagates distress up the OWNS network, including Company -> Company
+        cross-holdings, to a DebtRank fixed point. The graph is not modified.
+        Returns the cascade summary, per-round stats and the top_n nodes by loss.
+        """
+        if isinstance(company_ids, str):
+            company_ids = [company_ids]
+        snap = self.get_graph_snapshot()
+        W, value = self._cached(("contagion_impact", capital_ratio), lambda: impact_matrix(snap, capital_ratio))
+        print(f"\n--- Simulating Default Cascade from {len(company_ids)} shocked companies ---")
+        result = simulate_cascade(snap, {cid: shock for cid in company_ids}, max_rounds=max_rounds, W=W, value=value)
+
+        ids = snap.company_ids + snap.blockholder_ids
+        names = snap.company_names + snap.blockholder_names
+        labels = ["Company"] * snap.num_companies + ["Blockholder"] * snap.num_blockholders
+        loss = result.pop("loss")
+        distress = result.pop("distress")
+        first_round = result.pop("first_distressed_round")
+        default_round = result.pop("default_round")
+        top = loss.argsort()[::-1][:top_n]
+        result["top_losses"] = [{
+            "id": ids[i], "name": names[i], "label": labels[i],
+            "loss": float(loss[i]), "distress": float(distress[i]),
+            "first_distressed_round": int(first_round[i]), "default_round": int(default_round[i]),
+        } for i in top if loss[i] > 0]
+        print(f"--- Cascade settled after {len(result['rounds'])} rounds: {result['num_distressed']} distressed, "
+              f"{result['num_defaulted']} defaulted, systemic impact {result['systemic_impact']:.4%} ---")
+        return result
+
+    def get_ownership_index(self, threshold=1e-4, max_depth=20, persist_dir=None) -> OwnershipIndex:
+        """
+        Integrated ownership index ((I - A)^-1 - I over the OWNS adjacency, truncated below
+        `threshold`), cached per graph version. When persist_dir is given, an index persisted
+        there for the same OWNS data is reused and a newly built one is saved.
+        """
+        def build():
+            snap = self.get_graph_snapshot()
+            fingerprint = OwnershipIndex.fingerprint_for(snap, threshold, max_depth)
+            if persist_dir:
+                persisted = OwnershipIndex.load(persist_dir)
+                if persisted is not None and persisted.fingerprint == fingerprint:
+                    print(f"INFO: Loaded integrated ownership index from {persist_dir}.")
+                    return persisted
+            print("\n--- Building Integrated Ownership Index ---")
+            index = OwnershipIndex.build(snap, threshold=threshold, max_depth=max_depth)
+            if persist_dir:
+                index.save(persist_dir)
+            print(f"--- Integrated Ownership Index Complete ({index.holdings.nnz} direct and indirect stakes) ---")
+            return index
+        return self._cached(("ownership_index", threshold, max_depth, persist_dir), build)
+
+    def get_ultimate_owners(self, company_id, min_percent=0.0, **index_kwargs) -> list:
+        """Direct and indirect owners of a company with their integrated stakes, largest first."""
+        return self.get_ownership_index(**index_kwargs).ultimate_owners(company_id, min_percent=min_percent)
+
+    def get_controlled_companies(self, owner_id, min_percent=0.2, **index_kwargs) -> list:
+        """Companies in which owner_id holds at least min_percent directly or through intermediate companies."""
+        return self.get_ownership_index(**index_kwargs).controlled_by(owner_id, min_percent=min_percent)
+
+    def get_strongest_control_path(self, owner_id, company_id, **index_kwargs):
+        """Ownership chain from owner_id to company_id maximizing the product of stakes, or None."""
+        return self.get_ownership_index(**index_kwargs).strongest_control_path(owner_id, company_id)
+
+    def get_co_ownership_index(self) -> CoOwnershipIndex:
+        """Bitset co-ownership index (holders per company, holdings per blockholder), built once per graph version."""
+        def build():
+            index = CoOwnershipIndex.from_snapshot(self.get_graph_snapshot())
+            print(f"INFO: Built co-ownership index ({len(index.company_ids)} companies, {len(index.blockholder_ids)} blockholders, {index.nbytes() / 1e6:.1f} MB).")
+            return index
+        return self._cached("co_ownership", build)
+
+    def get_common_holders(self, company_ids) -> list:
+        """Blockholders that own every one of company_ids."""
+        return self.get_co_ownership_index().common_holders(company_ids)
+
+    def get_any_holders(self, company_ids) -> list:
+        """Blockholders that own at least one of company_ids."""
+        return self.get_co_ownership_index().any_holders(company_ids)
+
+    def get_common_holdings(self, blockholder_ids) -> list:
+        """Companies owned by every one of blockholder_ids."""
+        return self.get_co_ownership_index().common_holdings(blockholder_ids)
+
+    def get_co_ownership_overlap(self, first_id, second_id) -> dict:
+        """Shared holders of two companies (or shared holdings of two blockholders) with their Jaccard overlap."""
+        return self.get_co_ownership_index().overlap(first_id, second_id)
+
+    def answer_co_ownership_question(self, question: str):
+        """
+        Fast path for natural-language co-ownership questions ("blockholders who own both A and B",
+        "... either A or B", "companies held by both X and Y"): entity names are resolved with the
+        name index and the answer comes from bitset operations instead of LLM-generated Cypher.
+        Returns {'operation', 'entities', 'results'} or None when the question is not recognized
+        or an entity cannot be resolved.
+        """
+        parsed = parse_co_ownership_question(question)
+        if parsed is None:
+            return None
+        operation, names = parsed
+        label = "Blockholder" if operation == "common_holdings" else "Company"
+        entities = []
+        for name in names:
+            matches = self.search_entities(name, label=label, limit=1)["results"]
+            if not matches:
+                return None
+            entities.append(matches[0])
+        ids = [e["id"] for e in entities]
+        index = self.get_co_ownership_index()
+        results = {"common_holders": index.common_holders, "any_holders": index.any_holders,
+                   "common_holdings": index.common_holdings}[operation](ids)
+        return {"operation": operation, "entities": entities, "results": results}
+
+    def get_risk_statistics(self) -> RiskStatistics:
+        """
+        Returns quantiles, histograms, percentile ranks and robust z-scores of total_risk and
+        dollarized_risk per label, sector and location, computed once per graph version.
+        """
+        return self._cached("statistics", lambda: RiskStatistics(self.get_graph_snapshot()))
+
+    def write_percentile_ranks(self, batch_size=10000):
+        """
+        Writes <metric>_pct and <metric>_zscore properties for every Company and Blockholder
+        in one write transaction (batched UNWINDs), so dashboards and alerts can filter on them.
+        """
+        print("\n--- Writing Risk Percentile Ranks ---")
+        scores = self.get_risk_statistics().node_scores()
+        columns = ["total_risk_pct", "dollarized_risk_pct", "total_risk_zscore", "dollarized_risk_zscore"]
+        self._write_node_properties([
+            (label, scores.loc[scores["label"] == label, ["id"] + columns].to_dict(orient="records"), columns)
+            for label in ("Company", "Blockholder")
+        ], batch_size=batch_size)
+        # Percentile properties are derived from the current version and do not change it.
+        print(f"--- Wrote percentile ranks for {len(scores)} nodes ---")
+
+    def compute_blockholder_concentration(self):
+        """
+        Herfindahl index of every Blockholder's look-through dollarized risk across sectors,
+        locations and risk factors, with the top contributor and its share, computed for all
+        blockholders in one pass over the snapshot. Returns a DataFrame, cached per graph version.
+        """
+        def build():
+            print("\n--- Computing Blockholder Concentration (HHI) ---")
+            frame = blockholder_concentration(self.get_graph_snapshot())
+            print(f"--- Blockholder Concentration Complete for {len(frame)} blockholders ---")
+            return frame
+        return self._cached("blockholder_concentration", build)
+
+    def write_blockholder_concentration(self, batch_size=10000):
+        """
+        Persists hhi_<dimension>, top_<dimension> and top_<dimension>_share (dimension in
+        sector, location, risk_factor) on every Blockholder in one write transaction.
+        """
+        print("\n--- Writing Blockholder Concentration ---")
+        frame = self.compute_blockholder_concentration()
+        columns = [f"{prefix}{dimension}{suffix}" for dimension in CONCENTRATION_DIMENSIONS
+                   for prefix, suffix in (("hhi_", ""), ("top_", ""), ("top_", "_share"))]
+        rows = frame[["id"] + columns].to_dict(orient="records")
+        self._write_node_properties([("Blockholder", rows, columns)], batch_size=batch_size)
+        # Like the percentile ranks, these are derived from the current version and do not change it.
+        print(f"--- Wrote concentration metrics for {len(rows)} blockholders ---")
+
     def compute_total_risk(self, max_iterations=15):
         """
         Computes total_risk for all companies/blockholders by propagating direct risks through
@@ -67,6 +488,7 @@ class RiskEngine:
             """)
             print("INFO: Propagated risk to Blockholders from owned companies.")
 
+        self._bump_graph_version()
         print("--- Total Risk Propagation Complete ---")
 
     def normalize_risk_scores(self, new_property_name="normalized_risk", max_score=100.0):
@@ -75,6 +497,8 @@ class RiskEngine:
         Sets the result on a new property (e.g., 'normalized_risk').
         """
         print(f"\n--- Starting Risk Score Normalization for '{new_property_name}' ---")
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", new_property_name):
+            raise ValueError(f"Invalid property name for normalized risk: {new_property_name!r}")
         with self.driver.session() as session:
             max_risk_result = session.read_transaction(lambda tx: tx.run("""
                 MATCH (n) WHERE n.total_risk IS NOT NULL
@@ -83,12 +507,14 @@ class RiskEngine:
             
             max_total_risk = max_risk_result["max_total_risk"] if max_risk_result and max_risk_result["max_total_risk"] > 0 else 1.0
             
+            # Property names cannot be Cypher parameters; the name is validated above.
             updated_nodes_count = session.write_transaction(lambda tx: tx.run(f"""
                 MATCH (n) WHERE n.total_risk IS NOT NULL
-                SET n.{new_property_name} = (n.total_risk / {max_total_risk}) * {max_score}
+                SET n.{new_property_name} = (n.total_risk / $max_total_risk) * $max_score
                 RETURN count(n) AS updatedCount
-            """).single()["updatedCount"])
+            """, max_total_risk=max_total_risk, max_score=max_score).single()["updatedCount"])
         
+        self._bump_graph_version()
         print(f"INFO: Normalized risk scores for {updated_nodes_count} nodes. Max original risk was {max_total_risk:.2f}.")
         print("--- Finished Risk Score Normalization ---")
 
@@ -120,8 +546,51 @@ class RiskEngine:
                 WITH rf, sum(coalesce(c.dollarized_risk, 0) * coalesce(e.weight, 0)) AS total_dollar_exposure
                 SET rf.dollarized_risk = total_dollar_exposure
             """)
+        self._bump_graph_version()
         print("--- Dollarized Risk Calculation Complete ---")
 
+    def _market_cap_delta_tx(self, tx, rows):
+        """Applies one batch of market cap updates and pushes the dollarized deltas to owners and risk factors."""
+        return apply_market_cap_deltas(tx, rows)
+
+    def refresh_market_caps(self, updates, batch_size=5000) -> int:
+        """
+        Incrementally refreshes dollarized risk after a market data update, without the
+        three full-graph passes of dollarize_risk(). `updates` is an iterable of
+        (company_id, new_market_cap) pairs or a DataFrame with company_id_graph/market_cap
+        columns (the market_cap.csv layout). Each changed company's dollarized risk is reset
+        to total_risk * new_cap and, since dollarization is linear, the difference to its
+        previous dollarized risk is added to its Blockholder owners (times percent) and its
+        RiskFactors (times weight); only those nodes are written. Assumes total_risk is current (compute_total_risk has run).
+        Returns the number of companies whose market cap changed.
+        """
+        print("\n--- Starting Incremental Market Cap Refresh ---")
+        if hasattr(updates, "to_dict"):
+            rows = [{"company_id": r["company_id_graph"], "market_cap": float(r["market_cap"])}
+                    for r in updates[["company_id_graph", "market_cap"]].dropna().to_dict(orient="records")]
+        else:
+            rows = [{"company_id": cid, "market_cap": float(cap)} for cid, cap in updates if cap is not None]
+
+        changed_companies = changed_owners = changed_factors = 0
+        for i in range(0, len(rows), batch_size):
+            companies, owners, factors = self._run_write(self._market_cap_delta_tx, rows[i:i + batch_size])
+            changed_companies += companies
+            changed_owners += owners
+            changed_factors += factors
+        if changed_companies:
+            self._bump_graph_version()
+        print(f"INFO: Market caps changed for {changed_companies} of {len(rows)} companies; "
+              f"updated {changed_owners} blockholder and {changed_factors} risk factor aggregates.")
+        print("--- Incremental Market Cap Refresh Complete ---")
+        return changed_companies
+
+    def get_risk_aggregates(self):
+        """
+        Sector, location and risk factor totals as a DataFrame (kind, name, companies,
+        market_cap, direct_risk, dollarized_risk, held_risk), cached per graph version.
+        """
+        return self._cached("risk_aggregates", lambda: compute_risk_aggregates(self.get_graph_snapshot()))
+
     def _propagate_risk_step(self, tx):
         """
         Single step of iterative risk propagation. Updates total_risk for owning nodes.
@@ -153,6 +622,61 @@ class RiskEngine:
             print("--- Finished Computing Sectoral Concentration Risk ---")
             return overexposed
 
+    def compute_crowding_clusters(self, similarity_threshold=0.5, min_cluster_size=3, num_hashes=64, bands=16) -> list:
+        """
+        Crowded-trade clusters: blockholders with similar holdings, found with MinHash/LSH
+        (no all-pairs comparison) and label propagation on the similarity graph, each with
+        its aggregate dollarized risk and most shared holdings. Cached per graph version.
+        """
+        key = ("crowding", similarity_threshold, min_cluster_size, num_hashes, bands)
+        def build():
+            print("\n--- Computing Holdings Crowding Clusters ---")
+            clusters = crowding_clusters(self.get_graph_snapshot(), num_hashes=num_hashes, bands=bands,
+                                         similarity_threshold=similarity_threshold, min_cluster_size=min_cluster_size)
+            print(f"--- Found {len(clusters)} crowding clusters ---")
+            return clusters
+        return self._cached(key, build)
+
+    def get_sector_treemap(self, top_n=10) -> list:
+        """
+        Server-side treemap aggregation: the top_n companies by dollarized risk per sector
+        plus one 'Other' row per sector holding the remaining sum. Cached per graph version.
+        """
+        def build():
+            with self.driver.session() as session:
+                sectors = session.read_transaction(lambda tx: tx.run("""
+                    MATCH (c:Company)
+                    WHERE c.dollarized_risk IS NOT NULL AND c.dollarized_risk > 0 AND c.sector IS NOT NULL
+                    WITH c ORDER BY c.dollarized_risk DESC
+                    WITH c.sector AS sector,
+                         collect({id: c.id, name: c.name, risk: c.dollarized_risk}) AS companies,
+                         sum(c.dollarized_risk) AS sector_risk,
+                         count(c) AS company_count
+                    RETURN sector, sector_risk, company_count, companies[0..$top_n] AS top_companies
+                """, top_n=top_n).data())
+            rows = []
+            for sector in sectors:
+                top_risk = 0.0
+                for company in sector["top_companies"]:
+                    rows.append({"Sector": sector["sector"], "Company": company["name"] or company["id"], "CompanyId": company["id"], "DollarizedRisk": company["risk"]})
+                    top_risk += company["risk"]
+                remaining = sector["company_count"] - len(sector["top_companies"])
+                if remaining > 0:
+                    rows.append({"Sector": sector["sector"], "Company": f"Other ({remaining} companies)", "CompanyId": None, "DollarizedRisk": max(sector["sector_risk"] - top_risk, 0.0)})
+            return rows
+        return self._cached(("sector_treemap", top_n), build)
+
+    def get_sector_companies(self, sector: str, limit=500, skip=0) -> list:
+        """Loads one sector's companies by dollarized risk, for lazy treemap drill-down."""
+        with self.driver.session() as session:
+            return session.read_transaction(lambda tx: tx.run("""
+                MATCH (c:Company {sector: $sector})
+                WHERE c.dollarized_risk IS NOT NULL AND c.dollarized_risk > 0
+                RETURN c.id AS CompanyId, c.name AS Company, c.dollarized_risk AS DollarizedRisk
+                ORDER BY DollarizedRisk DESC
+                SKIP $skip LIMIT $limit
+            """, sector=sector, skip=skip, limit=limit).data())
+
     def get_critical_nodes_by_degree(self, top_n=10):
         """Identifies top N critical companies/blockholders based on network degree."""
         print("\n--- Computing Critical Companies by Network Degree ---")
@@ -251,75 +775,205 @@ class RiskEngine:
         except Exception as e:
             print(f"FATAL ERROR: An unexpected error occurred during diff generation: {e}")
 
+    # --- Scenario simulations ---
+    # Each scenario runs in a single explicit write transaction with parameterized queries
+    # and records its inverse operations in self.journal so it can be rolled back.
+
+    # Inverse operations are idempotent (MERGE/SET), so replaying an entry whose rollback
+    # committed but was not yet removed from the journal leaves the graph unchanged.
+    _RESTORE_BLOCKHOLDER_OWNS_QUERY = """
+        UNWIND $rows AS row
+        MATCH (p:Blockholder {id: row.owner_id})
+        MATCH (c:Company {id: $company_id})
+        MERGE (p)-[o:OWNS]->(c)
+        SET o = row.props
+    """
+    _RESTORE_COMPANY_OWNS_QUERY = """
+        UNWIND $rows AS row
+        MATCH (p:Company {id: row.owner_id})
+        MATCH (c:Company {id: $company_id})
+        MERGE (p)-[o:OWNS]->(c)
+        SET o = row.props
+    """
+    _RESTORE_ROLE_QUERY = """
+        MATCH (c:Company {id: $company_id})
+        SET c.role = $role
+    """
+    _DELETE_COMPANY_OWNS_QUERY = """
+        MATCH (:Company {id: $acquiring_company_id})-[o:OWNS]->(:Company {id: $acquired_company_id})
+        DELETE o
+    """
+    _RESTORE_EXPOSURE_WEIGHTS_QUERY = """
+        UNWIND $rows AS row
+        MATCH (c:Company {id: row.company_id})-[e:EXPOSED_TO]->(r:RiskFactor {name: $risk_factor_name})
+        SET e.weight = row.weight
+    """
+
+    def _restore_owns_ops(self, company_id, removed_edges):
+        """Inverse operations that recreate OWNS edges into company_id with their original properties."""
+        ops = []
+        for owner_is_company, query in ((False, self._RESTORE_BLOCKHOLDER_OWNS_QUERY), (True, self._RESTORE_COMPANY_OWNS_QUERY)):
+            rows = [{"owner_id": r["owner_id"], "props": r["props"]}
+                    for r in removed_edges if bool(r["owner_is_company"]) == owner_is_company]
+            if rows:
+                ops.append((query, {"rows": rows, "company_id": company_id}))
+        return ops
+
+    def _run_journaled(self, scenario_type, description, inverse_ops_for, work, *args):
+        """
+        Runs work(tx, *args) in one write transaction and journals inverse_ops_for(result)
+        from inside it, so the entry exists before the scenario commits (nothing is journaled
+        for a falsy result). If the transaction fails the entry is discarded; if the process
+        dies in between, rolling back the entry is harmless as the inverse operations are
+        idempotent. Returns (result, scenario_id).
+        """
+        generation = self.journal.current_generation()
+        scenario_id = self.journal.new_id()
+
+        def journaled(tx, *args):
+            result = work(tx, *args)
+            if result:
+                self.journal.record(scenario_type, description, inverse_ops_for(result), scenario_id=scenario_id, generation=generation)
+            return result
+
+        try:
+            return self._run_write(journaled, *args), scenario_id
+        except Exception:
+            self.journal.discard(scenario_id)
+            raise
+
+    def _acquisition_tx(self, tx, acquiring_company_id, acquired_company_id, ownership_percent, current_year):
+        check_result = tx.run("""
+            MATCH (acquirer:Company {id: $acquiring_company_id})
+            MATCH (acquired:Company {id: $acquired_company_id})
+            RETURN acquired.role AS previous_role
+        """, acquiring_company_id=acquiring_company_id, acquired_company_id=acquired_company_id).single()
+        if not check_result:
+            return None
+        removed_edges = tx.run("""
+            MATCH (p)-[o:OWNS]->(c:Company {id: $acquired_company_id})
+            WITH o, p.id AS owner_id, 'Company' IN labels(p) AS owner_is_company, properties(o) AS props
+            DELETE o
+            RETURN owner_id, owner_is_company, props
+        """, acquired_company_id=acquired_company_id).data()
+        tx.run("""
+            MATCH (acquirer:Company {id: $acquiring_company_id})
+            MATCH (acquired:Company {id: $acquired_company_id})
+            MERGE (acquirer)-[o:OWNS]->(acquired)
+            SET o.percent = $ownership_percent,
+                o.year = $current_year,
+                acquired.role = 'acquired'
+        """, acquiring_company_id=acquiring_company_id, acquired_company_id=acquired_company_id,
+             ownership_percent=ownership_percent, current_year=current_year)
+        return {"previous_role": check_result["previous_role"], "removed_edges": removed_edges}
+
     def simulate_acquisition(self, acquiring_company_id: str, acquired_company_id: str, ownership_percent: float) -> bool:
         """Simulates an acquisition."""
         print(f"\n--- Simulating Acquisition: {acquiring_company_id} acquires {acquired_company_id} with {ownership_percent:.2%} ownership ---")
-        with self.driver.session() as session:
-            try:
-                check_query = """
-                MATCH (acquirer:Company {id: $acquiring_company_id})
-                MATCH (acquired:Company {id: $acquired_company_id})
-                RETURN acquirer, acquired
-                """
-                check_result = session.run(check_query, acquiring_company_id=acquiring_company_id, acquired_company_id=acquired_company_id).single()
-                if not check_result:
-                    print("ERROR: One or both companies not found for acquisition simulation.")
-                    return False
-                session.run(f"""
-                    MATCH (p)-[o:OWNS]->(c:Company {{id: '{acquired_company_id}'}})
-                    DELETE o
-                """)
-                print(f"INFO: Removed existing ownerships for acquired company {acquired_company_id}.")
-                current_year = datetime.datetime.now().year
-                create_owns_query = """
-                MATCH (acquirer:Company {id: $acquiring_company_id})
-                MATCH (acquired:Company {id: $acquired_company_id})
-                MERGE (acquirer)-[o:OWNS]->(acquired)
-                SET o.percent = $ownership_percent,
-                    o.year = $current_year
-                """
-                session.run(create_owns_query, acquiring_company_id=acquiring_company_id, acquired_company_id=acquired_company_id, ownership_percent=ownership_percent, current_year=current_year)
-                print(f"INFO: Created OWNS relationship: {acquiring_company_id} OWNS {acquired_company_id} ({ownership_percent:.2%}).")
-                session.run(f"""
-                    MATCH (c:Company {{id: '{acquired_company_id}'}})
-                    SET c.role = 'acquired'
-                """)
-                print(f"INFO: Set role of {acquired_company_id} to 'acquired'.")
-                return True
-            except Exception as e:
-                print(f"ERROR: Failed to simulate acquisition: {e}")
+
+        def inverse_ops_for(result):
+            inverse_ops = [(self._DELETE_COMPANY_OWNS_QUERY, {"acquiring_company_id": acquiring_company_id, "acquired_company_id": acquired_company_id})]
+            inverse_ops += self._restore_owns_ops(acquired_company_id, result["removed_edges"])
+            inverse_ops.append((self._RESTORE_ROLE_QUERY, {"company_id": acquired_company_id, "role": result["previous_role"]}))
+            return inverse_ops
+
+        try:
+            current_year = datetime.datetime.now().year
+            result, scenario_id = self._run_journaled(
+                "acquisition", f"{acquiring_company_id} acquires {acquired_company_id} ({ownership_percent:.2%})", inverse_ops_for,
+                self._acquisition_tx, acquiring_company_id, acquired_company_id, ownership_percent, current_year)
+            if not result:
+                print("ERROR: One or both companies not found for acquisition simulation.")
                 return False
+            print(f"INFO: Removed {len(result['removed_edges'])} existing ownerships for acquired company {acquired_company_id}.")
+            print(f"INFO: Created OWNS relationship: {acquiring_company_id} OWNS {acquired_company_id} ({ownership_percent:.2%}).")
+            print(f"INFO: Set role of {acquired_company_id} to 'acquired'.")
+        except Exception as e:
+            print(f"ERROR: Failed to simulate acquisition: {e}")
+            return False
+
+        print(f"INFO: Journaled acquisition as scenario {scenario_id}.")
+        self._bump_graph_version()
+        return True
+
+    def _divestiture_tx(self, tx, divesting_company_id, divested_company_id):
+        deleted = tx.run("""
+            MATCH (d:Company {id: $divesting_company_id})-[o:OWNS]->(t:Company {id: $divested_company_id})
+            WITH o, d.id AS owner_id, true AS owner_is_company, properties(o) AS props, t.role AS previous_role
+            DELETE o
+            RETURN owner_id, owner_is_company, props, previous_role
+        """, divesting_company_id=divesting_company_id, divested_company_id=divested_company_id).data()
+        if not deleted:
+            return None
+        owners_count = tx.run("""
+            MATCH (p:Company)-[:OWNS]->(c:Company {id: $divested_company_id})
+            RETURN count(p) AS owners_count
+        """, divested_company_id=divested_company_id).single()["owners_count"]
+        role_reset = owners_count == 0
+        if role_reset:
+            tx.run("""
+                MATCH (c:Company {id: $divested_company_id})
+                SET c.role = 'company'
+            """, divested_company_id=divested_company_id)
+        return {"removed_edges": deleted, "previous_role": deleted[0]["previous_role"], "role_reset": role_reset}
 
     def simulate_divestiture(self, divesting_company_id: str, divested_company_id: str) -> bool:
         """Simulates a divestiture."""
         print(f"\n--- Simulating Divestiture: {divesting_company_id} divests {divested_company_id} ---")
-        with self.driver.session() as session:
-            try:
-                delete_owns_query = """
-                MATCH (d:Company {id: $divesting_company_id})-[o:OWNS]->(t:Company {id: $divested_company_id})
-                DELETE o
-                """
-                result = session.run(delete_owns_query, divesting_company_id=divesting_company_id, divested_company_id=divested_company_id)
-                if result.summary.counters.relationships_deleted > 0:
-                    print(f"INFO: Deleted OWNS relationship: {divesting_company_id} no longer owns {divested_company_id}.")
-                    check_ownership_query = f"""
-                        MATCH (p:Company)-[:OWNS]->(c:Company {{id: '{divested_company_id}'}})
-                        RETURN count(p) AS owners_count
-                    """
-                    owners_count = session.run(check_ownership_query).single()["owners_count"]
-                    if owners_count == 0:
-                        session.run(f"""
-                            MATCH (c:Company {{id: '{divested_company_id}'}})
-                            SET c.role = 'company'
-                        """)
-                        print(f"INFO: Reset role of {divested_company_id} to 'company' as it has no more direct owners.")
-                    return True
-                else:
-                    print(f"WARNING: No OWNS relationship found between {divesting_company_id} and {divested_company_id} to divest.")
-                    return False
-            except Exception as e:
-                print(f"ERROR: Failed to simulate divestiture: {e}")
+
+        def inverse_ops_for(result):
+            inverse_ops = self._restore_owns_ops(divested_company_id, result["removed_edges"])
+            inverse_ops.append((self._RESTORE_ROLE_QUERY, {"company_id": divested_company_id, "role": result["previous_role"]}))
+            return inverse_ops
+
+        try:
+            result, scenario_id = self._run_journaled("divestiture", f"{divesting_company_id} divests {divested_company_id}", inverse_ops_for,
+                                                      self._divestiture_tx, divesting_company_id, divested_company_id)
+            if not result:
+                print(f"WARNING: No OWNS relationship found between {divesting_company_id} and {divested_company_id} to divest.")
                 return False
+            print(f"INFO: Deleted OWNS relationship: {divesting_company_id} no longer owns {divested_company_id}.")
+            if result["role_reset"]:
+                print(f"INFO: Reset role of {divested_company_id} to 'company' as it has no more direct owners.")
+        except Exception as e:
+            print(f"ERROR: Failed to simulate divestiture: {e}")
+            return False
+
+        print(f"INFO: Journaled divestiture as scenario {scenario_id}.")
+        self._bump_graph_version()
+        return True
+
+    def _risk_event_tx(self, tx, risk_factor_name, impact_multiplier, target_company_id, target_sector, target_location):
+        """Scales the matching EXPOSED_TO weights (clipped to [0, 1]) and returns their previous values."""
+        match_clause = "MATCH (c:Company)-[e:EXPOSED_TO]->(r:RiskFactor {name: $risk_factor_name})"
+        where_clauses = []
+        params = {"risk_factor_name": risk_factor_name, "impact_multiplier": impact_multiplier}
+
+        if target_company_id:
+            where_clauses.append("c.id = $target_company_id")
+            params["target_company_id"] = target_company_id
+        if target_sector:
+            where_clauses.append("c.sector = $target_sector")
+            params["target_sector"] = target_sector
+        if target_location:
+            where_clauses.append("c.location = $target_location")
+            params["target_location"] = target_location
+
+        if where_clauses:
+            match_clause += " WHERE " + " AND ".join(where_clauses)
+
+        update_query = f"""
+        {match_clause}
+        WITH c, e, e.weight AS old_weight
+        SET e.weight = CASE
+                            WHEN e.weight * $impact_multiplier > 1.0 THEN 1.0
+                            WHEN e.weight * $impact_multiplier < 0.0 THEN 0.0
+                            ELSE e.weight * $impact_multiplier
+                            END
+        RETURN c.id AS company_id, old_weight AS weight
+        """
+
+        return tx.run(update_query, **params).data()
 
     def simulate_risk_event(self, risk_factor_name: str, impact_multiplier: float, target_company_id: str = None, target_sector: str = None, target_location: str = None) -> int:
         """
@@ -327,41 +981,61 @@ class RiskEngine:
         Returns the count of updated exposures.
         """
         print(f"\n--- Simulating Risk Event: '{risk_factor_name}' with impact {impact_multiplier} ---")
-        with self.driver.session() as session:
-            try:
-                match_clause = "MATCH (c:Company)-[e:EXPOSED_TO]->(r:RiskFactor {name: $risk_factor_name})"
-                where_clauses = []
-                params = {"risk_factor_name": risk_factor_name, "impact_multiplier": impact_multiplier}
-
-                if target_company_id:
-                    where_clauses.append("c.id = $target_company_id")
-                    params["target_company_id"] = target_company_id
-                if target_sector:
-                    where_clauses.append("c.sector = $target_sector")
-                    params["target_sector"] = target_sector
-                if target_location:
-                    where_clauses.append("c.location = $target_location")
-                    params["target_location"] = target_location
-                
-                if where_clauses:
-                    match_clause += " WHERE " + " AND ".join(where_clauses)
-                
-                update_query = f"""
-                {match_clause}
-                SET e.weight = CASE
-                                    WHEN e.weight * $impact_multiplier > 1.0 THEN 1.0
-                                    WHEN e.weight * $impact_multiplier < 0.0 THEN 0.0
-                                    ELSE e.weight * $impact_multiplier
-                                    END
-                RETURN count(e) AS updated_exposures
-                """
-                
-                print(f"INFO: Running Cypher Query: {update_query} with params: {params}")
-                
-                result = session.write_transaction(lambda tx: tx.run(update_query, **params).single())
-                updated_count = result["updated_exposures"] if result else 0
-                print(f"INFO: Updated {updated_count} '{risk_factor_name}' risk exposures.")
-                return updated_count
-            except Exception as e:
-                print(f"ERROR: Failed to simulate risk event: {e}")
-                return 0
\ No newline at end of file
+
+        def inverse_ops_for(previous_weights):
+            return [(self._RESTORE_EXPOSURE_WEIGHTS_QUERY, {"rows": previous_weights, "risk_factor_name": risk_factor_name})]
+
+        try:
+            previous_weights, scenario_id = self._run_journaled(
+                "risk_event", f"'{risk_factor_name}' x{impact_multiplier}", inverse_ops_for,
+                self._risk_event_tx, risk_factor_name, impact_multiplier, target_company_id, target_sector, target_location)
+            updated_count = len(previous_weights)
+            print(f"INFO: Updated {updated_count} '{risk_factor_name}' risk exposures.")
+        except Exception as e:
+            print(f"ERROR: Failed to simulate risk event: {e}")
+            return 0
+
+        if updated_count:
+            print(f"INFO: Journaled risk event as scenario {scenario_id}.")
+            self._bump_graph_version()
+        return updated_count
+
+    def list_scenarios(self) -> list:
+        """Returns the journaled (not yet rolled back) scenarios, oldest first."""
+        return self.journal.list()
+
+    def _apply_inverse_ops(self, entries):
+        """Runs the journaled inverse operations of `entries` (most recent first) in one write transaction."""
+        def undo(tx):
+            for entry in entries:
+                for op in entry["inverse_ops"]:
+                    tx.run(op["query"], op["params"])
+        self._run_write(undo)
+
+    def rollback_scenarios(self, count=1) -> int:
+        """
+        Rolls back the last `count` journaled scenarios (most recent first) in a single
+        write transaction. Returns the number of scenarios rolled back. Callers should
+        recompute risk afterwards, as after running a scenario.
+        Entries journaled before the graph was last reloaded (an earlier load generation)
+        are discarded instead of being applied to a graph they do not describe.
+        """
+        entries = self.journal.peek(count)
+        stale = [entry for entry in entries if not self.journal.is_current(entry)]
+        if stale:
+            print(f"WARNING: Discarding {len(stale)} scenario(s) journaled before the graph was reloaded: "
+                  f"{', '.join(entry['id'] for entry in stale)}")
+            self.journal.remove(entry["id"] for entry in stale)
+            entries = [entry for entry in entries if entry not in stale]
+        if not entries:
+            print("INFO: No journaled scenarios to roll back.")
+            return 0
+        print(f"\n--- Rolling back {len(entries)} scenario(s) ---")
+
+        self._apply_inverse_ops(entries)
+        self.journal.remove(entry["id"] for entry in entries)
+        self._bump_graph_version()
+        for entry in entries:
+            print(f"INFO: Rolled back {entry['type']} scenario {entry['id']}: {entry['description']}")
+        print("--- Scenario Rollback Complete ---")
+        return len(entries)
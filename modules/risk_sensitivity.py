@@ -0,0 +1,119 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def ownership_matrix(snapshot):
+    """Sparse Blockholder x Company matrix of OWNS percents (duplicate edges are summed)."""
+    mask = ~snapshot.owns_owner_is_company
+    return sp.csr_matrix(
+        (snapshot.owns_percent[mask], (snapshot.owns_owner[mask], snapshot.owns_company[mask])),
+        shape=(snapshot.num_blockholders, snapshot.num_companies),
+    )
+
+
+def _row_top_n(matrix, top_n):
+    """Yields (row, data_positions) of the top_n largest |values| per CSR row."""
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            continue
+        positions = np.arange(start, end)
+        vals = np.abs(matrix.data[start:end])
+        if len(vals) > top_n:
+            keep = np.argpartition(-vals, top_n - 1)[:top_n]
+            positions, vals = positions[keep], vals[keep]
+        yield row, positions[np.argsort(-vals)]
+
+
+def compute_sensitivity_report(snapshot, top_n=10, blockholder_ids=None):
+    """
+    Computes the sensitivity of every Blockholder's dollarized_risk to every EXPOSED_TO
+    weight and every Blockholder OWNS percent in one vectorized pass.
+
+    With D = P @ (m * (W @ 1)) (P: ownership, m: market caps, W: exposure weights):
+      - dD_b / dW_cr = P_bc * m_c        (per-blockholder exposure sensitivities)
+      - dD_b / dP_bc = m_c * direct_c     (per-blockholder ownership sensitivities)
+      - d(sum D) / dW_cr = (P^T 1)_c * m_c (global, via the adjoint vector P^T 1)
+    Propagation is a single Blockholder <- Company pass, so the adjoint system
+    reduces to one sparse transpose product rather than an iterative solve.
+    'elasticity' is sensitivity * current value, i.e. the dollar impact of a 100% change.
+    """
+    snap = snapshot
+    P = ownership_matrix(snap)
+    market_cap = snap.market_cap
+    company_dollarized = market_cap * snap.company_direct_risk()
+
+    exposure_labels = [
+        (snap.company_ids[c], snap.company_names[c], snap.risk_factor_names[r])
+        for c, r in zip(snap.exposure_company, snap.exposure_factor)
+    ]
+
+    # Global drivers: adjoint of sum(D) w.r.t. company dollarized risk.
+    adjoint = np.asarray(P.sum(axis=0)).ravel()
+    global_weight_sens = adjoint[snap.exposure_company] * market_cap[snap.exposure_company]
+    global_weight_elasticity = global_weight_sens * snap.exposure_weight
+    order = np.argsort(-np.abs(global_weight_sens))[:top_n]
+    global_weights = [{
+        "company_id": exposure_labels[e][0],
+        "company_name": exposure_labels[e][1],
+        "risk_factor": exposure_labels[e][2],
+        "weight": float(snap.exposure_weight[e]),
+        "sensitivity": float(global_weight_sens[e]),
+        "elasticity": float(global_weight_elasticity[e]),
+    } for e in order]
+
+    owns_mask = np.flatnonzero(~snap.owns_owner_is_company)
+    ownership_sens = company_dollarized[snap.owns_company[owns_mask]]
+    order = owns_mask[np.argsort(-np.abs(ownership_sens))[:top_n]]
+    global_ownership = [{
+        "blockholder_id": snap.blockholder_ids[snap.owns_owner[pos]],
+        "company_id": snap.company_ids[snap.owns_company[pos]],
+        "company_name": snap.company_names[snap.owns_company[pos]],
+        "percent": float(snap.owns_percent[pos]),
+        "sensitivity": float(company_dollarized[snap.owns_company[pos]]),
+        "elasticity": float(company_dollarized[snap.owns_company[pos]] * snap.owns_percent[pos]),
+    } for pos in order]
+
+    # Per-blockholder drivers: S = P @ E, where E maps each company to its exposures scaled by market cap.
+    num_exposures = len(snap.exposure_weight)
+    E = sp.csr_matrix(
+        (market_cap[snap.exposure_company], (snap.exposure_company, np.arange(num_exposures))),
+        shape=(snap.num_companies, num_exposures),
+    )
+    rows = None
+    if blockholder_ids is not None:
+        rows = np.array([snap.blockholder_index[b] for b in blockholder_ids if b in snap.blockholder_index], dtype=np.int64)
+        P = P[rows]
+    S = (P @ E).tocsr()
+    # Ownership sensitivities share P's sparsity pattern: value = company dollarized risk.
+    O = P.copy()
+    O.data = company_dollarized[O.indices]
+
+    def blockholder_id(row):
+        return snap.blockholder_ids[rows[row] if rows is not None else row]
+
+    per_blockholder = {}
+    for row, positions in _row_top_n(S, top_n):
+        entry = per_blockholder.setdefault(blockholder_id(row), {"exposure_weights": [], "ownership": []})
+        entry["exposure_weights"] = [{
+            "company_id": exposure_labels[S.indices[pos]][0],
+            "company_name": exposure_labels[S.indices[pos]][1],
+            "risk_factor": exposure_labels[S.indices[pos]][2],
+            "weight": float(snap.exposure_weight[S.indices[pos]]),
+            "sensitivity": float(S.data[pos]),
+            "elasticity": float(S.data[pos] * snap.exposure_weight[S.indices[pos]]),
+        } for pos in positions]
+    for row, positions in _row_top_n(O, top_n):
+        entry = per_blockholder.setdefault(blockholder_id(row), {"exposure_weights": [], "ownership": []})
+        entry["ownership"] = [{
+            "company_id": snap.company_ids[O.indices[pos]],
+            "company_name": snap.company_names[O.indices[pos]],
+            "percent": float(P.data[pos]),
+            "sensitivity": float(O.data[pos]),
+            "elasticity": float(O.data[pos] * P.data[pos]),
+        } for pos in positions]
+
+    return {
+        "global": {"exposure_weights": global_weights, "ownership": global_ownership},
+        "per_blockholder": per_blockholder,
+    }
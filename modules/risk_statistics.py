@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+RISK_METRICS = ("total_risk", "dollarized_risk")
+
+# Scales the median absolute deviation to be comparable with a standard deviation.
+MAD_SCALE = 1.4826
+
+
+def robust_z_scores(values, group_codes=None):
+    """
+    (x - median) / (1.4826 * MAD), optionally within groups. Groups with zero MAD get 0.
+    """
+    values = np.asarray(values, dtype=float)
+    if group_codes is None:
+        group_codes = np.zeros(len(values), dtype=np.int64)
+    frame = pd.DataFrame({"g": group_codes, "x": values})
+    median = frame.groupby("g")["x"].transform("median").to_numpy()
+    mad = (frame["x"] - median).abs().groupby(frame["g"]).transform("median").to_numpy() * MAD_SCALE
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(mad > 0, (values - median) / mad, 0.0)
+    return z
+
+
+def percentile_ranks(values, group_codes=None):
+    """Percentile rank (0-100] of each value, i.e. the share of values <= it, optionally within groups."""
+    series = pd.Series(np.asarray(values, dtype=float))
+    if group_codes is None:
+        return series.rank(method="max", pct=True).to_numpy() * 100.0
+    return series.groupby(np.asarray(group_codes)).rank(method="max", pct=True).to_numpy() * 100.0
+
+
+def grouped_summary(values, group_codes, group_names, bin_edges, quantiles=DEFAULT_QUANTILES):
+    """
+    Count, mean, quantiles and histogram counts (over shared bin_edges) for every group
+    in one vectorized pass. Returns {group_name: summary}.
+    """
+    values = np.asarray(values, dtype=float)
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    num_groups = len(group_names)
+    num_bins = len(bin_edges) - 1
+    if len(values) == 0 or num_groups == 0:
+        return {}
+
+    counts = np.bincount(group_codes, minlength=num_groups)
+    sums = np.bincount(group_codes, weights=values, minlength=num_groups)
+    quantile_table = pd.Series(values).groupby(group_codes).quantile(list(quantiles)).unstack()
+    bin_idx = np.clip(np.searchsorted(bin_edges, values, side="right") - 1, 0, num_bins - 1)
+    histograms = np.bincount(group_codes * num_bins + bin_idx, minlength=num_groups * num_bins).reshape(num_groups, num_bins)
+
+    summary = {}
+    for code, name in enumerate(group_names):
+        if counts[code] == 0:
+            continue
+        summary[name] = {
+            "count": int(counts[code]),
+            "mean": float(sums[code] / counts[code]),
+            "quantiles": {f"p{int(round(q * 100))}": float(quantile_table.loc[code, q]) for q in quantiles},
+            "histogram": histograms[code].tolist(),
+        }
+    return summary
+
+
+class RiskStatistics:
+    """
+    Distribution statistics of total_risk and dollarized_risk for Companies and
+    Blockholders, computed from a GraphSnapshot in NumPy: quantiles and histograms
+    per label, sector and location, plus per-node percentile ranks and robust z-scores.
+    """
+    def __init__(self, snapshot, bins=20, quantiles=DEFAULT_QUANTILES):
+        self.snapshot = snapshot
+        self.bins = bins
+        self.quantiles = quantiles
+        self._summary = None
+        self._node_scores = None
+
+    def _columns(self, label):
+        snap = self.snapshot
+        if label == "Company":
+            return snap.company_ids, snap.company_names, {"total_risk": snap.company_total_risk, "dollarized_risk": snap.company_dollarized_risk}
+        return snap.blockholder_ids, snap.blockholder_names, {"total_risk": snap.blockholder_total_risk, "dollarized_risk": snap.blockholder_dollarized_risk}
+
+    def summary(self) -> dict:
+        """{label: {metric: {'overall', 'bin_edges', 'by_sector', 'by_location'}}} (sector/location for Company only)."""
+        if self._summary is not None:
+            return self._summary
+        snap = self.snapshot
+        sector_codes, sector_names = pd.factorize(pd.Series(snap.company_sectors).fillna("N/A"))
+        location_codes, location_names = pd.factorize(pd.Series(snap.company_locations).fillna("N/A"))
+        result = {}
+        for label in ("Company", "Blockholder"):
+            _, _, columns = self._columns(label)
+            result[label] = {}
+            for metric in RISK_METRICS:
+                values = columns[metric]
+                if len(values) == 0:
+                    continue
+                bin_edges = np.histogram_bin_edges(values, bins=self.bins)
+                overall = grouped_summary(values, np.zeros(len(values), dtype=np.int64), ["all"], bin_edges, self.quantiles)["all"]
+                overall.update({"min": float(values.min()), "max": float(values.max()), "std": float(values.std())})
+                entry = {"overall": overall, "bin_edges": bin_edges.tolist()}
+                if label == "Company":
+                    entry["by_sector"] = grouped_summary(values, sector_codes, list(sector_names), bin_edges, self.quantiles)
+                    entry["by_location"] = grouped_summary(values, location_codes, list(location_names), bin_edges, self.quantiles)
+                result[label][metric] = entry
+        self._summary = result
+        return result
+
+    def node_scores(self) -> pd.DataFrame:
+        """
+        One row per Company/Blockholder with percentile ranks and robust z-scores of each
+        risk metric within its label (and, for companies, the dollarized percentile within its sector).
+        """
+        if self._node_scores is not None:
+            return self._node_scores
+        snap = self.snapshot
+        frames = []
+        for label in ("Company", "Blockholder"):
+            ids, names, columns = self._columns(label)
+            frame = pd.DataFrame({"id": ids, "name": names, "label": label})
+            for metric in RISK_METRICS:
+                frame[metric] = columns[metric]
+                frame[f"{metric}_pct"] = percentile_ranks(columns[metric])
+                frame[f"{metric}_zscore"] = robust_z_scores(columns[metric])
+            if label == "Company":
+                sector_codes, _ = pd.factorize(pd.Series(snap.company_sectors).fillna("N/A"))
+                frame["sector"] = snap.company_sectors
+                frame["dollarized_risk_sector_pct"] = percentile_ranks(columns["dollarized_risk"], sector_codes)
+            frames.append(frame)
+        self._node_scores = pd.concat(frames, ignore_index=True)
+        return self._node_scores
+
+    def outliers(self, metric="dollarized_risk", z_threshold=3.5) -> pd.DataFrame:
+        """Nodes whose robust z-score for `metric` exceeds z_threshold, highest first."""
+        scores = self.node_scores()
+        column = f"{metric}_zscore"
+        return scores[scores[column] > z_threshold].sort_values(column, ascending=False)
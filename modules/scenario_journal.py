@@ -0,0 +1,149 @@
+import os
+import json
+import uuid
+import datetime
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, threads are still serialized.
+    fcntl = None
+
+
+class ScenarioJournal:
+    """
+    Append-only journal of applied scenarios. Each entry stores the parameterized
+    Cypher operations (or, for the in-memory backend, named graph operations) that
+    undo the scenario, so scenarios can be rolled back
+    (most recent first) without reloading the graph. The journal is persisted as
+    JSON so it survives app restarts.
+
+    The app and the pipeline share the file, so every operation re-reads it under a
+    lock (a thread lock plus an flock on `<path>.lock`) and writes it atomically.
+    clear() starts a new load generation; entries stamped with an earlier one describe
+    a graph that no longer exists and must not be rolled back.
+    """
+    def __init__(self, path="output/scenario_journal.json"):
+        self.path = path
+        self.entries = []
+        self.generation = None
+        self._lock = threading.RLock()
+        self._load()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Holds the journal lock and yields with self.entries/self.generation freshly read."""
+        with self._lock:
+            if not self.path or fcntl is None:
+                self._load()
+                yield
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._load()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            if self.path:
+                self.entries, self.generation = [], None
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Could not read scenario journal at {self.path}, starting empty. Error: {e}")
+            data = []
+        # Journals written before load generations existed are a bare list of entries.
+        if isinstance(data, list):
+            self.entries, self.generation = data, None
+        else:
+            self.entries, self.generation = data.get("entries", []), data.get("generation")
+
+    def _save(self):
+        """Atomically rewrites the journal (temp file + rename)."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"generation": self.generation, "entries": self.entries}, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex[:12]
+
+    def current_generation(self):
+        """The load generation scenarios applied now belong to."""
+        with self._locked():
+            return self.generation
+
+    def record(self, scenario_type: str, description: str, inverse_ops: list, scenario_id=None, generation=None) -> str:
+        """
+        Records a scenario with its inverse operations, a list of (query, params) pairs
+        to be executed in order when rolling back. `generation` is the load generation
+        observed before the scenario ran (default: the current one). Recording an existing
+        scenario_id replaces that entry. Returns the scenario id.
+        """
+        scenario_id = scenario_id or self.new_id()
+        with self._locked():
+            entry = {
+                "id": scenario_id,
+                "type": scenario_type,
+                "description": description,
+                "applied_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "generation": generation if generation is not None else self.generation,
+                "inverse_ops": [{"query": q, "params": p} for q, p in inverse_ops],
+            }
+            self.entries = [e for e in self.entries if e["id"] != scenario_id] + [entry]
+            self._save()
+        return scenario_id
+
+    def discard(self, scenario_id):
+        """Drops one entry, e.g. when its scenario's transaction failed."""
+        self.remove([scenario_id])
+
+    def list(self) -> list:
+        """Returns a summary of journaled scenarios, oldest first."""
+        with self._locked():
+            return [{k: e[k] for k in ("id", "type", "description", "applied_at")} for e in self.entries]
+
+    def peek(self, count=1) -> list:
+        """Returns the last `count` entries, most recent first."""
+        with self._locked():
+            return list(reversed(self.entries[-count:])) if count > 0 else []
+
+    def is_current(self, entry) -> bool:
+        """Whether an entry was applied to the graph of the current load generation."""
+        return entry.get("generation") == self.generation
+
+    def remove(self, scenario_ids):
+        """Removes the entries with the given ids."""
+        scenario_ids = set(scenario_ids)
+        with self._locked():
+            kept = [e for e in self.entries if e["id"] not in scenario_ids]
+            if len(kept) != len(self.entries):
+                self.entries = kept
+                self._save()
+
+    def pop(self, count=1) -> list:
+        """Removes and returns the last `count` entries, most recent first."""
+        with self._locked():
+            popped = list(reversed(self.entries[-count:])) if count > 0 else []
+            if popped:
+                del self.entries[-len(popped):]
+                self._save()
+        return popped
+
+    def clear(self):
+        """Drops all entries and starts a new load generation, e.g. after the graph has been reloaded from scratch."""
+        with self._locked():
+            self.entries = []
+            self.generation = uuid.uuid4().hex[:12]
+            self._save()
@@ -0,0 +1,40 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def compute_risk_by_year(snapshot, years=None):
+    """
+    Propagates company risk to Blockholders for every loaded ownership year at once.
+    The per-year ownership matrices are stacked into one (years * blockholders) x companies
+    sparse matrix and multiplied by the [total_risk, dollarized_risk] company columns,
+    so all years cost a single sparse product. Returns a dict with 'years',
+    'blockholder_ids', and 'total_risk' / 'dollarized_risk' arrays of shape (years, blockholders).
+    """
+    snap = snapshot
+    edge = snap.owns_history_edge
+    keep = ~snap.owns_owner_is_company[edge]
+    edge = edge[keep]
+    history_year = snap.owns_history_year[keep]
+    history_percent = snap.owns_history_percent[keep]
+
+    if years is None:
+        years = np.unique(history_year)
+    years = np.asarray(sorted(years), dtype=np.int64)
+    num_blockholders = snap.num_blockholders
+
+    year_pos = np.searchsorted(years, history_year)
+    in_range = year_pos < len(years)
+    in_range[in_range] = years[year_pos[in_range]] == history_year[in_range]
+    rows = year_pos[in_range] * num_blockholders + snap.owns_owner[edge[in_range]]
+    stacked = sp.csr_matrix(
+        (history_percent[in_range], (rows, snap.owns_company[edge[in_range]])),
+        shape=(len(years) * num_blockholders, snap.num_companies),
+    )
+    company_columns = np.column_stack([snap.company_total_risk, snap.company_dollarized_risk])
+    result = np.asarray(stacked @ company_columns)
+    return {
+        "years": years.tolist(),
+        "blockholder_ids": snap.blockholder_ids,
+        "total_risk": result[:, 0].reshape(len(years), num_blockholders),
+        "dollarized_risk": result[:, 1].reshape(len(years), num_blockholders),
+    }
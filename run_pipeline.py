@@ -4,74 +4,199 @@ import sys
 import argparse
 import config
 from modules.logging_utils import logger
-from modules.db_loader import DBLoader
-from modules.risk_engine import RiskEngine
+from modules.graph_backend import BACKENDS, create_loader, create_risk_engine
+from modules.pipeline_profiler import PipelineProfiler, load_report, compare_to_baseline
+from modules.pipeline_dag import Stage, PipelineDAG
+from modules.query_metrics import metrics as query_metrics
 from scripts.generate_cik_ticker_map import generate_cik_ticker_map
 from scripts.generate_fema_risk_map import generate_fema_risk_map
-from scripts.generate_market_cap import generate_market_cap_data
+from scripts.generate_market_cap import generate_market_cap_data, generate_market_cap_history
 from data_enricher import automate_enrichment_pipeline
 
-def main(clear_db=True):
+def build_pipeline(loader, engine, resume=False, reconcile=False) -> PipelineDAG:
     """
-    Executes the full data pipeline automatically.
+    The pipeline as a dependency DAG. Data generation and enrichment only touch files and
+    overlap freely; every stage that writes to the graph holds the "graph" resource, so
+    graph writes stay serialized. With `resume`, the blockholder load skips the chunks
+    its checkpoint manifest records as committed. With `reconcile`, the metadata, market
+    cap and exposure loads write only what differs from the graph.
     """
-    loader = None
-    engine = None
-    try:
-        logger.info("--- Starting full automated pipeline ---")
-        
-        loader = DBLoader(uri=config.MEMGRAPH_URI, user=config.MEMGRAPH_USER, password=config.MEMGRAPH_PASSWORD)
-        engine = RiskEngine(uri=config.MEMGRAPH_URI, user=config.MEMGRAPH_USER, password=config.MEMGRAPH_PASSWORD)
+    def clear_db(record):
+        logger.info("--- Clearing all graph data ---")
+        loader.clear_database()
+        engine.journal.clear()
+        logger.info("--- Graph cleared. ---")
 
-        if clear_db:
-            logger.info("--- Clearing all data from Memgraph ---")
-            loader.driver.session().run("MATCH (n) DETACH DELETE n")
-            logger.info("--- Database cleared. ---")
-            
-            # --- ADDING INDEXES FOR PERFORMANCE ---
-            logger.info("--- Creating indexes for faster data loading ---")
-            with loader.driver.session() as session:
-                session.run("CREATE INDEX ON :Company(id)")
-                session.run("CREATE INDEX ON :Blockholder(id)")
-                session.run("CREATE INDEX ON :RiskFactor(name)")
-            logger.info("--- Indexes created. ---")
+    def load_blockholders(record):
+        loader.load_blockholders(config.BLOCKHOLDERS_CSV, chunk_size=config.CHUNK_SIZE, start_year=config.START_YEAR,
+                                 end_year=config.END_YEAR, resume=resume)
+        record["rows"] = loader.last_rows_loaded
 
-        logger.info("--- Generating data CSVs ---")
-        generate_cik_ticker_map()
-        generate_fema_risk_map()
-        generate_market_cap_data()
+    def load(method, csv_path):
+        def run(record):
+            getattr(loader, method)(csv_path, reconcile=reconcile)
+            record["rows"] = loader.last_rows_loaded
+            if loader.last_delta is not None:
+                record["delta"] = loader.last_delta
+        return run
 
-        logger.info("--- Loading blockholders from CSV ---")
-        loader.load_blockholders(config.BLOCKHOLDERS_CSV, chunk_size=config.CHUNK_SIZE, start_year=config.START_YEAR, end_year=config.END_YEAR)
+    return PipelineDAG([
+        Stage("clear_db", clear_db, resources=["graph"], description="Delete all graph data and recreate indexes"),
+        Stage("generate_cik_map", lambda record: generate_cik_ticker_map(), description="CIK -> ticker map CSV"),
+        Stage("generate_fema_map", lambda record: generate_fema_risk_map(), description="FEMA risk by location CSV"),
+        Stage("generate_market_cap", lambda record: generate_market_cap_data(), description="Market cap CSV"),
+        Stage("generate_market_cap_history", lambda record: generate_market_cap_history(), ["generate_market_cap"],
+              description="Daily market cap history store"),
+        Stage("load_blockholders", load_blockholders, ["clear_db"], ["graph"], "Blockholder/Company nodes and OWNS edges"),
+        Stage("enrichment", lambda record: automate_enrichment_pipeline(), ["generate_cik_map", "generate_fema_map"],
+              description="Enriched metadata and risk exposure CSVs"),
+        Stage("load_metadata", load("load_enriched_company_metadata", config.OUTPUT_METADATA_ENRICHED_CSV),
+              ["enrichment", "load_blockholders"], ["graph"], "Company sector/location/volatility"),
+        Stage("load_market_cap", load("load_market_cap_data", config.MARKET_CAP_CSV),
+              ["generate_market_cap", "load_blockholders"], ["graph"], "Company market caps"),
+        Stage("load_exposures", load("load_risk_exposures_from_csv", config.OUTPUT_RISK_EXPOSURES_CSV),
+              ["enrichment", "load_blockholders"], ["graph"], "EXPOSED_TO relationships"),
+        Stage("compute_total_risk", lambda record: engine.compute_total_risk(max_iterations=config.MAX_RISK_ITERATIONS),
+              ["load_exposures"], ["graph"], "Direct and propagated total_risk"),
+        Stage("dollarize_risk", lambda record: engine.dollarize_risk(), ["compute_total_risk", "load_market_cap"], ["graph"],
+              "Dollarized risk for companies, blockholders and risk factors"),
+        Stage("write_percentile_ranks", lambda record: engine.write_percentile_ranks(), ["dollarize_risk", "load_metadata"], ["graph"],
+              "Percentile ranks and z-scores"),
+        Stage("write_blockholder_concentration", lambda record: engine.write_blockholder_concentration(),
+              ["dollarize_risk", "load_metadata"], ["graph"], "Blockholder HHI by sector, location and risk factor"),
+        Stage("ownership_index", lambda record: engine.get_ownership_index(threshold=config.INTEGRATED_OWNERSHIP_THRESHOLD, persist_dir=config.OWNERSHIP_INDEX_DIR),
+              ["dollarize_risk"], ["graph"], "Integrated ownership index"),
+    ])
 
-        logger.info("--- Running automated data enrichment ---")
-        automate_enrichment_pipeline()
+def stage_durations(*reports) -> dict:
+    """Per-stage wall seconds from the first available profile report, for scheduling estimates."""
+    for report in reports:
+        if report:
+            return {s["stage"]: s["wall_seconds"] for s in report.get("stages", []) if s.get("status") == "ok"}
+    return {}
+
+def print_plan(dag, selected, durations, max_workers):
+    """Dry run: prints the stages that would run, grouped into dependency waves, with estimates."""
+    print(f"Pipeline plan ({len(selected)} stages, up to {max_workers} workers):")
+    for i, wave in enumerate(dag.waves(selected), 1):
+        print(f"  Wave {i}:")
+        for name in wave:
+            stage = dag.stages[name]
+            deps = [d for d in stage.depends_on if d in selected]
+            estimate = f"~{durations[name]:.1f}s" if name in durations else "no estimate"
+            print(f"    {name:34s} {estimate:>12s}  after: {', '.join(deps) or '-'}"
+                  + (f"  holds: {', '.join(sorted(stage.resources))}" if stage.resources else "")
+                  + (f"  # {stage.description}" if stage.description else ""))
+    if durations:
+        critical, path = dag.critical_path(selected, durations, default=0.0)
+        sequential = sum(durations.get(name, 0.0) for name in selected)
+        print(f"Estimated critical path: {critical:.1f}s ({' -> '.join(path)}); sequential: {sequential:.1f}s")
+
+def main(clear_db=True, profile_report=config.PIPELINE_PROFILE_REPORT, baseline=config.PIPELINE_PROFILE_BASELINE,
+         save_baseline=False, cprofile_dir=None, backend=None, stages=None, skip=(), with_dependencies=True,
+         max_workers=config.PIPELINE_MAX_WORKERS, dry_run=False, resume=False):
+    """
+    Executes the data pipeline as a dependency DAG on up to `max_workers` threads.
+    `stages` restricts the run to those stages (plus their upstream stages unless
+    with_dependencies is False) and `skip` drops stages whose outputs already exist;
+    `dry_run` only prints the plan. `resume` continues after an interrupted run: the graph
+    is not cleared and already committed blockholder chunks are skipped. Every stage is profiled; the run report is written to
+    `profile_report` and compared against `baseline` (if present), logging stages that
+    regressed. `backend` selects the graph store ('memgraph' or 'memory', default
+    config.GRAPH_BACKEND).
+    """
+    skip = list(skip) + ([] if clear_db and not resume else ["clear_db"])
+    if cprofile_dir and max_workers > 1:
+        # Only one cProfile can be active per process (Python >= 3.12 raises otherwise).
+        logger.warning(f"--cprofile profiles one stage at a time; running with 1 worker instead of {max_workers}.")
+        max_workers = 1
+    durations = stage_durations(load_report(baseline), load_report(profile_report))
+    if dry_run:
+        dag = build_pipeline(None, None)
+        print_plan(dag, dag.select(stages, skip=skip, with_dependencies=with_dependencies), durations, max_workers)
+        return True
 
-        logger.info("--- Loading enriched metadata and market cap into DB ---")
-        loader.load_enriched_company_metadata(config.OUTPUT_METADATA_ENRICHED_CSV)
-        loader.load_market_cap_data(config.MARKET_CAP_CSV)
+    query_metrics.configure(config.QUERY_METRICS_FILE, port=config.QUERY_METRICS_PORT)
+    loader = None
+    engine = None
+    dag = None
+    profiler = PipelineProfiler(trace_memory=config.PIPELINE_PROFILE_TRACEMALLOC, cprofile_dir=cprofile_dir)
+    success = True
+    try:
+        logger.info("--- Starting full automated pipeline ---")
 
-        logger.info("--- Loading EXPOSED_TO relationships into DB ---")
-        loader.load_risk_exposures_from_csv(config.OUTPUT_RISK_EXPOSURES_CSV)
+        loader = create_loader(backend)
+        engine = create_risk_engine(backend)
 
-        logger.info("--- Computing and propagating risks ---")
-        engine.compute_total_risk(max_iterations=config.MAX_RISK_ITERATIONS)
-        engine.dollarize_risk()
+        selected = build_pipeline(None, None).select(stages, skip=skip, with_dependencies=with_dependencies)
+        # Diffing against the graph only pays off when this run keeps it; after clear_db there is nothing to diff.
+        reconcile = config.RECONCILE_RELOADS and "clear_db" not in selected
+        dag = build_pipeline(loader, engine, resume=resume, reconcile=reconcile)
+        logger.info(f"--- Running {len(selected)} stages with up to {max_workers} workers: {', '.join(selected)} ---")
+        dag.run(profiler, selected, max_workers=max_workers, durations=durations)
 
         logger.info("--- Pipeline execution complete. ---")
 
     except Exception as e:
         logger.error("FATAL ERROR during pipeline execution", exc_info=True)
-        return False
+        success = False
     finally:
         if loader:
             loader.close()
         if engine:
             engine.close()
-    return True
+        summarize_schedule(profiler, dag, max_workers)
+        report_profile(profiler, profile_report, baseline, save_baseline and success)
+    return success
+
+def summarize_schedule(profiler, dag, max_workers):
+    """Adds the measured critical path to the run report and logs how close the run came to it."""
+    if dag is None or not profiler.stages:
+        return
+    durations = stage_durations({"stages": profiler.stages})
+    critical, path = dag.critical_path(list(durations), durations)
+    total = profiler.report()["total_wall_seconds"]
+    profiler.summary = {"max_workers": max_workers, "critical_path_seconds": critical, "critical_path": path,
+                        "sequential_seconds": sum(durations.values())}
+    logger.info(f"[profile] Total {total:.2f}s; critical path {critical:.2f}s ({' -> '.join(path)}); "
+                f"stages back to back {profiler.summary['sequential_seconds']:.2f}s")
+
+def report_profile(profiler, profile_report, baseline, save_baseline=False):
+    """Writes the run report, logs regressions against the baseline and optionally replaces it."""
+    report = profiler.write_report(profile_report)
+    baseline_report = load_report(baseline)
+    if baseline_report is not None:
+        regressions = compare_to_baseline(report, baseline_report, threshold=config.PIPELINE_REGRESSION_THRESHOLD)
+        for r in regressions:
+            logger.warning(f"[profile] REGRESSION in {r['stage']}: {r['metric']} {r['baseline']:.2f} -> {r['current']:.2f} ({r['change_pct']:+.0f}%)")
+        if not regressions:
+            logger.info(f"[profile] No stage regressed more than {config.PIPELINE_REGRESSION_THRESHOLD:.0%} against the baseline.")
+    if save_baseline:
+        profiler.write_report(baseline)
+        logger.info(f"[profile] Saved this run as the new baseline: {baseline}")
 
 if __name__ == "__main__":
-    if main():
+    parser = argparse.ArgumentParser(description="Run the full data pipeline.")
+    parser.add_argument("--no-clear", action="store_true", help="Keep existing graph data instead of clearing the database first.")
+    parser.add_argument("--profile-report", default=config.PIPELINE_PROFILE_REPORT, help="Where to write the per-stage profile report (JSON).")
+    parser.add_argument("--baseline", default=config.PIPELINE_PROFILE_BASELINE, help="Baseline profile report to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's profile as the new baseline.")
+    parser.add_argument("--cprofile", metavar="DIR", default=None, help="Capture a cProfile (.prof) per stage into DIR; stages then run one at a time.")
+    parser.add_argument("--backend", choices=BACKENDS, default=config.GRAPH_BACKEND,
+                        help="Graph store: Memgraph or the in-process CSR store (persisted to config.IN_MEMORY_GRAPH_DIR).")
+    parser.add_argument("--stages", nargs="+", metavar="STAGE", default=None,
+                        help="Run only these stages and the stages they depend on (see --dry-run for names).")
+    parser.add_argument("--skip", nargs="+", metavar="STAGE", default=[], help="Stages to leave out, e.g. when their outputs already exist.")
+    parser.add_argument("--no-deps", action="store_true", help="With --stages, run exactly the named stages without their dependencies.")
+    parser.add_argument("--workers", type=int, default=config.PIPELINE_MAX_WORKERS, help="Maximum number of stages running at once.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the execution plan (waves, dependencies, estimates) and exit.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run: keep the graph and skip blockholder chunks already committed (implies --no-clear).")
+    args = parser.parse_args()
+    if main(clear_db=not args.no_clear, profile_report=args.profile_report, baseline=args.baseline,
+            save_baseline=args.save_baseline, cprofile_dir=args.cprofile, backend=args.backend,
+            stages=args.stages, skip=args.skip, with_dependencies=not args.no_deps,
+            max_workers=args.workers, dry_run=args.dry_run, resume=args.resume):
         sys.exit(0)
     else:
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import datetime
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from modules.graph_backend import BACKENDS, create_loader, create_risk_engine
+from modules.dashboard_queries import TOP_COMPANIES_QUERY, TOP_BLOCKHOLDERS_QUERY, COMPANY_GRAPH_QUERY, BLOCKHOLDER_GRAPH_QUERY
+from scripts.generate_blockholders import generate_synthetic_blockholders, COMPANY_CIK_BASE
+from visualizations.graph_renderer import render_graph_as_html
+
+SECTORS = ["Technology", "Energy", "Financial Services", "Health Care", "Industrials", "Utilities", "Real Estate"]
+LOCATIONS = ["New York", "California", "Texas", "Florida", "Illinois", "Europe", "Asia"]
+HAZARDS = ["Hurricane", "Earthquake", "Wildfire", "Flood"]
+
+
+def time_call(fn, repeats=1, setup=None, teardown=None) -> list:
+    """Wall-clock seconds of `repeats` calls to fn(); setup/teardown run untimed around each call."""
+    samples = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        if teardown:
+            teardown()
+    return samples
+
+
+def time_load(fn, trace_memory=False) -> tuple:
+    """
+    (seconds, peak MB) of one call to fn(). With trace_memory the peak Python heap allocated
+    during the call is measured with tracemalloc (which slows the call down); otherwise it is None.
+    """
+    if not trace_memory:
+        return time_call(fn)[0], None
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        return elapsed, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(samples, rows=None, peak_mb=None) -> dict:
+    """p50/p95/mean/min/max of the samples, plus throughput and peak memory when known."""
+    data = np.asarray(samples, dtype=float)
+    summary = {
+        "samples": [float(s) for s in data],
+        "p50": float(np.percentile(data, 50)),
+        "p95": float(np.percentile(data, 95)),
+        "mean": float(data.mean()),
+        "min": float(data.min()),
+        "max": float(data.max()),
+    }
+    if rows is not None:
+        summary["rows"] = int(rows)
+        summary["rows_per_second"] = rows / summary["p50"] if summary["p50"] > 0 else None
+    if peak_mb is not None:
+        summary["peak_traced_mb"] = float(peak_mb)
+    return summary
+
+
+def write_side_tables(directory, num_companies, seed=42) -> dict:
+    """
+    Synthetic enriched metadata, market cap and EXPOSED_TO CSVs for the companies produced by
+    generate_synthetic_blockholders() with the same `num_companies`, in the columns the loader reads.
+    """
+    rng = np.random.default_rng(seed)
+    company_ids = np.array([f"C_{cik}" for cik in COMPANY_CIK_BASE + np.arange(num_companies)], dtype=object)
+    sectors = np.array(SECTORS, dtype=object)[rng.integers(0, len(SECTORS), num_companies)]
+    locations = np.array(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), num_companies)]
+    volatility = np.round(rng.uniform(0.1, 0.6, num_companies), 4)
+    paths = {
+        "metadata": os.path.join(directory, "company_metadata_enriched.csv"),
+        "market_cap": os.path.join(directory, "market_cap.csv"),
+        "exposures": os.path.join(directory, "company_risk_exposures.csv"),
+    }
+    pd.DataFrame({"company_id_graph": company_ids, "sector": sectors, "location": locations,
+                  "volatility": volatility}).to_csv(paths["metadata"], index=False)
+    pd.DataFrame({"company_id_graph": company_ids,
+                  "market_cap": np.round(np.maximum(0.1, rng.lognormal(2, 1.5, num_companies)) * 1e9, 2)}
+                 ).to_csv(paths["market_cap"], index=False)
+    hazard = np.array(HAZARDS, dtype=object)[rng.integers(0, len(HAZARDS), num_companies)]
+    pd.DataFrame({
+        "company_id": np.concatenate([company_ids, company_ids, company_ids]),
+        "risk_factor": np.concatenate([np.full(num_companies, "Inherent Market Volatility", dtype=object),
+                                       "Sector Market Risk (" + sectors + ")", hazard]),
+        "risk_weight": np.concatenate([volatility, np.round(rng.uniform(0.05, 0.3, num_companies), 4),
+                                       np.round(rng.uniform(0.0, 0.2, num_companies), 4)]),
+    }).to_csv(paths["exposures"], index=False)
+    return paths
+
+
+def _reset_database(loader, engine):
+    loader.clear_database()
+    engine.journal.clear()
+
+
+def _drop_derived_caches(engine):
+    """Keeps the graph snapshot but forces every other per-version result to be recomputed."""
+    engine.get_graph_snapshot()
+    engine.invalidate_cache(keep=("snapshot",))
+
+
+def run_scale(num_edges, repeats, work_dir, render=True, seed=42, backend="memgraph", trace_memory=False) -> dict:
+    """
+    Loads a synthetic graph with `num_edges` OWNS rows into the given backend and times every
+    benchmark on it. The dashboard's direct Cypher and the graph renders need Memgraph and are
+    skipped for the in-memory backend. On Memgraph the blockholder load is first run with the
+    list-of-dicts "records" transport as a reference for the column-batched default.
+    """
+    results = {}
+    num_companies = max(500, num_edges // 200)
+    csv_path = os.path.join(work_dir, f"blockholders_{num_edges}.csv")
+    generate_synthetic_blockholders(output_path=csv_path, num_rows=num_edges, num_companies=num_companies, seed=seed)
+    side_tables = write_side_tables(work_dir, num_companies, seed=seed)
+
+    # The in-memory graph lives in work_dir so benchmark runs never touch the persisted store.
+    persist_dir = os.path.join(work_dir, f"graph_store_{num_edges}")
+    loader = create_loader(backend, persist_dir=persist_dir, checkpoint_dir=os.path.join(work_dir, "load_checkpoints"))
+    engine = create_risk_engine(backend, journal_path=os.path.join(work_dir, "scenario_journal.json"), persist_dir=persist_dir)
+    try:
+        def load_blockholders():
+            loader.load_blockholders(csv_path, chunk_size=config.CHUNK_SIZE, start_year=config.START_YEAR, end_year=config.END_YEAR)
+
+        if backend == "memgraph":
+            transport = loader.transport
+            loader.transport = "records"
+            _reset_database(loader, engine)
+            seconds, peak_mb = time_load(load_blockholders, trace_memory)
+            results["loader.load_blockholders[records]"] = summarize([seconds], rows=loader.last_rows_loaded, peak_mb=peak_mb)
+            loader.transport = transport
+        _reset_database(loader, engine)
+
+        # Loads run once each: repeating them would only measure idempotent MERGEs.
+        loads = [
+            ("loader.load_blockholders", load_blockholders),
+            ("loader.load_enriched_company_metadata", lambda: loader.load_enriched_company_metadata(side_tables["metadata"])),
+            ("loader.load_market_cap_data", lambda: loader.load_market_cap_data(side_tables["market_cap"])),
+            ("loader.load_risk_exposures_from_csv", lambda: loader.load_risk_exposures_from_csv(side_tables["exposures"])),
+        ]
+        for name, load in loads:
+            seconds, peak_mb = time_load(load, trace_memory)
+            results[name] = summarize([seconds], rows=loader.last_rows_loaded, peak_mb=peak_mb)
+        # Unchanged reloads: replacing rewrites every edge, reconciling only diffs against the graph.
+        for mode in ("replace", "reconcile"):
+            reload = lambda: loader.load_risk_exposures_from_csv(side_tables["exposures"], reconcile=mode == "reconcile")
+            results[f"loader.reload_risk_exposures[{mode}]"] = summarize(time_call(reload), rows=loader.last_rows_loaded)
+
+        results["engine.compute_total_risk"] = summarize(time_call(lambda: engine.compute_total_risk(max_iterations=config.MAX_RISK_ITERATIONS), repeats))
+        results["engine.dollarize_risk"] = summarize(time_call(engine.dollarize_risk, repeats))
+        results["engine.get_graph_snapshot"] = summarize(time_call(engine.get_graph_snapshot, repeats, setup=lambda: engine.invalidate_cache(keep=())))
+
+        snapshot = engine.get_graph_snapshot()
+        company_degree = np.bincount(snapshot.owns_company, minlength=snapshot.num_companies)
+        acquirer_id, acquired_id = (snapshot.company_ids[i] for i in np.argsort(company_degree)[::-1][:2])
+        blockholder_degree = np.bincount(snapshot.owns_owner[~snapshot.owns_owner_is_company], minlength=snapshot.num_blockholders)
+        blockholder_id = snapshot.blockholder_ids[int(np.argmax(blockholder_degree))]
+        sector = snapshot.company_sectors[snapshot.company_index[acquirer_id]]
+
+        # Scenarios are rolled back (untimed) after every run so each repeat sees the same graph.
+        scenarios = {
+            "scenario.simulate_acquisition": (lambda: engine.simulate_acquisition(acquirer_id, acquired_id, 0.5), None, 1),
+            "scenario.simulate_divestiture": (lambda: engine.simulate_divestiture(acquirer_id, acquired_id),
+                                              lambda: engine.simulate_acquisition(acquirer_id, acquired_id, 0.5), 2),
+            "scenario.simulate_risk_event": (lambda: engine.simulate_risk_event("Inherent Market Volatility", 1.5, target_sector=sector), None, 1),
+        }
+        for name, (run, setup, undo) in scenarios.items():
+            results[name] = summarize(time_call(run, repeats, setup=setup, teardown=lambda undo=undo: engine.rollback_scenarios(undo)))
+        results["scenario.simulate_contagion"] = summarize(time_call(
+            lambda: engine.simulate_contagion([acquirer_id], capital_ratio=config.CASCADE_CAPITAL_RATIO, max_rounds=config.CASCADE_MAX_ROUNDS),
+            repeats, setup=lambda: _drop_derived_caches(engine)))
+
+        # Analytics page: direct Cypher plus the engine methods it calls, with derived caches cold.
+        def run_query(query):
+            with engine.driver.session() as session:
+                return session.run(query).data()
+        analytics = {}
+        if backend == "memgraph":
+            analytics.update({
+                "analytics.top_companies": lambda: run_query(TOP_COMPANIES_QUERY),
+                "analytics.top_blockholders": lambda: run_query(TOP_BLOCKHOLDERS_QUERY),
+            })
+        analytics.update({
+            "analytics.risk_by_year": engine.compute_risk_by_year,
+            "analytics.risk_aggregates": engine.get_risk_aggregates,
+            "analytics.sector_treemap": lambda: engine.get_sector_treemap(top_n=config.TREEMAP_TOP_N_PER_SECTOR),
+            "analytics.sector_companies": lambda: engine.get_sector_companies(sector, limit=config.SECTOR_DRILLDOWN_LIMIT),
+            "analytics.sector_concentration": lambda: engine.compute_sector_concentration(threshold=config.RISK_CONCENTRATION_THRESHOLD),
+            "analytics.critical_nodes": lambda: engine.get_critical_nodes_by_degree(top_n=config.TOP_N_CRITICAL_NODES),
+            "analytics.risk_statistics": engine.get_risk_statistics,
+            "analytics.blockholder_concentration": engine.compute_blockholder_concentration,
+            "analytics.crowding_clusters": lambda: engine.compute_crowding_clusters(
+                similarity_threshold=config.CROWDING_SIMILARITY_THRESHOLD, min_cluster_size=config.CROWDING_MIN_CLUSTER_SIZE),
+            "analytics.portfolio_var": lambda: engine.compute_portfolio_var(
+                confidence=config.VAR_CONFIDENCE, num_simulations=config.VAR_NUM_SIMULATIONS),
+        })
+        for name, query in analytics.items():
+            results[name] = summarize(time_call(query, repeats, setup=lambda: _drop_derived_caches(engine)))
+
+        if render and backend == "memgraph":
+            results["render.company_graph"] = summarize(time_call(lambda: render_graph_as_html(COMPANY_GRAPH_QUERY, {"company_id": acquirer_id}), repeats))
+            results["render.blockholder_graph"] = summarize(time_call(lambda: render_graph_as_html(BLOCKHOLDER_GRAPH_QUERY, {"blockholder_id": blockholder_id}), repeats))
+    finally:
+        loader.close()
+        engine.close()
+    return results
+
+
+def compare_runs(current, previous, threshold=0.25, min_seconds=0.05) -> list:
+    """
+    Benchmarks whose p50 or p95 grew by more than `threshold` (relative) and `min_seconds`
+    (absolute) versus a previous run, matched by scale and benchmark name.
+    """
+    regressions = []
+    for scale, benchmarks in current["scales"].items():
+        previous_benchmarks = previous.get("scales", {}).get(scale, {})
+        for name, stats in benchmarks.items():
+            base = previous_benchmarks.get(name)
+            if base is None:
+                continue
+            for metric in ("p50", "p95"):
+                delta = stats[metric] - base[metric]
+                if delta > min_seconds and stats[metric] > base[metric] * (1 + threshold):
+                    regressions.append({"scale": scale, "benchmark": name, "metric": metric,
+                                        "previous": base[metric], "current": stats[metric],
+                                        "change_pct": 100.0 * delta / base[metric] if base[metric] else None})
+    return regressions
+
+
+def print_summary(report):
+    for scale, benchmarks in report["scales"].items():
+        print(f"\n=== {scale} edges ===")
+        print(f"{'benchmark':45s} {'p50 (s)':>10s} {'p95 (s)':>10s} {'rows/s':>12s} {'peak MB':>10s}")
+        for name, stats in benchmarks.items():
+            throughput = f"{stats['rows_per_second']:.0f}" if stats.get("rows_per_second") else ""
+            peak = f"{stats['peak_traced_mb']:.1f}" if stats.get("peak_traced_mb") is not None else ""
+            print(f"{name:45s} {stats['p50']:10.4f} {stats['p95']:10.4f} {throughput:>12s} {peak:>10s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the loader, risk engine, scenarios, analytics queries and graph rendering.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(config.BENCHMARK_SCALES), help="Synthetic graph sizes in OWNS edges.")
+    parser.add_argument("--repeats", type=int, default=config.BENCHMARK_REPEATS, help="Timed runs per benchmark (loads always run once).")
+    parser.add_argument("--output", default=config.BENCHMARK_REPORT, help="Where to write the JSON results.")
+    parser.add_argument("--compare", metavar="PREVIOUS_JSON", default=None, help="Previous results to compare against; exits 1 on regressions.")
+    parser.add_argument("--threshold", type=float, default=config.BENCHMARK_REGRESSION_THRESHOLD, help="Relative p50/p95 increase flagged as a regression.")
+    parser.add_argument("--no-render", action="store_true", help="Skip the render_graph_as_html benchmarks.")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record the peak Python heap (tracemalloc) of each load; slows the loads down.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=BACKENDS, default=config.GRAPH_BACKEND, help="Graph store to benchmark.")
+    args = parser.parse_args()
+
+    report = {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "backend": args.backend,
+        "memgraph_uri": config.MEMGRAPH_URI,
+        "repeats": args.repeats,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="risk_benchmark_") as work_dir:
+        for scale in args.scales:
+            print(f"\n--- Benchmarking synthetic graph with {scale} OWNS edges ---")
+            report["scales"][str(scale)] = run_scale(scale, args.repeats, work_dir, render=not args.no_render,
+                                                 seed=args.seed, backend=args.backend, trace_memory=args.trace_memory)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_summary(report)
+    print(f"\n--- Benchmark results written to {args.output} ---")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare_runs(report, previous, threshold=args.threshold)
+        for r in regressions:
+            print(f"REGRESSION [{r['scale']} edges] {r['benchmark']} {r['metric']}: {r['previous']:.4f}s -> {r['current']:.4f}s ({r['change_pct']:+.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No benchmark regressed more than {args.threshold:.0%} against {args.compare}.")
+
+
+if __name__ == "__main__":
+    main()
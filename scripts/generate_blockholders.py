@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+COLUMNS = ["blockholder_CIK", "blockholder_name", "company_CIK", "company_name",
+           "position", "year", "block_type", "files_13F"]
+BLOCK_TYPES = np.array(["Institution", "Hedge Fund", "Individual", "Pension Fund", "Insider"], dtype=object)
+BLOCK_TYPE_WEIGHTS = np.array([0.55, 0.2, 0.1, 0.1, 0.05])
+CORPORATE_BLOCK_TYPE = "Corporation"
+
+# CIK ranges keep issuers and non-corporate holders disjoint; corporate holders reuse issuer CIKs.
+COMPANY_CIK_BASE = 1_000_000
+BLOCKHOLDER_CIK_BASE = 5_000_000
+
+
+def _power_law_cdf(n, exponent, rng):
+    """CDF of a Zipf-like popularity (rank^-exponent) over n entities in a random rank order."""
+    weights = np.arange(1, n + 1, dtype=float) ** -exponent
+    rng.shuffle(weights)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def _sample(cdf, size, rng):
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), len(cdf) - 1)
+
+
+# Positions are drawn in basis points on [5%, 100%] so they can be formatted by table lookup.
+MIN_POSITION_BP, MAX_POSITION_BP = 500, 10000
+POSITION_STRINGS = np.array([f"{bp / 100:.2f}," for bp in range(MIN_POSITION_BP, MAX_POSITION_BP + 1)], dtype=object)
+
+
+def _position_index(size, rng):
+    """5% blockholder threshold plus an exponential tail (mean ~9%), capped at 100%."""
+    return np.minimum(np.round(rng.exponential(400.0, size)).astype(np.int64), MAX_POSITION_BP - MIN_POSITION_BP)
+
+
+def _write_rows(f, owner_prefix, owner_suffix, company_prefix, position_index, year_strings):
+    """
+    Writes CSV lines assembled from pre-formatted per-entity fragments. Formatting every
+    entity once and concatenating object arrays is several times faster than DataFrame.to_csv.
+    """
+    lines = owner_prefix + company_prefix + POSITION_STRINGS[position_index] + year_strings + owner_suffix
+    f.write("".join(lines.tolist()))
+    return len(lines)
+
+
+def generate_synthetic_blockholders(output_path=None, num_rows=1_000_000, num_blockholders=None,
+                                    num_companies=None, start_year=None, end_year=None,
+                                    holder_exponent=0.9, company_exponent=0.7,
+                                    cross_holding_fraction=0.01, seed=42, chunk_size=1_000_000):
+    """
+    Streams a synthetic blockholders.csv in the schema load_blockholders() reads, for load testing.
+
+    Holder fan-out and company popularity follow power laws, so a few blockholders own thousands
+    of positions while most own a handful. About `cross_holding_fraction` of the rows are
+    corporate cross-holdings (block_type "Corporation") whose holder CIK is an issuer CIK; a ring
+    over the corporate holders guarantees ownership cycles. Rows are generated and appended in
+    vectorized chunks, so memory is bounded by `chunk_size` regardless of `num_rows`.
+    Returns the number of rows written.
+    """
+    output_path = output_path or config.SYNTHETIC_BLOCKHOLDERS_CSV
+    start_year = config.START_YEAR if start_year is None else start_year
+    end_year = config.END_YEAR if end_year is None else end_year
+    num_blockholders = num_blockholders or max(1000, num_rows // 20)
+    num_companies = num_companies or max(500, num_rows // 200)
+    print(f"--- Generating {num_rows} synthetic blockholder rows "
+          f"({num_blockholders} holders, {num_companies} companies, {start_year}-{end_year}) ---")
+    started = time.perf_counter()
+
+    rng = np.random.default_rng(seed)
+    holder_cdf = _power_law_cdf(num_blockholders, holder_exponent, rng)
+    company_cdf = _power_law_cdf(num_companies, company_exponent, rng)
+
+    # "CIK,name," fragments for both CSV column pairs, and ",block_type,files_13F" line endings.
+    company_prefix = np.array([f"{cik},Company_{cik}," for cik in COMPANY_CIK_BASE + np.arange(num_companies)], dtype=object)
+    holder_prefix = np.array([f"{cik},Blockholder_{cik}," for cik in BLOCKHOLDER_CIK_BASE + np.arange(num_blockholders)], dtype=object)
+    holder_types = BLOCK_TYPES[rng.choice(len(BLOCK_TYPES), size=num_blockholders, p=BLOCK_TYPE_WEIGHTS)]
+    holder_suffix = np.array([f",{t},{int(t != 'Individual')}\n" for t in holder_types], dtype=object)
+    year_strings = np.array([str(y) for y in range(start_year, end_year + 1)], dtype=object)
+
+    # Corporate holders: a random subset of issuers. The ring (k holds k+1) is written first so
+    # every generated file contains cycles even when the random cross-holdings happen not to.
+    num_corporate = max(2, min(num_companies, int(np.sqrt(num_rows * cross_holding_fraction)) + 1))
+    corporate = rng.choice(num_companies, size=num_corporate, replace=False)
+    num_cross = int(num_rows * cross_holding_fraction)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    written = 0
+    with open(output_path, "w", newline="") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        if num_cross:
+            ring_size = min(num_corporate, num_cross)
+            ring_owner = corporate[:ring_size]
+            ring_target = np.roll(corporate[:ring_size], -1)
+            rand_owner = corporate[rng.integers(0, num_corporate, num_cross - ring_size)]
+            rand_target = _sample(company_cdf, num_cross - ring_size, rng)
+            owner = np.concatenate([ring_owner, rand_owner])
+            target = np.concatenate([ring_target, rand_target])
+            # Drop self-holdings produced by the random draw.
+            keep = owner != target
+            owner, target = owner[keep], target[keep]
+            written += _write_rows(f, company_prefix[owner], f",{CORPORATE_BLOCK_TYPE},0\n", company_prefix[target],
+                                   _position_index(len(owner), rng), year_strings[rng.integers(0, len(year_strings), len(owner))])
+
+        remaining = num_rows - written
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            holder = _sample(holder_cdf, size, rng)
+            company = _sample(company_cdf, size, rng)
+            written += _write_rows(f, holder_prefix[holder], holder_suffix[holder], company_prefix[company],
+                                   _position_index(size, rng), year_strings[rng.integers(0, len(year_strings), size)])
+            remaining -= size
+            print(f"INFO: Wrote {written}/{num_rows} rows ({time.perf_counter() - started:.1f}s)")
+
+    print(f"--- Generated synthetic blockholders: {output_path} ({written} rows in {time.perf_counter() - started:.1f}s) ---")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic blockholders.csv for load testing.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of ownership rows to write.")
+    parser.add_argument("--blockholders", type=int, default=None, help="Number of distinct blockholders (default rows/20).")
+    parser.add_argument("--companies", type=int, default=None, help="Number of distinct companies (default rows/200).")
+    parser.add_argument("--start-year", type=int, default=config.START_YEAR)
+    parser.add_argument("--end-year", type=int, default=config.END_YEAR)
+    parser.add_argument("--holder-exponent", type=float, default=0.9, help="Power-law exponent of holder fan-out.")
+    parser.add_argument("--company-exponent", type=float, default=0.7, help="Power-law exponent of company popularity.")
+    parser.add_argument("--cross-holdings", type=float, default=0.01, help="Fraction of rows that are Company -> Company holdings.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--output", default=config.SYNTHETIC_BLOCKHOLDERS_CSV,
+                        help="Output path. Pass config.BLOCKHOLDERS_CSV's path explicitly to feed the pipeline.")
+    args = parser.parse_args()
+    generate_synthetic_blockholders(
+        output_path=args.output, num_rows=args.rows, num_blockholders=args.blockholders,
+        num_companies=args.companies, start_year=args.start_year, end_year=args.end_year,
+        holder_exponent=args.holder_exponent, company_exponent=args.company_exponent,
+        cross_holding_fraction=args.cross_holdings, seed=args.seed, chunk_size=args.chunk_size,
+    )
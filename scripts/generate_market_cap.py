@@ -5,6 +5,7 @@ import numpy as np
 import random
 from dotenv import load_dotenv
 import config
+from modules.market_data import MarketCapStore
 
 # Load environment variables
 load_dotenv()
@@ -52,5 +53,38 @@ def generate_market_cap_data():
     market_cap_df.to_csv(OUTPUT_MARKET_CAP_CSV, index=False)
     print(f"--- Generated Market Cap Data: {OUTPUT_MARKET_CAP_CSV} ({len(market_cap_df)} entries) ---")
 
+def generate_market_cap_history(days=None, end_date=None, chunk_size=50000):
+    """
+    Generates a daily market cap history for every company in market_cap.csv as a
+    memory-mapped company x date store. Each series is a seeded geometric random walk
+    that ends at the company's current (static) market cap; companies are written in
+    vectorized chunks so memory stays bounded.
+    """
+    print("--- Starting Market Cap History Generation ---")
+    days = days or config.MARKET_CAP_HISTORY_DAYS
+
+    try:
+        market_cap_df = pd.read_csv(OUTPUT_MARKET_CAP_CSV)
+    except FileNotFoundError:
+        print(f"ERROR: {OUTPUT_MARKET_CAP_CSV} not found. Run generate_market_cap_data() first.")
+        return
+
+    dates = pd.bdate_range(end=end_date or pd.Timestamp.today().normalize(), periods=days)
+    company_ids = market_cap_df['company_id_graph'].astype(str).tolist()
+    current_caps = market_cap_df['market_cap'].to_numpy(dtype=float)
+    store = MarketCapStore.create(config.MARKET_CAP_HISTORY_DIR, company_ids, dates)
+
+    rng = np.random.default_rng(42)
+    daily_vol = 0.02
+    for start in range(0, len(company_ids), chunk_size):
+        end = min(start + chunk_size, len(company_ids))
+        log_returns = rng.normal(-0.5 * daily_vol ** 2, daily_vol, size=(end - start, days - 1))
+        # Cumulative log return from each date to the last date, so the series ends at today's cap.
+        to_last = np.concatenate([np.cumsum(log_returns[:, ::-1], axis=1)[:, ::-1], np.zeros((end - start, 1))], axis=1)
+        store.values[start:end] = current_caps[start:end, None] * np.exp(-to_last)
+    store.flush()
+    print(f"--- Generated Market Cap History: {config.MARKET_CAP_HISTORY_DIR} ({len(company_ids)} companies x {days} days) ---")
+
 if __name__ == "__main__":
-    generate_market_cap_data()
\ No newline at end of file
+    generate_market_cap_data()
+    generate_market_cap_history()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.graph_backend import create_loader, create_risk_engine
+from scripts.benchmark import write_side_tables
+from scripts.generate_blockholders import generate_synthetic_blockholders
+
+NUM_ROWS = 5000
+NUM_COMPANIES = 300
+START_YEAR, END_YEAR = 2000, 2030
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    """Synthetic blockholders.csv plus the metadata, market cap and exposure CSVs for its companies."""
+    directory = tmp_path_factory.mktemp("dataset")
+    paths = write_side_tables(str(directory), NUM_COMPANIES, seed=1)
+    paths["blockholders"] = str(directory / "blockholders.csv")
+    generate_synthetic_blockholders(paths["blockholders"], num_rows=NUM_ROWS, num_companies=NUM_COMPANIES, seed=1)
+    return paths
+
+
+@pytest.fixture
+def persist_dir(tmp_path):
+    return str(tmp_path / "graph_store")
+
+
+@pytest.fixture
+def loader(persist_dir):
+    loader = create_loader("memory", persist_dir=persist_dir)
+    yield loader
+    loader.close()
+
+
+@pytest.fixture
+def engine(persist_dir, tmp_path):
+    engine = create_risk_engine("memory", journal_path=str(tmp_path / "scenario_journal.json"), persist_dir=persist_dir)
+    yield engine
+    engine.close()
+
+
+@pytest.fixture
+def loaded(dataset, loader, engine):
+    """(loader, engine) over a freshly loaded graph with total and dollarized risk computed."""
+    loader.clear_database()
+    engine.journal.clear()
+    loader.load_blockholders(dataset["blockholders"], chunk_size=1000, start_year=START_YEAR, end_year=END_YEAR)
+    loader.load_enriched_company_metadata(dataset["metadata"])
+    loader.load_market_cap_data(dataset["market_cap"])
+    loader.load_risk_exposures_from_csv(dataset["exposures"])
+    engine.compute_total_risk()
+    engine.dollarize_risk()
+    return loader, engine
+
+
+@pytest.fixture
+def tiny(tmp_path):
+    """
+    (loader, engine) over a hand-sized graph whose risk can be worked out by hand:
+
+        B_1 --10%--> C_1 (Tech, NY, cap 100; F1 0.5, F2 0.1)   direct 0.6, dollarized 60
+        B_1 --20%--> C_2 (Tech, CA, cap 200; F1 0.2)           direct 0.2, dollarized 40
+        B_2 --50%--> C_2
+        B_2 --40%--> C_3 (Energy, NY, cap 50; F2 0.4)          direct 0.4, dollarized 20
+        B_3 --5%---> C_1
+
+    Blockholder dollarized risk: B_1 14, B_2 28, B_3 3; risk factors: F1 38, F2 14.
+    B_1 held 30% of C_1 in 2022 (10% in 2023).
+    """
+    rows = [(1, 1, 30.0, 2022), (1, 1, 10.0, 2023), (1, 2, 20.0, 2023), (2, 2, 50.0, 2023), (2, 3, 40.0, 2023), (3, 1, 5.0, 2023)]
+    paths = {name: str(tmp_path / f"{name}.csv") for name in ("blockholders", "metadata", "market_cap", "exposures")}
+    pd.DataFrame({
+        "blockholder_CIK": [r[0] for r in rows], "blockholder_name": [f"Holder {r[0]}" for r in rows],
+        "company_CIK": [r[1] for r in rows], "company_name": [f"Company {r[1]}" for r in rows],
+        "position": [r[2] for r in rows], "year": [r[3] for r in rows], "block_type": "Institution", "files_13F": 1,
+    }).to_csv(paths["blockholders"], index=False)
+    pd.DataFrame({"company_id_graph": ["C_1", "C_2", "C_3"], "sector": ["Tech", "Tech", "Energy"],
+                  "location": ["NY", "CA", "NY"], "volatility": [0.5, 0.2, 0.3]}).to_csv(paths["metadata"], index=False)
+    pd.DataFrame({"company_id_graph": ["C_1", "C_2", "C_3"], "market_cap": [100.0, 200.0, 50.0]}).to_csv(paths["market_cap"], index=False)
+    pd.DataFrame({"company_id": ["C_1", "C_1", "C_2", "C_3"], "risk_factor": ["F1", "F2", "F1", "F2"],
+                  "risk_weight": [0.5, 0.1, 0.2, 0.4]}).to_csv(paths["exposures"], index=False)
+
+    persist_dir = str(tmp_path / "tiny_graph_store")
+    loader = create_loader("memory", persist_dir=persist_dir)
+    engine = create_risk_engine("memory", journal_path=str(tmp_path / "tiny_journal.json"), persist_dir=persist_dir)
+    loader.clear_database()
+    loader.load_blockholders(paths["blockholders"], chunk_size=2, start_year=START_YEAR, end_year=END_YEAR)
+    loader.load_enriched_company_metadata(paths["metadata"])
+    loader.load_market_cap_data(paths["market_cap"])
+    loader.load_risk_exposures_from_csv(paths["exposures"])
+    engine.compute_total_risk()
+    engine.dollarize_risk()
+    yield loader, engine
+    engine.close()
+    loader.close()
@@ -0,0 +1,48 @@
+import numpy as np
+
+from modules.co_ownership import Bitset
+
+
+def ids(rows):
+    return sorted(row["id"] for row in rows)
+
+
+def test_bitset_operations_match_python_sets():
+    rng = np.random.default_rng(0)
+    universe = 640
+    # 5 members stay a sorted array; 100 members (> universe/32) switch to a bitmap.
+    samples = [set(rng.choice(universe, size, replace=False).tolist()) for size in (5, 100, 8, 300)]
+    bitsets = [Bitset.from_indices(sorted(s), universe) for s in samples]
+    assert [b.bitmap is not None for b in bitsets] == [False, True, False, True]
+    for a, sa in zip(bitsets, samples):
+        assert set(a.indices().tolist()) == sa and len(a) == len(sa)
+        for b, sb in zip(bitsets, samples):
+            assert set((a & b).indices().tolist()) == sa & sb
+            assert set((a | b).indices().tolist()) == sa | sb
+
+
+def test_questions_on_the_hand_sized_graph(tiny):
+    loader, engine = tiny
+    assert ids(engine.get_common_holders(["C_1", "C_2"])) == ["B_1"]
+    assert ids(engine.get_any_holders(["C_1", "C_3"])) == ["B_1", "B_2", "B_3"]
+    assert ids(engine.get_common_holdings(["B_1", "B_2"])) == ["C_2"]
+    assert engine.get_common_holders(["C_1", "C_unknown"]) == []
+    assert engine.get_co_ownership_overlap("C_1", "C_2") == {"shared": 1, "first": 2, "second": 2, "jaccard": 1 / 3}
+
+    answer = engine.answer_co_ownership_question("Which blockholders own both Company 2 and Company 3?")
+    assert answer["operation"] == "common_holders"
+    assert [e["id"] for e in answer["entities"]] == ["C_2", "C_3"] and ids(answer["results"]) == ["B_2"]
+
+
+def test_intersections_match_the_snapshot_edges(loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    holders = {}
+    for owner, company, is_company in zip(snap.owns_owner.tolist(), snap.owns_company.tolist(), snap.owns_owner_is_company.tolist()):
+        if not is_company:
+            holders.setdefault(snap.company_ids[company], set()).add(snap.blockholder_ids[owner])
+    busiest = sorted(holders, key=lambda c: -len(holders[c]))[:4]
+    for first in busiest:
+        for second in busiest:
+            assert ids(engine.get_common_holders([first, second])) == sorted(holders[first] & holders[second])
+            assert ids(engine.get_any_holders([first, second])) == sorted(holders[first] | holders[second])
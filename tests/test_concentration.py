@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_hhi_against_hand_computed_shares(tiny):
+    loader, engine = tiny
+    frame = engine.compute_blockholder_concentration().set_index("id")
+    # B_1 look-through risk: C_1 10% of 60 = 6 (Tech, NY), C_2 20% of 40 = 8 (Tech, CA).
+    assert frame.loc["B_1", ["hhi_sector", "top_sector", "top_sector_share"]].tolist() == [pytest.approx(1.0), "Tech", pytest.approx(1.0)]
+    assert frame.loc["B_1", "hhi_location"] == pytest.approx((6 ** 2 + 8 ** 2) / 14 ** 2)
+    assert (frame.loc["B_1", "top_location"], frame.loc["B_1", "top_location_share"]) == ("CA", pytest.approx(8 / 14))
+    # B_1 factor contributions P * market_cap * weight: F1 0.1*100*0.5 + 0.2*200*0.2 = 13, F2 0.1*100*0.1 = 1.
+    assert frame.loc["B_1", "hhi_risk_factor"] == pytest.approx((13 ** 2 + 1) / 14 ** 2)
+    assert (frame.loc["B_1", "top_risk_factor"], frame.loc["B_1", "top_risk_factor_share"]) == ("F1", pytest.approx(13 / 14))
+    # B_2: C_2 50% of 40 = 20 (Tech), C_3 40% of 20 = 8 (Energy).
+    assert frame.loc["B_2", "hhi_sector"] == pytest.approx((20 ** 2 + 8 ** 2) / 28 ** 2)
+    assert frame.loc["B_2", "top_sector"] == "Tech"
+    assert frame.loc["B_3", "hhi_risk_factor"] == pytest.approx((2.5 ** 2 + 0.5 ** 2) / 3 ** 2)
+
+
+def test_sector_hhi_matches_pandas(loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    mask = ~snap.owns_owner_is_company
+    edges = pd.DataFrame({
+        "blockholder": np.array(snap.blockholder_ids, dtype=object)[snap.owns_owner[mask]],
+        "sector": pd.Series(snap.company_sectors, dtype=object).fillna("N/A").to_numpy()[snap.owns_company[mask]],
+        "risk": snap.owns_percent[mask] * snap.company_dollarized_risk[snap.owns_company[mask]],
+    })
+    by_sector = edges.groupby(["blockholder", "sector"])["risk"].sum()
+    by_sector = by_sector[by_sector > 0]
+    shares = by_sector / by_sector.groupby(level="blockholder").transform("sum")
+    expected = (shares ** 2).groupby(level="blockholder").sum()
+
+    frame = engine.compute_blockholder_concentration().set_index("id")
+    assert np.allclose(frame.loc[expected.index, "hhi_sector"], expected)
+    assert (frame.drop(expected.index)["hhi_sector"] == 0).all()
+    assert frame["top_sector_share"].between(0, 1).all()
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from modules.contagion import impact_matrix, simulate_cascade
+
+
+def losses(result):
+    return {row["id"]: (row["loss"], row["first_distressed_round"], row["default_round"]) for row in result["top_losses"]}
+
+
+def test_cascade_on_hand_computed_holdings(tiny):
+    loader, engine = tiny
+    result = engine.simulate_contagion("C_2")
+    # B_1 holds 10 of C_1 and 40 of C_2 (value 50); B_2 holds 100 of C_2 and 20 of C_3 (value 120).
+    assert losses(result) == {"C_2": (pytest.approx(200.0), 0, 0), "B_2": (pytest.approx(100.0), 1, -1),
+                              "B_1": (pytest.approx(40.0), 1, -1)}
+    assert result["converged"] and result["systemic_impact"] == 0.0
+    assert (result["num_distressed"], result["num_defaulted"]) == (3, 1)
+
+
+def test_cascade_travels_through_cross_holdings(tiny):
+    loader, engine = tiny
+    assert engine.simulate_acquisition("C_1", "C_2", 0.5)
+    result = engine.simulate_contagion(["C_2"])
+    # The acquisition replaces C_2's holders, so C_1's stake in C_2 (100) is C_1's whole value: C_1 defaults in
+    # round 1 and C_1's holders B_1 and B_3 (now invested only in C_1) default in round 2.
+    rows = losses(result)
+    assert set(rows) == {"C_2", "C_1", "B_1", "B_3"}
+    assert rows["C_1"] == (pytest.approx(100.0), 1, 1)
+    assert rows["B_1"] == (pytest.approx(10.0), 2, 2) and rows["B_3"] == (pytest.approx(5.0), 2, 2)
+    assert result["systemic_impact"] == pytest.approx(100.0 / 350.0)
+
+
+def test_partial_shock_is_linear_before_capping(loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    W, value = impact_matrix(snap)
+    target = snap.company_ids[int(np.argmax(snap.market_cap))]
+    small = simulate_cascade(snap, {target: 0.001}, W=W, value=value)
+    double = simulate_cascade(snap, {target: 0.002}, W=W, value=value)
+    assert small["converged"] and double["converged"]
+    assert np.allclose(double["loss"], 2 * small["loss"])
+    assert small["initial_loss"] == pytest.approx(0.001 * snap.market_cap.max())
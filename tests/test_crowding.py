@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from modules.crowding import crowding_clusters, lsh_candidate_pairs, minhash_signatures
+from modules.graph_snapshot import GraphSnapshot
+
+
+def snapshot(holdings, num_companies):
+    """Snapshot with blockholder B_i holding 10% of every company in holdings[i] and dollarized risk i."""
+    companies = [{"id": f"C_{c}", "name": f"C_{c}", "sector": None, "location": None, "market_cap": 1.0,
+                  "total_risk": 0.0, "dollarized_risk": 0.0} for c in range(num_companies)]
+    blockholders = [{"id": f"B_{b}", "name": f"B_{b}", "total_risk": 0.0, "dollarized_risk": float(b)}
+                    for b in range(len(holdings))]
+    owns = [{"owner_id": f"B_{b}", "owner_is_company": False, "company_id": f"C_{c}", "percent": 0.1, "year": 2023}
+            for b, held in enumerate(holdings) for c in held]
+    return GraphSnapshot(companies, blockholders, [], owns, [])
+
+
+def test_minhash_estimates_jaccard_similarity():
+    rows = [set(range(0, 60)), set(range(20, 80)), set(range(60, 120)), set()]
+    holdings = sp.csr_matrix((np.ones(180), ([r for r, s in enumerate(rows) for _ in s], [c for s in rows for c in sorted(s)])),
+                             shape=(4, 120))
+    signatures = minhash_signatures(holdings, num_hashes=512, max_nnz_per_batch=50)
+    estimate = lambda i, j: (signatures[i] == signatures[j]).mean()
+    assert estimate(0, 1) == pytest.approx(0.5, abs=0.08)  # 40 shared of 80
+    assert estimate(0, 2) == 0.0
+    assert (signatures[3] == np.iinfo(np.uint32).max).all()
+
+
+def test_lsh_pairs_rows_sharing_a_band():
+    signatures = np.array([[1, 2, 3, 4], [1, 2, 9, 9], [7, 7, 3, 4], [5, 6, 7, 8], [5, 6, 7, 8]], dtype=np.uint32)
+    assert lsh_candidate_pairs(signatures, bands=2).tolist() == [[0, 1], [0, 2], [3, 4]]
+    # Buckets above max_bucket_size only chain consecutive members.
+    same = np.zeros((4, 4), dtype=np.uint32)
+    assert lsh_candidate_pairs(same, bands=2, max_bucket_size=3).tolist() == [[0, 1], [1, 2], [2, 3]]
+    assert len(lsh_candidate_pairs(same, bands=2, max_bucket_size=4)) == 6
+
+
+def test_planted_crowds_are_recovered():
+    rng = np.random.default_rng(1)
+    crowd_a, crowd_b = list(range(0, 8)), list(range(8, 16))
+    holdings = [crowd_a] * 5 + [crowd_b] * 4 + [crowd_a[:1]]
+    holdings += [rng.choice(np.arange(16, 200), 4, replace=False).tolist() for _ in range(20)]
+    clusters = crowding_clusters(snapshot(holdings, 200), similarity_threshold=0.8, min_cluster_size=3)
+
+    members = [sorted(int(m["id"][2:]) for m in c["members"]) for c in clusters]
+    # Largest aggregate dollarized risk first: crowd B (5+6+7+8) before crowd A (0+1+2+3+4).
+    assert members == [[5, 6, 7, 8], [0, 1, 2, 3, 4]]
+    assert [c["dollarized_risk"] for c in clusters] == [26.0, 10.0]
+    assert clusters[1]["mean_similarity"] == 1.0
+    assert {h["id"] for h in clusters[1]["top_holdings"]} <= {f"C_{c}" for c in crowd_a}
+    assert all(h["holders"] == 5 for h in clusters[1]["top_holdings"])
+
+
+def test_single_holdings_are_left_out(tiny):
+    loader, engine = tiny
+    # B_3 holds only C_1, below min_holdings, so it stays a cluster of its own even at threshold 0.
+    clusters = engine.compute_crowding_clusters(similarity_threshold=0.0, min_cluster_size=1)
+    assert sorted(m["id"] for c in clusters for m in c["members"]) == ["B_1", "B_2", "B_3"]
+    (alone,) = [c for c in clusters if any(m["id"] == "B_3" for m in c["members"])]
+    assert (alone["size"], alone["dollarized_risk"], alone["mean_similarity"]) == (1, pytest.approx(3.0), 0.0)
@@ -0,0 +1,56 @@
+import threading
+
+from modules import db_loader
+from modules.risk_engine import RiskEngine
+
+
+class TokenEngine(RiskEngine):
+    """RiskEngine whose graph token is a plain attribute, counting how often it is read."""
+    def __init__(self, journal_path):
+        self.token = "a"
+        self.token_reads = 0
+        self._init_state(journal_path)
+
+    def _read_graph_token(self):
+        self.token_reads += 1
+        return self.token
+
+
+def test_token_is_read_once_per_ttl_and_after_local_writes(tmp_path, monkeypatch):
+    engine = TokenEngine(str(tmp_path / "journal.json"))
+    for _ in range(50):
+        assert engine._cached("value", lambda: 1) == 1
+    assert engine.token_reads == 1
+
+    engine.token = "b"
+    assert engine._cached("value", lambda: 2) == 1  # another process's write, still within the TTL
+    monkeypatch.setattr(db_loader, "_local_graph_writes", db_loader._local_graph_writes + 1)
+    assert engine._cached("value", lambda: 2) == 2
+    assert engine.token_reads == 2
+
+
+def test_builds_run_outside_the_cache_lock(tmp_path):
+    engine = TokenEngine(str(tmp_path / "journal.json"))
+    engine._cached("fast", lambda: "cached")
+    started, release = threading.Event(), threading.Event()
+    builds = []
+
+    def slow_build():
+        builds.append(1)
+        started.set()
+        release.wait(5)
+        return "slow"
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(engine._cached("slow", slow_build)))
+    owner.start()
+    started.wait(5)
+    # Cache hits on other keys are served while "slow" builds; callers of "slow" wait for it.
+    assert engine._cached("fast", lambda: "rebuilt") == "cached"
+    waiters = [threading.Thread(target=lambda: results.append(engine._cached("slow", slow_build))) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    release.set()
+    for thread in [owner] + waiters:
+        thread.join(5)
+    assert results == ["slow"] * 4 and len(builds) == 1
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.graph_backend import InMemoryLoader
+from modules.graph_store import InMemoryGraph
+
+
+def reference_risk(dataset):
+    """Total and dollarized risk per node computed straight from the CSVs with pandas."""
+    rows = pd.read_csv(dataset["blockholders"]).dropna(subset=["blockholder_CIK", "company_CIK", "year"])
+    rows["blockholder"] = "B_" + rows["blockholder_CIK"].astype(str).str.strip()
+    rows["company"] = "C_" + rows["company_CIK"].astype(str).str.strip()
+    rows["percent"] = pd.to_numeric(rows["position"], errors="coerce") / 100.0
+    # Each OWNS edge keeps the percent of its latest year (the last row wins within a year).
+    percent = rows.sort_values("year", kind="stable").groupby(["blockholder", "company"])["percent"].last()
+
+    exposures = pd.read_csv(dataset["exposures"])
+    market_cap = pd.read_csv(dataset["market_cap"]).set_index("company_id_graph")["market_cap"]
+    company_total = exposures.groupby("company_id")["risk_weight"].sum()
+    company_dollars = company_total * market_cap.reindex(company_total.index).fillna(0.0)
+
+    owned = percent.index.get_level_values("company")
+    blockholder_total = (percent * company_total.reindex(owned).fillna(0.0).to_numpy()).groupby(level="blockholder").sum()
+    blockholder_dollars = (percent * company_dollars.reindex(owned).fillna(0.0).to_numpy()).groupby(level="blockholder").sum()
+    factor_dollars = (exposures["risk_weight"] * company_dollars.reindex(exposures["company_id"]).fillna(0.0).to_numpy()
+                      ).groupby(exposures["risk_factor"]).sum()
+    return {"company_total": company_total, "company_dollars": company_dollars, "blockholder_total": blockholder_total,
+            "blockholder_dollars": blockholder_dollars, "factor_dollars": factor_dollars}
+
+
+def node_values(table, column) -> pd.Series:
+    return pd.Series(np.asarray(table[column], dtype=float), index=pd.Index(table.ids, dtype=object))
+
+
+def graph_state(graph):
+    """Everything a scenario or reload may change, in a comparable form."""
+    snap = graph.snapshot()
+    edges = sorted(zip(snap.owns_owner_is_company.tolist(), snap.owns_owner.tolist(), snap.owns_company.tolist(),
+                       np.nan_to_num(snap.owns_percent).tolist()))
+    history = sorted(zip(snap.owns_owner[snap.owns_history_edge].tolist(), snap.owns_company[snap.owns_history_edge].tolist(),
+                         snap.owns_history_year.tolist(), snap.owns_history_percent.tolist()))
+    return edges, history, snap.exposure_weight.tolist(), list(graph.companies["role"]), list(graph.companies["market_cap"])
+
+
+def test_loader_initializes_base_state(loader):
+    assert isinstance(loader, InMemoryLoader)
+    assert loader.transport == "columns"
+    assert loader.last_rows_loaded == 0 and loader.last_delta is None
+    assert loader.checkpoint_dir.endswith("load_checkpoints")
+
+
+def test_risk_matches_pandas_reference(dataset, loaded):
+    loader, engine = loaded
+    reference = reference_risk(dataset)
+    graph = engine.graph
+
+    company_total = node_values(graph.companies, "total_risk")
+    pd.testing.assert_series_equal(company_total.reindex(reference["company_total"].index), reference["company_total"],
+                                   check_names=False, check_index_type=False)
+    company_dollars = node_values(graph.companies, "dollarized_risk")
+    assert np.allclose(company_dollars.reindex(reference["company_dollars"].index), reference["company_dollars"])
+
+    for column, key in (("total_risk", "blockholder_total"), ("dollarized_risk", "blockholder_dollars")):
+        actual = node_values(graph.blockholders, column).reindex(reference[key].index)
+        assert np.allclose(actual, reference[key]), column
+    factor_dollars = node_values(graph.risk_factors, "dollarized_risk").reindex(reference["factor_dollars"].index)
+    assert np.allclose(factor_dollars, reference["factor_dollars"])
+
+
+@pytest.mark.parametrize("scenario", ["acquisition", "divestiture", "risk_event", "all"])
+def test_scenarios_roll_back(loaded, scenario):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    acquirer, target = snap.company_ids[0], snap.company_ids[1]
+    before = graph_state(engine.graph)
+    dollars_before = engine.graph.blockholders["dollarized_risk"].copy()
+
+    applied = 0
+    if scenario in ("acquisition", "divestiture", "all"):
+        assert engine.simulate_acquisition(acquirer, target, 0.5)
+        applied += 1
+    if scenario in ("divestiture", "all"):
+        assert engine.simulate_divestiture(acquirer, target)
+        applied += 1
+    if scenario in ("risk_event", "all"):
+        assert engine.simulate_risk_event("Inherent Market Volatility", 2.0, target_sector=snap.company_sectors[0]) > 0
+        applied += 1
+    engine.compute_total_risk()
+    engine.dollarize_risk()
+    assert graph_state(engine.graph) != before
+    assert len(engine.list_scenarios()) == applied
+
+    assert engine.rollback_scenarios(applied) == applied
+    engine.compute_total_risk()
+    engine.dollarize_risk()
+    assert graph_state(engine.graph) == before
+    assert np.allclose(engine.graph.blockholders["dollarized_risk"], dollars_before)
+    assert engine.list_scenarios() == []
+
+
+def test_rollback_replay_is_idempotent(loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    before = graph_state(engine.graph)
+    assert engine.simulate_acquisition(snap.company_ids[0], snap.company_ids[1], 0.5)
+    entries = engine.journal.peek(1)
+    assert engine.rollback_scenarios(1) == 1
+    # As if the process died after the rollback committed but before the entry was removed.
+    engine._apply_inverse_ops(entries)
+    assert graph_state(engine.graph) == before
+
+
+def test_unchanged_reconcile_reloads_write_nothing(dataset, loaded):
+    loader, engine = loaded
+    before = graph_state(engine.graph)
+    for method, path in (("load_enriched_company_metadata", "metadata"), ("load_market_cap_data", "market_cap"),
+                         ("load_risk_exposures_from_csv", "exposures")):
+        getattr(loader, method)(dataset[path], reconcile=True)
+        assert loader.last_delta == {"inserted": 0, "updated": 0, "deleted": 0}, method
+    assert graph_state(engine.graph) == before
+
+
+def test_reconcile_reloads_apply_changes(dataset, loaded, tmp_path):
+    loader, engine = loaded
+    market_cap = pd.read_csv(dataset["market_cap"])
+    market_cap.loc[:19, "market_cap"] *= 1.5
+    market_cap_path = str(tmp_path / "market_cap.csv")
+    market_cap.to_csv(market_cap_path, index=False)
+    loader.load_market_cap_data(market_cap_path, reconcile=True)
+    assert loader.last_delta["updated"] == 20
+    # The reconciling reload keeps dollarized risk current without a full pass.
+    incremental = [table["dollarized_risk"].copy() for table in (engine.graph.companies, engine.graph.blockholders, engine.graph.risk_factors)]
+    engine.dollarize_risk()
+    for table, values in zip((engine.graph.companies, engine.graph.blockholders, engine.graph.risk_factors), incremental):
+        assert np.allclose(table["dollarized_risk"], values)
+
+    exposures = pd.read_csv(dataset["exposures"])
+    exposures.loc[:9, "risk_weight"] += 0.05
+    exposures = pd.concat([exposures.iloc[:-5], pd.DataFrame({"company_id": [exposures["company_id"].iat[0]],
+                                                              "risk_factor": ["Test Factor"], "risk_weight": [0.1]})])
+    exposures_path = str(tmp_path / "exposures.csv")
+    exposures.to_csv(exposures_path, index=False)
+    loader.load_risk_exposures_from_csv(exposures_path, reconcile=True)
+    assert loader.last_delta == {"inserted": 1, "updated": 10, "deleted": 5}
+
+    replaced = InMemoryGraph()
+    replaced_loader = InMemoryLoader(replaced)
+    replaced_loader.load_blockholders(dataset["blockholders"], chunk_size=1000, start_year=2000, end_year=2030)
+    replaced_loader.load_enriched_company_metadata(dataset["metadata"])
+    replaced_loader.load_market_cap_data(market_cap_path)
+    replaced_loader.load_risk_exposures_from_csv(exposures_path)
+
+    def exposures_of(graph):
+        snap = graph.snapshot()
+        names = np.asarray(snap.risk_factor_names, dtype=object)
+        return sorted(zip(np.asarray(snap.company_ids, dtype=object)[snap.exposure_company].tolist(),
+                          names[snap.exposure_factor].tolist(), np.round(snap.exposure_weight, 9).tolist()))
+    assert exposures_of(engine.graph) == exposures_of(replaced)
+    assert np.allclose(np.nan_to_num(engine.graph.companies["market_cap"]), np.nan_to_num(replaced.companies["market_cap"]))
+
+
+def test_save_and_load_round_trip(loaded, persist_dir):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    assert engine.simulate_acquisition(snap.company_ids[0], snap.company_ids[1], 0.4)
+    engine.graph.save(persist_dir)
+
+    restored = InMemoryGraph.load(persist_dir)
+    assert graph_state(restored) == graph_state(engine.graph)
+    for table in ("companies", "blockholders", "risk_factors"):
+        original, loaded_table = getattr(engine.graph, table), getattr(restored, table)
+        assert list(loaded_table.ids) == list(original.ids)
+        assert np.allclose(loaded_table["dollarized_risk"], original["dollarized_risk"])
+    assert restored.snapshot().company_sectors == engine.graph.snapshot().company_sectors
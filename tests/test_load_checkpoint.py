@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from modules.graph_backend import create_loader, create_risk_engine
+from modules.load_checkpoint import LoadCheckpoint
+
+CHUNK_SIZE = 1000
+YEARS = {"start_year": 2000, "end_year": 2030}
+
+
+def ownership_rows(persist_dir, tmp_path):
+    """(blockholder, company, year, percent) for every OWNS history entry of the graph persisted in persist_dir."""
+    engine = create_risk_engine("memory", journal_path=str(tmp_path / "journal.json"), persist_dir=persist_dir)
+    snap = engine.get_graph_snapshot()
+    edges = snap.owns_history_edge
+    return sorted(zip([snap.blockholder_ids[o] for o in snap.owns_owner[edges]], [snap.company_ids[c] for c in snap.owns_company[edges]],
+                      snap.owns_history_year.tolist(), snap.owns_history_percent.tolist()))
+
+
+def test_manifest_ranges_and_signature(tmp_path):
+    csv = tmp_path / "rows.csv"
+    csv.write_text("a\n1\n")
+    checkpoint = LoadCheckpoint(str(tmp_path), str(csv), {"chunk_size": 2})
+    for chunk in (0, 1, 2, 5, 7, 8):
+        checkpoint.mark(chunk, 10)
+    assert checkpoint.ranges() == [[0, 2], [5, 5], [7, 8]] and checkpoint.committed_prefix() == 3
+
+    reopened = LoadCheckpoint(str(tmp_path), str(csv), {"chunk_size": 2})
+    assert reopened.matched and reopened.committed == {0, 1, 2, 5, 7, 8} and reopened.rows_loaded == 60
+    assert not LoadCheckpoint(str(tmp_path), str(csv), {"chunk_size": 3}).matched
+
+
+def test_resume_skips_committed_chunks(dataset, persist_dir, tmp_path):
+    num_chunks = -(-len(pd.read_csv(dataset["blockholders"])) // CHUNK_SIZE)
+    loader = create_loader("memory", persist_dir=persist_dir)
+    loader.clear_database()
+    write = loader._write_ownership_batch
+    written = []
+
+    def fail_on_third_chunk(batch):
+        if len(written) == 2:
+            raise RuntimeError("connection lost")
+        written.append(len(batch))
+        write(batch)
+
+    loader._write_ownership_batch = fail_on_third_chunk
+    with pytest.raises(RuntimeError):
+        loader.load_blockholders(dataset["blockholders"], chunk_size=CHUNK_SIZE, **YEARS)
+    loader.close()
+
+    resumed = create_loader("memory", persist_dir=persist_dir)
+    resumed_batches = []
+    resumed._write_ownership_batch = lambda batch: (resumed_batches.append(len(batch)), write(batch))
+    resumed.load_blockholders(dataset["blockholders"], chunk_size=CHUNK_SIZE, **YEARS, resume=True)
+    # Only the chunks after the two committed ones are parsed and written again.
+    assert len(resumed_batches) == num_chunks - 2
+    assert resumed.last_rows_loaded == sum(resumed_batches)
+    resumed.close()
+
+    # Once the graph is saved the manifest says complete, so another resume writes nothing.
+    again = create_loader("memory", persist_dir=persist_dir)
+    again.load_blockholders(dataset["blockholders"], chunk_size=CHUNK_SIZE, **YEARS, resume=True)
+    assert again.last_rows_loaded == 0 and len(resumed_batches) == num_chunks - 2
+
+    full_dir = str(tmp_path / "full_store")
+    full = create_loader("memory", persist_dir=full_dir)
+    full.clear_database()
+    full.load_blockholders(dataset["blockholders"], chunk_size=CHUNK_SIZE, **YEARS)
+    full.close()
+    assert sum(written) + sum(resumed_batches) == full.last_rows_loaded
+    assert ownership_rows(persist_dir, tmp_path) == ownership_rows(full_dir, tmp_path)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from modules.market_data import MarketCapStore
+
+
+def test_history_on_hand_computed_values(tiny, tmp_path):
+    loader, engine = tiny
+    store_dir = str(tmp_path / "history")
+    store = MarketCapStore.create(store_dir, ["C_2", "C_1", "C_3"], ["2024-01-01", "2024-01-02", "2024-01-03"])
+    store.values[:] = [[100.0, 200.0, 300.0], [50.0, 100.0, np.nan], [10.0, 20.0, 30.0]]
+    store.flush()
+
+    history = engine.get_dollarized_risk_history(store_dir, start_date="2024-01-02")
+    assert [d.strftime("%Y-%m-%d") for d in history["dates"]] == ["2024-01-02", "2024-01-03"]
+    companies = dict(zip(history["company_ids"], history["company"].tolist()))
+    # total_risk * cap per date (C_1 0.6, C_2 0.2, C_3 0.4); the missing observation counts as 0.
+    assert companies == {"C_1": pytest.approx([60.0, 0.0]), "C_2": pytest.approx([40.0, 60.0]), "C_3": pytest.approx([8.0, 12.0])}
+    blockholders = dict(zip(history["blockholder_ids"], history["blockholder"].tolist()))
+    assert blockholders["B_1"] == pytest.approx([0.1 * 60 + 0.2 * 40, 0.2 * 60])
+    assert blockholders["B_2"] == pytest.approx([0.5 * 40 + 0.4 * 8, 0.5 * 60 + 0.4 * 12])
+
+
+def test_history_ends_at_current_dollarized_risk(loaded, tmp_path):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    store_dir = str(tmp_path / "history")
+    store = MarketCapStore.create(store_dir, snap.company_ids, ["2024-01-01", "2024-01-02"])
+    store.values[:, 0] = 1.0
+    store.values[:, 1] = snap.market_cap
+    store.flush()
+
+    history = engine.get_dollarized_risk_history(store_dir)
+    assert np.allclose(history["company"][:, 1], snap.company_dollarized_risk)
+    assert np.allclose(history["blockholder"][:, 1], snap.blockholder_dollarized_risk)
+    assert np.allclose(history["company"][:, 0], snap.company_total_risk)
+    assert MarketCapStore.open(store_dir).aligned(["C_missing"])[1].shape == (1, 2)
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def dollarized(table):
+    return dict(zip(table.ids, np.asarray(table["dollarized_risk"], dtype=float).tolist()))
+
+
+def test_delta_refresh_on_hand_computed_values(tiny):
+    loader, engine = tiny
+    assert engine.refresh_market_caps([("C_2", 300.0), ("C_3", 50.0), ("C_9", 1.0)]) == 1
+    # C_2: 0.2 * 300 = 60 (+20); B_1 +20%, B_2 +50% and F1 +0.2 of that.
+    assert dollarized(engine.graph.companies) == pytest.approx({"C_1": 60.0, "C_2": 60.0, "C_3": 20.0})
+    assert dollarized(engine.graph.blockholders) == pytest.approx({"B_1": 18.0, "B_2": 38.0, "B_3": 3.0})
+    assert dollarized(engine.graph.risk_factors) == pytest.approx({"F1": 42.0, "F2": 14.0})
+    assert engine.refresh_market_caps([("C_2", 300.0)]) == 0
+
+
+def test_delta_refresh_matches_full_dollarization(dataset, loaded):
+    loader, engine = loaded
+    market_cap = pd.read_csv(dataset["market_cap"])
+    rng = np.random.default_rng(7)
+    changed = rng.choice(len(market_cap), size=40, replace=False)
+    market_cap.loc[changed, "market_cap"] *= rng.uniform(0.5, 2.0, len(changed))
+    assert engine.refresh_market_caps(market_cap) == len(changed)
+
+    tables = (engine.graph.companies, engine.graph.blockholders, engine.graph.risk_factors)
+    incremental = [np.asarray(table["dollarized_risk"], dtype=float).copy() for table in tables]
+    engine.dollarize_risk()
+    for table, values in zip(tables, incremental):
+        assert np.allclose(table["dollarized_risk"], values)
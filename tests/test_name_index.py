@@ -0,0 +1,42 @@
+from modules.name_index import NameIndex
+
+
+ENTRIES = [
+    ("B_1", float("nan"), "Blockholder"),
+    ("B_2", "Nancy Fund", "Blockholder"),
+    ("B_3", None, "Blockholder"),
+    ("C_1", "Alpha Holdings", "Company"),
+    ("C_2", "Alpha", "Company"),
+    ("C_3", "Beta Alpha Partners", "Company"),
+    ("C_4", "Alpha", "Company"),
+    ("B_4", "Alpa", "Blockholder"),
+]
+
+
+def test_missing_names_fall_back_to_the_id():
+    index = NameIndex(ENTRIES)
+    result = index.search("nan")
+    assert [r["id"] for r in result["results"]] == ["B_2"]
+    assert index.search("B_1")["results"][0]["name"] == "B_1"
+    assert index.search("b 3")["results"][0]["id"] == "B_3"
+
+
+def test_ranking_and_pagination():
+    index = NameIndex(ENTRIES)
+    full = index.search("alpha", limit=20)
+    # Exact names first (shared names show their ids), then name prefixes, word prefixes, trigram matches.
+    assert [r["id"] for r in full["results"]] == ["C_2", "C_4", "C_1", "C_3", "B_4"]
+    assert [r["score"] for r in full["results"][:4]] == [3.0, 3.0, 2.0, 1.5]
+    assert full["results"][0]["display"] == "Alpha (C_2)"
+    assert full["total"] == 5 and full["total_exact"]
+
+    pages = [index.search("alpha", limit=2, offset=offset)["results"] for offset in (0, 2, 4)]
+    assert [r["id"] for page in pages for r in page] == [r["id"] for r in full["results"]]
+    assert [r["id"] for r in index.search("alpha", label="Blockholder")["results"]] == ["B_4"]
+
+
+def test_trigram_pass_is_skipped_when_prefixes_fill_the_page():
+    index = NameIndex(ENTRIES)
+    page = index.search("alpha", limit=3)
+    assert [r["id"] for r in page["results"]] == ["C_2", "C_4", "C_1"]
+    assert page["total"] == 4 and not page["total_exact"]
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from modules.ownership_index import integrated_ownership
+
+
+def test_series_matches_the_leontief_inverse_on_cross_holdings():
+    # Companies 0 and 1 hold each other; blockholder 2 holds 0.
+    dense = np.array([[0.0, 0.3, 0.0], [0.4, 0.0, 0.0], [0.5, 0.0, 0.0]])
+    total = integrated_ownership(sp.csr_matrix(dense), threshold=0.0, max_depth=200).toarray()
+    assert np.allclose(total, np.linalg.inv(np.eye(3) - dense) - np.eye(3))
+
+
+def test_indirect_stakes_and_control_path(tiny):
+    loader, engine = tiny
+    assert engine.simulate_acquisition("C_1", "C_2", 0.5)
+    # C_1 now holds 50% of C_2, so C_1's holders B_1 (10%) and B_3 (5%) hold 5% and 2.5% of C_2 through it.
+    owners = {o["id"]: (o["integrated_percent"], o["direct_percent"]) for o in engine.get_ultimate_owners("C_2")}
+    assert owners == {"C_1": pytest.approx((0.5, 0.5)), "B_1": pytest.approx((0.05, 0.0)), "B_3": pytest.approx((0.025, 0.0))}
+    assert [c["id"] for c in engine.get_controlled_companies("B_1", min_percent=0.05)] == ["C_1", "C_2"]
+    (only,) = engine.get_controlled_companies("B_1", min_percent=0.06)
+    assert (only["id"], only["label"], only["integrated_percent"], only["direct_percent"]) == (
+        "C_1", "Company", pytest.approx(0.1), pytest.approx(0.1))
+
+    path = engine.get_strongest_control_path("B_1", "C_2")
+    assert [node["id"] for node in path["path"]] == ["B_1", "C_1", "C_2"]
+    assert path["percent"] == pytest.approx(0.05)
+    assert engine.get_strongest_control_path("B_2", "C_2") is None
+
+
+def test_direct_stakes_agree_with_the_snapshot(loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    edge = int(np.argmax(snap.owns_percent * ~snap.owns_owner_is_company))
+    owner = snap.blockholder_ids[snap.owns_owner[edge]]
+    company = snap.company_ids[snap.owns_company[edge]]
+    expected = snap.owns_percent[(snap.owns_owner == snap.owns_owner[edge]) & ~snap.owns_owner_is_company
+                                 & (snap.owns_company == snap.owns_company[edge])].sum()
+    controlled = {c["id"]: c for c in engine.get_controlled_companies(owner, min_percent=0.0)}
+    assert controlled[company]["direct_percent"] == pytest.approx(expected)
+    assert controlled[company]["integrated_percent"] >= expected - 1e-9
+    assert engine.get_strongest_control_path(owner, company)["percent"] >= snap.owns_percent[edge] - 1e-9
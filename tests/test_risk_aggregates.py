@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+
+def totals(engine):
+    return {(row.kind, row.name): (row.companies, row.market_cap, row.direct_risk, row.dollarized_risk, row.held_risk)
+            for row in engine.get_risk_aggregates().itertuples()}
+
+
+def test_aggregates_against_hand_computed_totals(tiny):
+    loader, engine = tiny
+    # Held risk per company: C_1 15% of 60 = 9, C_2 70% of 40 = 28, C_3 40% of 20 = 8.
+    assert totals(engine) == {
+        ("sector", "Tech"): pytest.approx((2, 300.0, 0.8, 100.0, 37.0)),
+        ("sector", "Energy"): pytest.approx((1, 50.0, 0.4, 20.0, 8.0)),
+        ("location", "NY"): pytest.approx((2, 150.0, 1.0, 80.0, 17.0)),
+        ("location", "CA"): pytest.approx((1, 200.0, 0.2, 40.0, 28.0)),
+        ("risk_factor", "F1"): pytest.approx((2, 300.0, 0.7, 38.0, 0.5 * 9 + 0.2 * 28)),
+        ("risk_factor", "F2"): pytest.approx((2, 150.0, 0.5, 14.0, 0.1 * 9 + 0.4 * 8)),
+    }
+
+
+def test_aggregates_follow_graph_writes(tiny):
+    loader, engine = tiny
+    before = totals(engine)
+    assert engine.simulate_risk_event("F1", 2.0, target_company_id="C_2") == 1
+    engine.compute_total_risk()
+    engine.dollarize_risk()
+    after = totals(engine)
+    # C_2's F1 weight goes 0.2 -> 0.4: +40 dollarized, 70% of it held.
+    assert after[("sector", "Tech")][3] - before[("sector", "Tech")][3] == pytest.approx(40.0)
+    assert after[("sector", "Tech")][4] - before[("sector", "Tech")][4] == pytest.approx(28.0)
+    assert after[("risk_factor", "F1")][3] == pytest.approx(float(engine.graph.risk_factors["dollarized_risk"][engine.graph.risk_factors.index["F1"]]))
+
+
+def test_aggregates_agree_with_stored_risk(loaded):
+    loader, engine = loaded
+    graph = engine.graph
+    frame = engine.get_risk_aggregates().set_index(["kind", "name"])
+    factors = frame.loc["risk_factor"]
+    stored = np.array([graph.risk_factors["dollarized_risk"][graph.risk_factors.index[name]] for name in factors.index])
+    assert np.allclose(factors["dollarized_risk"], stored)
+
+    snap = engine.get_graph_snapshot()
+    located = np.array([location is not None for location in snap.company_locations])
+    assert frame.loc["location", "dollarized_risk"].sum() == pytest.approx(snap.company_dollarized_risk[located].sum())
+    assert frame.loc["location", "companies"].sum() == located.sum()
+    # Every company has a location and no company-owned stakes, so held risk sums to the blockholders' dollarized risk.
+    assert located.all() and not snap.owns_owner_is_company.any()
+    assert frame.loc["location", "held_risk"].sum() == pytest.approx(snap.blockholder_dollarized_risk.sum())
@@ -0,0 +1,37 @@
+import pytest
+
+
+def test_sensitivities_match_hand_computed_gradients(tiny):
+    loader, engine = tiny
+    report = engine.sensitivity_report(top_n=10)
+
+    # dD_B1/dW_cr = P_B1,c * m_c; dD_B1/dP_B1,c = m_c * direct_c.
+    b1 = report["per_blockholder"]["B_1"]
+    weights = {(e["company_id"], e["risk_factor"]): e["sensitivity"] for e in b1["exposure_weights"]}
+    assert weights == pytest.approx({("C_1", "F1"): 10.0, ("C_1", "F2"): 10.0, ("C_2", "F1"): 40.0})
+    assert [(o["company_id"], o["sensitivity"]) for o in b1["ownership"]] == [("C_1", pytest.approx(60.0)), ("C_2", pytest.approx(40.0))]
+
+    # Global: d(sum D)/dW_cr = (sum of holders' percents in c) * m_c, largest first.
+    top = report["global"]["exposure_weights"][0]
+    assert (top["company_id"], top["risk_factor"]) == ("C_2", "F1")
+    assert top["sensitivity"] == pytest.approx(140.0) and top["elasticity"] == pytest.approx(28.0)
+
+    only = engine.sensitivity_report(top_n=1, blockholder_ids=["B_2"])["per_blockholder"]
+    assert list(only) == ["B_2"]
+    assert only["B_2"]["exposure_weights"][0]["sensitivity"] == pytest.approx(100.0)  # 50% of C_2's 200 cap
+
+
+def test_sensitivity_predicts_a_weight_change(loaded):
+    loader, engine = loaded
+    report = engine.sensitivity_report(top_n=5)
+    blockholder_id, drivers = next((b, d) for b, d in report["per_blockholder"].items() if d["exposure_weights"])
+    driver = drivers["exposure_weights"][0]
+    b = engine.graph.blockholders.index[blockholder_id]
+    before = float(engine.graph.blockholders["dollarized_risk"][b])
+
+    # Dollarized risk is linear in each weight, so the gradient predicts the change exactly.
+    assert engine.simulate_risk_event(driver["risk_factor"], 1.5, target_company_id=driver["company_id"]) == 1
+    engine.compute_total_risk()
+    engine.dollarize_risk()
+    after = float(engine.graph.blockholders["dollarized_risk"][b])
+    assert after - before == pytest.approx(driver["sensitivity"] * driver["weight"] * 0.5, rel=1e-9)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.risk_statistics import MAD_SCALE, robust_z_scores
+
+
+def test_statistics_on_hand_computed_values(tiny):
+    loader, engine = tiny
+    stats = engine.get_risk_statistics()
+    dollarized = stats.summary()["Company"]["dollarized_risk"]
+    overall = dollarized["overall"]
+    assert overall["count"] == 3 and overall["mean"] == pytest.approx(40.0)
+    assert (overall["min"], overall["max"]) == (pytest.approx(20.0), pytest.approx(60.0))
+    assert overall["quantiles"]["p50"] == pytest.approx(40.0) and sum(overall["histogram"]) == 3
+    assert dollarized["by_sector"]["Tech"]["count"] == 2 and dollarized["by_sector"]["Tech"]["mean"] == pytest.approx(50.0)
+    assert dollarized["by_location"]["NY"]["quantiles"]["p50"] == pytest.approx(40.0)  # C_1 60 and C_3 20
+
+    companies = stats.node_scores().set_index("id").loc[["C_1", "C_2", "C_3"]]
+    assert companies["dollarized_risk_pct"].tolist() == pytest.approx([100.0, 200 / 3, 100 / 3])
+    assert companies["dollarized_risk_sector_pct"].tolist() == pytest.approx([100.0, 50.0, 100.0])
+    # Median 40, MAD 20: C_1 sits one scaled MAD above the median.
+    assert companies["dollarized_risk_zscore"].tolist() == pytest.approx([1 / MAD_SCALE, 0.0, -1 / MAD_SCALE])
+
+
+def test_robust_z_scores_within_groups_and_zero_mad():
+    z = robust_z_scores([1.0, 2.0, 3.0, 5.0, 5.0, 5.0], group_codes=[0, 0, 0, 1, 1, 1])
+    assert z.tolist() == pytest.approx([-1 / MAD_SCALE, 0.0, 1 / MAD_SCALE, 0.0, 0.0, 0.0])
+
+
+def test_sector_quantiles_match_numpy(loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    summary = engine.get_risk_statistics().summary()["Company"]["total_risk"]
+    sectors = pd.Series(snap.company_sectors).fillna("N/A")
+    for sector, entry in summary["by_sector"].items():
+        values = snap.company_total_risk[(sectors == sector).to_numpy()]
+        assert entry["count"] == len(values)
+        assert entry["quantiles"]["p95"] == pytest.approx(np.quantile(values, 0.95))
+        assert entry["histogram"] == np.histogram(values, bins=summary["bin_edges"])[0].tolist()
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_top_n_and_other_rows(tiny):
+    loader, engine = tiny
+    rows = {(r["Sector"], r["Company"]): (r["CompanyId"], r["DollarizedRisk"]) for r in engine.get_sector_treemap(top_n=1)}
+    assert rows == {
+        ("Tech", "Company 1"): ("C_1", pytest.approx(60.0)),
+        ("Tech", "Other (1 companies)"): (None, pytest.approx(40.0)),
+        ("Energy", "Company 3"): ("C_3", pytest.approx(20.0)),
+    }
+    assert [r["CompanyId"] for r in engine.get_sector_companies("Tech", limit=1, skip=1)] == ["C_2"]
+
+
+def test_sector_sums_are_preserved(loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    treemap = pd.DataFrame(engine.get_sector_treemap(top_n=3))
+    risky = pd.DataFrame({"sector": snap.company_sectors, "risk": snap.company_dollarized_risk})
+    risky = risky[(risky["risk"] > 0) & risky["sector"].notna()]
+
+    totals = treemap.groupby("Sector")["DollarizedRisk"].sum()
+    expected = risky.groupby("sector")["risk"].sum()
+    assert np.allclose(totals.reindex(expected.index), expected)
+    for sector, group in treemap.groupby("Sector"):
+        named = group[group["CompanyId"].notna()]
+        assert len(named) == min(3, int((risky["sector"] == sector).sum()))
+        # The named companies are the sector's largest.
+        assert named["DollarizedRisk"].min() >= risky.loc[risky["sector"] == sector, "risk"].nlargest(3).min() - 1e-9
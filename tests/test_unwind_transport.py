@@ -0,0 +1,54 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.db_loader import DBLoader, unwind_params, unwind_rows
+from modules.graph_backend import InMemoryLoader
+from modules.graph_store import InMemoryGraph
+
+
+def bound_rows(columns, transport, params):
+    """The `row` maps Memgraph binds for unwind_rows(columns, transport) with these parameters."""
+    query = unwind_rows(columns, transport)
+    if transport == "records":
+        assert query == "UNWIND $records AS row"
+        return params["records"]
+    assert query.startswith(f"UNWIND range(0, size(${columns[0]}) - 1) AS i\nWITH {{")
+    fields = re.findall(r"(\w+): \$(\w+)\[i\]", query)
+    assert [key for key, _ in fields] == columns and all(key == param for key, param in fields)
+    return [{key: params[param][i] for key, param in fields} for i in range(len(params[columns[0]]))]
+
+
+def test_column_and_record_transports_bind_the_same_rows():
+    frame = pd.DataFrame({
+        "blockholder_id_graph": ["B_1", "B_2", "B_3"], "blockholder_name": ["One", None, "Three"],
+        "company_id_graph": ["C_1", "C_1", "C_2"], "company_name": ["Co", "Co", "Other"],
+        "ownership_percent": [0.1, np.nan, 0.25], "year": np.array([2021, 2022, 2023]),
+        "block_type": ["Institution"] * 3, "files_13F": [1, 0, 2], "unused": [9, 9, 9],
+    })
+    columns = DBLoader.OWNERSHIP_COLUMNS
+    rows = {transport: bound_rows(columns, transport, unwind_params(frame, columns, transport))
+            for transport in ("columns", "records")}
+    assert len(rows["columns"]) == 3
+    for by_column, by_record in zip(rows["columns"], rows["records"]):
+        assert list(by_column) == list(by_record) == columns
+        for column in columns:
+            a, b = by_column[column], by_record[column]
+            assert (a == b) or (a != a and b != b), column  # NaN stays NaN in both
+            assert type(a) is type(b), column
+    # Integer columns arrive as Python ints either way, so Memgraph stores integers, not floats.
+    assert type(rows["columns"][0]["year"]) is int
+
+
+def test_empty_frame_binds_no_rows():
+    columns = ["company_id", "risk_factor"]
+    frame = pd.DataFrame({"company_id": [], "risk_factor": []})
+    for transport in ("columns", "records"):
+        assert bound_rows(columns, transport, unwind_params(frame, columns, transport)) == []
+
+
+def test_unknown_transport_is_rejected():
+    with pytest.raises(ValueError, match="transport"):
+        InMemoryLoader(InMemoryGraph(), transport="json")
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_risk_by_year_on_hand_computed_values(tiny):
+    loader, engine = tiny
+    result = engine.compute_risk_by_year()
+    assert result["years"] == [2022, 2023]
+    position = {b: i for i, b in enumerate(result["blockholder_ids"])}
+    # 2022: only B_1's 30% of C_1 (dollarized 60, total 0.6); 2023 is the current state.
+    assert result["dollarized_risk"][0, position["B_1"]] == pytest.approx(18.0)
+    assert result["total_risk"][0, position["B_1"]] == pytest.approx(0.18)
+    assert result["dollarized_risk"][0, [position["B_2"], position["B_3"]]].tolist() == [0.0, 0.0]
+    assert [result["dollarized_risk"][1, position[b]] for b in ("B_1", "B_2", "B_3")] == pytest.approx([14.0, 28.0, 3.0])
+
+    only = engine.compute_risk_by_year(years=[2023, 2030])
+    assert only["years"] == [2023, 2030] and not only["dollarized_risk"][1].any()
+
+
+def test_risk_by_year_matches_pandas(dataset, loaded):
+    loader, engine = loaded
+    snap = engine.get_graph_snapshot()
+    result = engine.compute_risk_by_year()
+
+    rows = pd.read_csv(dataset["blockholders"]).dropna(subset=["blockholder_CIK", "company_CIK", "year"])
+    rows["blockholder"] = "B_" + rows["blockholder_CIK"].astype(str).str.strip()
+    rows["company"] = "C_" + rows["company_CIK"].astype(str).str.strip()
+    rows["percent"] = pd.to_numeric(rows["position"], errors="coerce") / 100.0
+    # Within a year the last row of an edge wins, as in the loader.
+    percent = rows.groupby(["year", "blockholder", "company"])["percent"].last().reset_index()
+    dollars = pd.Series(snap.company_dollarized_risk, index=snap.company_ids)
+    percent["dollars"] = percent["percent"] * dollars.reindex(percent["company"]).to_numpy()
+    expected = percent.groupby(["year", "blockholder"])["dollars"].sum()
+
+    assert result["years"] == sorted(percent["year"].unique().tolist())
+    for y, year in enumerate(result["years"]):
+        actual = pd.Series(result["dollarized_risk"][y], index=result["blockholder_ids"])
+        reference = expected.loc[year].reindex(actual.index).fillna(0.0)
+        assert np.allclose(actual, reference), year
@@ -4,16 +4,17 @@ from gqlalchemy import Memgraph, Node, Relationship
 import math
 import re
 from modules.db_loader import OWNS, EXPOSED_TO
+from modules.query_metrics import execute_and_fetch
 
-def render_graph_as_html(cypher_query: str) -> str:
+def render_graph_as_html(cypher_query: str, parameters: dict = None) -> str:
     """
-    Renders an interactive Pyvis graph as an HTML string based on a Cypher query.
+    Renders an interactive Pyvis graph as an HTML string based on a Cypher query
+    and its parameters.
     """
     db = Memgraph()
     results = []
     try:
-        results_cursor = db.execute_and_fetch(cypher_query)
-        results = list(results_cursor)
+        results = execute_and_fetch(db, cypher_query, name="graph_renderer.render_graph_as_html", parameters=parameters)
     except Exception as e:
         return f"<h1>Error rendering graph. Check your query and database connection.</h1><p>Error: {e}</p>"
 